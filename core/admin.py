@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import Student, Course, Enrollment, Grade, Attendance, Announcement
+from .models import Student, Course, Enrollment, Grade, Attendance, Announcement, GradingScale, GradeBoundary
+
+
+def is_changelist(request):
+    match = getattr(request, 'resolver_match', None)
+    return match is not None and match.url_name is not None and match.url_name.endswith('_changelist')
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
@@ -34,7 +39,7 @@ class CourseAdmin(admin.ModelAdmin):
             'fields': ('course_code', 'course_name', 'description', 'difficulty_level')
         }),
         ('Academic Details', {
-            'fields': ('credits', 'duration_weeks', 'instructor')
+            'fields': ('credits', 'duration_weeks', 'instructor', 'grading_scale')
         }),
         ('Enrollment', {
             'fields': ('max_students', 'fees', 'is_active')
@@ -50,13 +55,46 @@ class EnrollmentAdmin(admin.ModelAdmin):
     list_filter = ['status', 'enrollment_date']
     search_fields = ['student__first_name', 'student__last_name', 'course__course_name']
     readonly_fields = ['enrollment_date', 'average_grade']
+    list_select_related = ['student', 'course']
+    autocomplete_fields = ['student', 'course']
+    
+    def get_queryset(self, request):
+        # Also used by the autocomplete widgets of Grade and Attendance, whose
+        # option labels render student and course.
+        queryset = super().get_queryset(request).select_related('student', 'course')
+        if is_changelist(request):
+            queryset = queryset.with_grade_stats()
+        return queryset
+    
+    @admin.display(description='Average grade', ordering='grade_avg')
+    def average_grade(self, obj):
+        return obj.average_grade
+
+class GradeBoundaryInline(admin.TabularInline):
+    model = GradeBoundary
+    extra = 0
+
+@admin.register(GradingScale)
+class GradingScaleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'description']
+    search_fields = ['name']
+    inlines = [GradeBoundaryInline]
 
 @admin.register(Grade)
 class GradeAdmin(admin.ModelAdmin):
-    list_display = ['enrollment', 'assignment_name', 'marks_obtained', 'total_marks', 'percentage', 'grade_letter', 'date']
+    list_display = ['enrollment', 'assignment_name', 'marks_obtained', 'total_marks', 'percentage', 'letter', 'date']
     list_filter = ['date']
     search_fields = ['enrollment__student__first_name', 'enrollment__student__last_name', 'assignment_name']
-    readonly_fields = ['date', 'percentage', 'grade_letter']
+    readonly_fields = ['date', 'percentage', 'letter']
+    list_select_related = ['enrollment__student', 'enrollment__course']
+    autocomplete_fields = ['enrollment']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_letters()
+    
+    @admin.display(description='Grade letter', ordering='letter')
+    def letter(self, obj):
+        return obj.grade_letter
 
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
@@ -64,6 +102,8 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_filter = ['status', 'date']
     search_fields = ['enrollment__student__first_name', 'enrollment__student__last_name']
     date_hierarchy = 'date'
+    list_select_related = ['enrollment__student', 'enrollment__course']
+    autocomplete_fields = ['enrollment']
 
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
@@ -0,0 +1,443 @@
+import datetime
+import hashlib
+import json
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from . import fragments, replicas
+from .attendance import (
+    STATUS_FIELDS, VALID_STATUSES, AttendanceEntry, AttendanceSummary, attendance_records, record_attendance,
+)
+from .models import Student, Course, Enrollment
+from .pagination import InvalidCursor, KeysetPaginator, clamp_page_size
+from .search import search
+from .services import EnrollmentError, bulk_enroll
+
+
+def _json_body(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _parse_date(value):
+    """A date from ``YYYY-MM-DD``, or ``None`` if it is malformed or does not exist (2025-02-30)."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def _error(message, status=400, **extra):
+    return JsonResponse({'error': message, **extra}, status=status)
+
+
+def _bearer_token(request):
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+
+def write_endpoint(view):
+    """
+    A POST endpoint for browser sessions and for API clients.
+
+    Pages send the CSRF token as usual: the value of the ``csrftoken`` cookie
+    in an ``X-CSRFToken`` header. Clients without a session, such as
+    attendance tablets, send ``Authorization: Bearer <token>`` with one of
+    ``settings.API_TOKENS`` instead. Such requests don't rely on cookies, so
+    there is nothing to forge and the CSRF check is skipped for them.
+    """
+    @csrf_exempt
+    @require_POST
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _bearer_token(request)
+        if token is None:
+            rejected = CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+            if rejected is not None:
+                return rejected
+        elif not any(constant_time_compare(token, known) for known in getattr(settings, 'API_TOKENS', ())):
+            return _error('Invalid API token.', status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@write_endpoint
+def course_enroll(request, pk):
+    """
+    Enroll students in a course.
+
+    Body: ``{"student_ids": ["STU001", "STU002"]}``. Students are enrolled in
+    list order until the course is full; the response lists who was enrolled,
+    who already was, and who was turned away.
+    """
+    course = get_object_or_404(Course, pk=pk)
+    body = _json_body(request)
+    codes = body.get('student_ids') if isinstance(body, dict) else None
+    if not isinstance(codes, list) or not codes or not all(isinstance(code, str) for code in codes):
+        return _error('Expected a non-empty "student_ids" list of strings.')
+
+    students = {student.student_id: student for student in Student.objects.filter(student_id__in=codes)}
+    unknown = [code for code in codes if code not in students]
+    if unknown:
+        return _error('Unknown student IDs.', unknown=unknown)
+
+    try:
+        result = bulk_enroll(course, [students[code] for code in codes])
+    except EnrollmentError as exc:
+        return _error(str(exc), status=409)
+    course.refresh_from_db(fields=['active_enrolled'])
+    return JsonResponse({
+        'course': course.course_code,
+        **result.as_dict(),
+        'seats_available': course.seats_available,
+    })
+
+
+MAX_ATTENDANCE_BATCH = 5000
+
+
+@write_endpoint
+def attendance_batch(request):
+    """
+    Record attendance for any number of courses and dates in one request.
+
+    Body: ``{"records": [{"enrollment": 12, "date": "2025-01-31", "status":
+    "Present", "remarks": ""}, ...]}``. Instead of ``enrollment`` a record may
+    name ``student_id`` and ``course_code``. Valid records are saved in one
+    transaction; invalid ones are reported by index and skipped.
+    """
+    body = _json_body(request)
+    records = body.get('records') if isinstance(body, dict) else None
+    if not isinstance(records, list) or not records:
+        return _error('Expected a non-empty "records" list.')
+    if len(records) > MAX_ATTENDANCE_BATCH:
+        return _error(f'At most {MAX_ATTENDANCE_BATCH} records per request.')
+
+    # Resolve every (student_id, course_code) pair and check every enrollment
+    # id with one query each.
+    pairs = {
+        (record.get('student_id'), record.get('course_code'))
+        for record in records
+        if isinstance(record, dict) and 'enrollment' not in record
+    }
+    by_pair = {}
+    if pairs:
+        condition = Q()
+        for student_id, course_code in pairs:
+            condition |= Q(student__student_id=student_id, course__course_code=course_code)
+        by_pair = {
+            (student_id, course_code): pk
+            for pk, student_id, course_code in Enrollment.objects.filter(condition)
+            .values_list('pk', 'student__student_id', 'course__course_code')
+        }
+    ids = {
+        record['enrollment'] for record in records
+        if isinstance(record, dict) and isinstance(record.get('enrollment'), int)
+    }
+    known_ids = set(Enrollment.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+    entries, errors = [], []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'Record must be an object.'})
+            continue
+        if 'enrollment' in record:
+            enrollment_id = record['enrollment'] if isinstance(record['enrollment'], int) and record['enrollment'] in known_ids else None
+        else:
+            enrollment_id = by_pair.get((record.get('student_id'), record.get('course_code')))
+        date = _parse_date(record.get('date'))
+        status = record.get('status')
+        remarks = record.get('remarks', '')
+        if enrollment_id is None:
+            errors.append({'index': index, 'error': 'Unknown enrollment.'})
+        elif date is None:
+            errors.append({'index': index, 'error': 'Invalid or missing date (YYYY-MM-DD).'})
+        elif status not in VALID_STATUSES:
+            errors.append({'index': index, 'error': f'Invalid status {status!r}.'})
+        elif not isinstance(remarks, str):
+            errors.append({'index': index, 'error': 'Remarks must be a string.'})
+        else:
+            entries.append(AttendanceEntry(enrollment_id, date, status, remarks))
+
+    saved = record_attendance(entries)
+    return JsonResponse({'saved': saved, 'errors': errors}, status=200 if saved or not errors else 400)
+
+
+@require_GET
+def student_attendance_heatmap(request, pk):
+    """
+    A student's attendance for one calendar year (``?year=``, default this
+    year), as per-day status counts across all their courses for a calendar
+    heatmap. Each day's ``percentage`` counts Present and Late as attended and
+    leaves Excused out.
+    """
+    student = get_object_or_404(Student, pk=pk)
+    try:
+        year = int(request.GET.get('year') or timezone.localdate().year)
+        start, end = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    except ValueError:
+        return _error('"year" must be a valid year.')
+
+    days = {}
+    for entry in attendance_records(
+        Enrollment.objects.filter(student=student).values('pk'), start, end, remarks=False,
+    ):
+        days.setdefault(entry.date, Counter())[STATUS_FIELDS[entry.status]] += 1
+
+    total = AttendanceSummary()
+    calendar = []
+    for date in sorted(days):
+        summary = AttendanceSummary(**days[date])
+        total += summary
+        calendar.append({'date': date.isoformat(), **summary.as_dict()})
+    return JsonResponse({
+        'student': student.student_id,
+        'year': year,
+        'days': calendar,
+        'summary': total.as_dict(),
+    })
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+ENROLLMENT_FIELDS = ('id', 'status', 'enrollment_date', 'completion_date', 'final_grade')
+
+
+class Resource:
+    """
+    A model served read-only as JSON.
+
+    ``fields`` are the columns a client may select with ``fields=``; detail
+    responses can also include the ``enrollments`` of the object, with the
+    ``enrollment_columns`` of the other side of each enrollment. ``depends_on``
+    lists the models whose fragment versions (see ``fragments``) stamp every
+    response, so an ETag or Last-Modified date can be checked with a cache read
+    instead of a query.
+    """
+
+    def __init__(self, model, fields, ordering, filters, depends_on, enrollment_owner,
+                 enrollment_columns, enrollments_depend_on, derived=None):
+        self.model = model
+        self.fields = fields
+        self.ordering = ordering
+        self.filters = filters
+        self.depends_on = depends_on
+        self.enrollment_owner = enrollment_owner
+        self.enrollment_columns = enrollment_columns
+        self.enrollments_depend_on = enrollments_depend_on
+        # Fields computed from other columns: {name: columns}.
+        self.derived = derived or {}
+
+    def available(self, detail=False):
+        return self.fields + ('enrollments',) if detail else self.fields
+
+    def parse_fields(self, value, detail=False):
+        available = self.available(detail)
+        if not value:
+            return available
+        fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in fields if name not in available]
+        if unknown or not fields:
+            raise InvalidFields(unknown)
+        return fields
+
+    def columns(self, fields, ordering=()):
+        columns = []
+        for name in fields:
+            if name != 'enrollments':
+                columns.extend(self.derived.get(name, (name,)))
+        columns.extend(term.lstrip('-') for term in ordering if term not in ('pk', 'search_rank'))
+        return list(dict.fromkeys(columns))
+
+    def labels(self, fields):
+        if 'enrollments' in fields:
+            return tuple(dict.fromkeys(self.depends_on + self.enrollments_depend_on))
+        return self.depends_on
+
+    def _fields_or_none(self, request, pk):
+        try:
+            return self.parse_fields(request.GET.get('fields'), detail=pk is not None)
+        except InvalidFields:
+            return None
+
+    def etag(self, request, pk=None):
+        fields = self._fields_or_none(request, pk)
+        if fields is None:
+            return None
+        versions = fragments.current_versions(self.labels(fields))
+        key = json.dumps([request.path, sorted(request.GET.lists()), versions])
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def last_modified(self, request, pk=None):
+        fields = self._fields_or_none(request, pk)
+        if fields is None:
+            return None
+        return fragments.last_modified(self.labels(fields))
+
+    def enrollments(self, obj):
+        lookups = list(self.enrollment_columns.values())
+        rows = (
+            Enrollment.objects.filter(**{self.enrollment_owner: obj})
+            .order_by('-enrollment_date', 'pk')
+            .values_list(*ENROLLMENT_FIELDS, *lookups)
+        )
+        keys = ENROLLMENT_FIELDS + tuple(self.enrollment_columns)
+        return [dict(zip(keys, row)) for row in rows]
+
+
+STUDENTS = Resource(
+    Student,
+    fields=(
+        'id', 'student_id', 'first_name', 'last_name', 'email', 'phone', 'gender', 'date_of_birth',
+        'city', 'state', 'country', 'enrollment_date', 'status', 'profile_image',
+    ),
+    ordering=('-enrollment_date', 'pk'),
+    filters={'status': 'status'},
+    depends_on=('core.student',),
+    enrollment_owner='student',
+    enrollment_columns={'course_code': 'course__course_code', 'course_name': 'course__course_name'},
+    enrollments_depend_on=('core.enrollment', 'core.course'),
+)
+
+COURSES = Resource(
+    Course,
+    fields=(
+        'id', 'course_code', 'course_name', 'description', 'credits', 'instructor', 'duration_weeks',
+        'difficulty_level', 'max_students', 'fees', 'start_date', 'end_date', 'is_active',
+        'active_enrolled', 'seats_available',
+    ),
+    ordering=('course_code', 'pk'),
+    filters={'difficulty': 'difficulty_level'},
+    # Enrollments change ``active_enrolled`` without saving the course.
+    depends_on=('core.course', 'core.enrollment'),
+    enrollment_owner='course',
+    enrollment_columns={
+        'student_id': 'student__student_id',
+        'first_name': 'student__first_name',
+        'last_name': 'student__last_name',
+    },
+    enrollments_depend_on=('core.student',),
+    derived={'seats_available': ('max_students', 'active_enrolled')},
+)
+
+
+def _serialize(obj, fields):
+    data = {}
+    for name in fields:
+        if name == 'enrollments':
+            continue
+        value = getattr(obj, name)
+        if isinstance(value, FieldFile):
+            value = value.url if value else None
+        data[name] = value
+    return data
+
+
+def _fields_error(resource, exc, detail=False):
+    return _error('Unknown or empty "fields".', unknown=exc.args[0], available=list(resource.available(detail)))
+
+
+def _read_primary(view):
+    """Build the body from the primary, which has every write its ETag counts."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replicas.primary():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+@_read_primary
+def _list(request, resource):
+    try:
+        fields = resource.parse_fields(request.GET.get('fields'))
+    except InvalidFields as exc:
+        return _fields_error(resource, exc)
+
+    queryset = resource.model.objects.all()
+    ordering = resource.ordering
+    query = request.GET.get('q', '')
+    if query:
+        queryset = search(queryset, query)
+        ordering = ('search_rank', 'pk')
+    for param, lookup in resource.filters.items():
+        value = request.GET.get(param)
+        if value:
+            queryset = queryset.filter(**{lookup: value})
+    queryset = queryset.only(*resource.columns(fields, ordering))
+
+    paginator = KeysetPaginator(queryset, ordering=ordering, per_page=clamp_page_size(request.GET.get('per_page')))
+    try:
+        page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        return _error('Invalid cursor.')
+    return JsonResponse({
+        'results': [_serialize(obj, fields) for obj in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@_read_primary
+def _detail(request, resource, pk):
+    try:
+        fields = resource.parse_fields(request.GET.get('fields'), detail=True)
+    except InvalidFields as exc:
+        return _fields_error(resource, exc, detail=True)
+
+    obj = get_object_or_404(resource.model.objects.only(*resource.columns(fields)), pk=pk)
+    data = _serialize(obj, fields)
+    if 'enrollments' in fields:
+        data['enrollments'] = resource.enrollments(obj)
+    return JsonResponse(data)
+
+
+# The read-only endpoints below take ``fields=a,b,c`` to select only those
+# columns. Lists are keyset paginated (``per_page``, ``after``/``before``
+# cursors from ``next``/``previous``) and take the same ``q`` and filter
+# parameters as the HTML lists. Every response carries an ETag and a
+# Last-Modified date built from the fragment version stamps, so a conditional
+# GET for unchanged data is answered with a 304 without touching the database.
+# The bodies are read from the primary: a lagging replica would send old rows
+# under the new ETag, and clients would keep them after it caught up.
+
+@require_GET
+@condition(etag_func=STUDENTS.etag, last_modified_func=STUDENTS.last_modified)
+def student_list(request):
+    return _list(request, STUDENTS)
+
+
+@require_GET
+@condition(etag_func=STUDENTS.etag, last_modified_func=STUDENTS.last_modified)
+def student_detail(request, pk):
+    return _detail(request, STUDENTS, pk)
+
+
+@require_GET
+@condition(etag_func=COURSES.etag, last_modified_func=COURSES.last_modified)
+def course_list(request):
+    return _list(request, COURSES)
+
+
+@require_GET
+@condition(etag_func=COURSES.etag, last_modified_func=COURSES.last_modified)
+def course_detail(request, pk):
+    return _detail(request, COURSES, pk)
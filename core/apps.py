@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .fragments import check_shared_cache
+        from .search import repair_after_migrate
+
+        post_migrate.connect(repair_after_migrate, sender=self)
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
@@ -0,0 +1,112 @@
+"""
+Async versions of the query-heavy pages, served instead of the ones in
+``views`` when ``settings.ASYNC_VIEWS`` is on (``asgi.py`` turns it on).
+
+Django's async ORM methods all run on one shared thread, one query after
+another. To overlap independent queries, ``gather_queries`` runs each in a
+worker thread with a database connection of its own. Inside a transaction
+(as in ``TestCase``) or with an in-memory database other connections would not
+see the same data, so there the queries run one after another on the request's
+connection instead.
+
+``live_events`` streams dashboard updates to open pages (see ``core.live``).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+
+from . import fragments, live
+from .counters import read_counters
+from .forms import BulkEnrollmentForm
+from .grading import distribution_rows, letter_distribution
+from .models import Student, Course, Enrollment, Grade
+from .transcripts import get_transcript
+from .views import DASHBOARD_FRAGMENTS, dashboard_context, dashboard_querysets, student_detail_context
+
+
+def _must_share_connection():
+    return any(
+        connection.in_atomic_block or getattr(connection, 'is_in_memory_db', lambda: False)()
+        for connection in connections.all(initialized_only=True)
+    )
+
+
+def _in_worker(function):
+    def run():
+        try:
+            return function()
+        finally:
+            # Worker threads outlive the request; honour CONN_MAX_AGE for them too.
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*functions):
+    """Call the blocking ``functions`` concurrently and return their results in order."""
+    if await sync_to_async(_must_share_connection)():
+        return [await sync_to_async(function)() for function in functions]
+    return await asyncio.gather(*(
+        sync_to_async(_in_worker(function), thread_sensitive=False)() for function in functions
+    ))
+
+
+def _fragment_list(name, queryset):
+    # Only load what the fragment cache is going to render.
+    return queryset if fragments.is_fresh(name) else list(queryset)
+
+
+async def dashboard(request):
+    querysets = dashboard_querysets()
+    names = list(querysets)
+    counts, *lists = await gather_queries(
+        read_counters,
+        *[
+            (lambda name=name: _fragment_list(DASHBOARD_FRAGMENTS[name], querysets[name]))
+            for name in names
+        ],
+    )
+    context = dashboard_context(counts, dict(zip(names, lists)))
+    return await sync_to_async(render)(request, 'dashboard.html', context)
+
+
+async def student_detail(request, pk):
+    student = await aget_object_or_404(Student.objects.select_related('profile_asset', 'summary'), pk=pk)
+    enrollments, transcript = await gather_queries(
+        lambda: list(Enrollment.objects.filter(student=student).select_related('course').with_grade_stats()),
+        lambda: get_transcript(student),
+    )
+    context = await sync_to_async(student_detail_context)(student, enrollments, transcript)
+    return await sync_to_async(render)(request, 'student_detail.html', context)
+
+
+async def course_detail(request, pk):
+    course, enrollments, distribution = await gather_queries(
+        lambda: Course.objects.filter(pk=pk).first(),
+        lambda: list(Enrollment.objects.filter(course_id=pk).select_related('student')),
+        lambda: letter_distribution(Grade.objects.filter(enrollment__course_id=pk)),
+    )
+    if course is None:
+        raise Http404('No Course matches the given query.')
+
+    context = {
+        'course': course,
+        'enrollments': enrollments,
+        'grade_distribution': distribution_rows(course, distribution.get(course.pk, {})),
+        'enroll_form': BulkEnrollmentForm(),
+    }
+    return await sync_to_async(render)(request, 'course_detail.html', context)
+
+
+async def live_events(request):
+    """Server-sent events for open dashboards; see ``core.live``."""
+    response = StreamingHttpResponse(
+        live.stream(live.get_hub(), request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
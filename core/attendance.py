@@ -0,0 +1,539 @@
+"""
+Attendance storage, batch writes and rollups.
+
+Attendance is kept in one of two representations, chosen with the
+``ATTENDANCE_STORAGE`` setting:
+
+* ``'rows'`` (default): one ``Attendance`` row per enrollment per day.
+* ``'bitmap'``: one ``AttendanceBitmap`` per enrollment per month, with two
+  bits per day for the status, plus ``AttendanceRemark`` rows only for days
+  that have remarks.
+
+``record_attendance`` and ``attendance_records`` read and write whichever is
+configured, and ``convert_storage`` copies the data from one to the other.
+A class session produces one record per enrolled student; a whole sheet is
+written with a few bulk statements inside one transaction.
+
+Per-status counts are rolled up by enrollment and month
+(``EnrollmentAttendanceMonth``) and by course and day (``CourseAttendanceDay``).
+Every write applies the difference between the old and new rows to those
+counts, so ``attendance_summary`` reads a handful of pre-aggregated rows
+instead of scanning ``Attendance``. Attendance percentages count Present and
+Late as attended and leave Excused days out of the total.
+"""
+import calendar
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from . import summaries
+from .models import (
+    Attendance, AttendanceBitmap, AttendanceRemark, CourseAttendanceDay, Enrollment, EnrollmentAttendanceMonth,
+)
+
+VALID_STATUSES = {value for value, _ in Attendance.STATUS_CHOICES}
+BATCH_SIZE = 500
+# Rollup column for each attendance status.
+STATUS_FIELDS = {status: status.lower() for status in VALID_STATUSES}
+COUNT_FIELDS = ('present', 'absent', 'late', 'excused')
+STORAGE_BACKENDS = ('rows', 'bitmap')
+
+
+class AttendanceEntry:
+    __slots__ = ('enrollment_id', 'date', 'status', 'remarks')
+
+    def __init__(self, enrollment_id, date, status, remarks=''):
+        self.enrollment_id = enrollment_id
+        self.date = date
+        self.status = status
+        self.remarks = remarks or ''
+
+    @property
+    def key(self):
+        return (self.enrollment_id, self.date)
+
+
+def storage_backend():
+    """The configured attendance storage: ``'rows'`` (default) or ``'bitmap'``."""
+    backend = getattr(settings, 'ATTENDANCE_STORAGE', 'rows')
+    if backend not in STORAGE_BACKENDS:
+        raise ImproperlyConfigured(
+            f"ATTENDANCE_STORAGE must be one of {', '.join(STORAGE_BACKENDS)}, not {backend!r}."
+        )
+    return backend
+
+
+def record_attendance(entries):
+    """
+    Insert or update attendance for every ``AttendanceEntry`` in the
+    configured storage. A later entry for the same enrollment and date wins.
+    Returns the number of records written.
+    """
+    latest = {}
+    for entry in entries:
+        if entry.status not in VALID_STATUSES:
+            raise ValueError(f'Invalid attendance status {entry.status!r}')
+        latest[entry.key] = entry
+    if not latest:
+        return 0
+
+    enrollment_ids = {entry.enrollment_id for entry in latest.values()}
+    with transaction.atomic():
+        owners = list(Enrollment.objects.filter(pk__in=enrollment_ids).values_list('pk', 'course_id', 'student_id'))
+        courses = {pk: course_id for pk, course_id, _ in owners}
+        added = [
+            (entry.enrollment_id, courses.get(entry.enrollment_id), entry.date, entry.status)
+            for entry in latest.values()
+        ]
+        # Create any missing rollup rows first: as a write, it also takes the
+        # SQLite write lock before the current statuses are read below.
+        _ensure_rollup_rows(added)
+        write = _write_bitmaps if storage_backend() == 'bitmap' else _write_rows
+        previous = write(latest)
+        removed = [
+            (enrollment_id, courses.get(enrollment_id), date, status)
+            for (enrollment_id, date), status in previous.items()
+        ]
+        apply_rollup_deltas(removed, added)
+        summaries.refresh(student_id for _, _, student_id in owners)
+    return len(latest)
+
+
+def attendance_records(enrollment_ids, start=None, end=None, remarks=True):
+    """
+    ``AttendanceEntry`` objects for ``enrollment_ids`` (a list or a values
+    queryset) between ``start`` and ``end`` inclusive, from the configured
+    storage, ordered by enrollment and date. With ``remarks=False`` the
+    entries' remarks are left empty.
+    """
+    if storage_backend() == 'bitmap':
+        return _read_bitmaps(enrollment_ids, start, end, remarks)
+    records = Attendance.objects.filter(enrollment_id__in=enrollment_ids)
+    if start is not None:
+        records = records.filter(date__gte=start)
+    if end is not None:
+        records = records.filter(date__lte=end)
+    fields = ('enrollment_id', 'date', 'status', 'remarks') if remarks else ('enrollment_id', 'date', 'status')
+    return [
+        AttendanceEntry(*values)
+        for values in records.order_by('enrollment_id', 'date').values_list(*fields)
+    ]
+
+
+# Row storage
+
+def _write_rows(latest):
+    """Upsert ``Attendance`` rows; returns ``{key: previous status}``."""
+    enrollment_ids = {enrollment_id for enrollment_id, _ in latest}
+    dates = {date for _, date in latest}
+    previous = {
+        (enrollment_id, date): status
+        for enrollment_id, date, status in Attendance.objects.select_for_update().filter(
+            enrollment_id__in=enrollment_ids, date__in=dates,
+        ).order_by().values_list('enrollment_id', 'date', 'status')
+        if (enrollment_id, date) in latest
+    }
+    Attendance.objects.bulk_create(
+        [
+            Attendance(
+                enrollment_id=entry.enrollment_id,
+                date=entry.date,
+                status=entry.status,
+                remarks=entry.remarks,
+            )
+            for entry in latest.values()
+        ],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['enrollment', 'date'],
+        update_fields=['status', 'remarks'],
+    )
+    return previous
+
+
+# Bitmap storage
+
+def _write_bitmaps(latest):
+    """
+    Set each entry's day in its month's ``AttendanceBitmap`` and keep
+    ``AttendanceRemark`` rows only for entries with remarks. Returns
+    ``{key: previous status}``.
+    """
+    months = {(enrollment_id, month_start(date)) for enrollment_id, date in latest}
+    enrollment_ids = {enrollment_id for enrollment_id, _ in months}
+    AttendanceBitmap.objects.bulk_create(
+        [AttendanceBitmap(enrollment_id=enrollment_id, month=month) for enrollment_id, month in months],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    bitmaps = {
+        (bitmap.enrollment_id, bitmap.month): bitmap
+        for bitmap in AttendanceBitmap.objects.select_for_update().filter(
+            enrollment_id__in=enrollment_ids, month__in={month for _, month in months},
+        )
+        if (bitmap.enrollment_id, bitmap.month) in months
+    }
+
+    previous = {}
+    for key, entry in latest.items():
+        bitmap = bitmaps[(entry.enrollment_id, month_start(entry.date))]
+        status = bitmap.status_on(entry.date.day)
+        if status is not None:
+            previous[key] = status
+        bitmap.set_status(entry.date.day, entry.status)
+    AttendanceBitmap.objects.bulk_update(bitmaps.values(), ['days', 'statuses'], batch_size=BATCH_SIZE)
+
+    # Mirror the row storage, where saving an entry replaces its remarks.
+    stale = [
+        pk for pk, enrollment_id, date in AttendanceRemark.objects.filter(
+            enrollment_id__in=enrollment_ids, date__in={date for _, date in latest},
+        ).values_list('pk', 'enrollment_id', 'date')
+        if (enrollment_id, date) in latest and not latest[(enrollment_id, date)].remarks
+    ]
+    if stale:
+        AttendanceRemark.objects.filter(pk__in=stale).delete()
+    AttendanceRemark.objects.bulk_create(
+        [
+            AttendanceRemark(enrollment_id=entry.enrollment_id, date=entry.date, remarks=entry.remarks)
+            for entry in latest.values() if entry.remarks
+        ],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['enrollment', 'date'],
+        update_fields=['remarks'],
+    )
+    return previous
+
+
+def _read_bitmaps(enrollment_ids, start=None, end=None, remarks=True):
+    bitmaps = AttendanceBitmap.objects.filter(enrollment_id__in=enrollment_ids)
+    notes = AttendanceRemark.objects.filter(enrollment_id__in=enrollment_ids)
+    if start is not None:
+        bitmaps = bitmaps.filter(month__gte=month_start(start))
+        notes = notes.filter(date__gte=start)
+    if end is not None:
+        bitmaps = bitmaps.filter(month__lte=end)
+        notes = notes.filter(date__lte=end)
+    notes = {
+        (enrollment_id, date): text
+        for enrollment_id, date, text in notes.values_list('enrollment_id', 'date', 'remarks')
+    } if remarks else {}
+    entries = []
+    for bitmap in bitmaps.order_by('enrollment_id', 'month'):
+        for date, status in bitmap.items():
+            if (start is None or date >= start) and (end is None or date <= end):
+                entries.append(AttendanceEntry(
+                    bitmap.enrollment_id, date, status, notes.get((bitmap.enrollment_id, date), ''),
+                ))
+    return entries
+
+
+def convert_storage(target, batch_size=BATCH_SIZE, delete_source=False):
+    """
+    Copy every attendance record into the ``target`` storage (``'rows'`` or
+    ``'bitmap'``), optionally deleting the source data. Rollups describe the
+    records themselves, so they stay valid. Returns the number of records
+    copied. Switch ``ATTENDANCE_STORAGE`` once this has run.
+    """
+    if target not in STORAGE_BACKENDS:
+        raise ValueError(f'Unknown attendance storage {target!r}.')
+    copied = 0
+    with transaction.atomic():
+        if target == 'bitmap':
+            AttendanceBitmap.objects.all().delete()
+            AttendanceRemark.objects.all().delete()
+            # The unique (enrollment, date) index returns each enrollment's
+            # months one after another, so a bitmap is written as soon as the
+            # next one starts and only a batch is ever held in memory.
+            records = Attendance.objects.order_by('enrollment_id', 'date').values_list(
+                'enrollment_id', 'date', 'status', 'remarks',
+            )
+            bitmaps, notes, bitmap = [], [], None
+            for enrollment_id, date, status, remarks in records.iterator(chunk_size=2000):
+                month = month_start(date)
+                if bitmap is None or (bitmap.enrollment_id, bitmap.month) != (enrollment_id, month):
+                    if bitmap is not None:
+                        bitmaps.append(bitmap)
+                    if len(bitmaps) >= batch_size:
+                        AttendanceBitmap.objects.bulk_create(bitmaps, batch_size=batch_size)
+                        bitmaps = []
+                    bitmap = AttendanceBitmap(enrollment_id=enrollment_id, month=month)
+                bitmap.set_status(date.day, status)
+                if remarks:
+                    notes.append(AttendanceRemark(enrollment_id=enrollment_id, date=date, remarks=remarks))
+                    if len(notes) >= batch_size:
+                        AttendanceRemark.objects.bulk_create(notes, batch_size=batch_size)
+                        notes = []
+                copied += 1
+            if bitmap is not None:
+                bitmaps.append(bitmap)
+            AttendanceBitmap.objects.bulk_create(bitmaps, batch_size=batch_size)
+            AttendanceRemark.objects.bulk_create(notes, batch_size=batch_size)
+            if delete_source:
+                # A plain DELETE: Attendance delete signals would take the
+                # records out of the rollups as well.
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {Attendance._meta.db_table}')
+        else:
+            notes = {
+                (enrollment_id, date): remarks
+                for enrollment_id, date, remarks in AttendanceRemark.objects.values_list(
+                    'enrollment_id', 'date', 'remarks',
+                ).iterator(chunk_size=2000)
+            }
+            rows = []
+            for bitmap in AttendanceBitmap.objects.order_by().iterator(chunk_size=2000):
+                for date, status in bitmap.items():
+                    rows.append(Attendance(
+                        enrollment_id=bitmap.enrollment_id, date=date, status=status,
+                        remarks=notes.get((bitmap.enrollment_id, date), ''),
+                    ))
+                if len(rows) >= batch_size:
+                    copied += _copy_rows(rows, batch_size)
+                    rows = []
+            copied += _copy_rows(rows, batch_size)
+            if delete_source:
+                AttendanceBitmap.objects.all().delete()
+                AttendanceRemark.objects.all().delete()
+    return copied
+
+
+def _copy_rows(rows, batch_size):
+    Attendance.objects.bulk_create(
+        rows, batch_size=batch_size, update_conflicts=True,
+        unique_fields=['enrollment', 'date'], update_fields=['status', 'remarks'],
+    )
+    return len(rows)
+
+
+# Rollups
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def _rollup_keys(rows):
+    months, days = set(), set()
+    for enrollment_id, course_id, date, _ in rows:
+        months.add((enrollment_id, month_start(date)))
+        if course_id is not None:
+            days.add((course_id, date))
+    return months, days
+
+
+def _ensure_rollup_rows(rows):
+    months, days = _rollup_keys(rows)
+    EnrollmentAttendanceMonth.objects.bulk_create(
+        [EnrollmentAttendanceMonth(enrollment_id=enrollment_id, month=month) for enrollment_id, month in months],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    CourseAttendanceDay.objects.bulk_create(
+        [CourseAttendanceDay(course_id=course_id, date=date) for course_id, date in days],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def rollup_deltas(removed, added):
+    """
+    Count changes for rows going away (``removed``) and rows being written
+    (``added``), each an iterable of ``(enrollment_id, course_id, date,
+    status)``. Returns ``(monthly, daily)`` dicts mapping rollup keys to
+    ``{field: delta}``.
+    """
+    monthly, daily = defaultdict(Counter), defaultdict(Counter)
+    for rows, sign in ((removed, -1), (added, 1)):
+        for enrollment_id, course_id, date, status in rows:
+            field = STATUS_FIELDS[status]
+            monthly[(enrollment_id, month_start(date))][field] += sign
+            if course_id is not None:
+                daily[(course_id, date)][field] += sign
+    return monthly, daily
+
+
+def _apply(model, key_fields, deltas):
+    # Keys with the same change on the same month/day share one UPDATE, so a
+    # roster of any size costs a few statements rather than one per student.
+    groups = defaultdict(list)
+    for (owner, period), change in deltas.items():
+        change = tuple(sorted((field, delta) for field, delta in change.items() if delta))
+        if change:
+            groups[(period, change)].append(owner)
+    owner_field, period_field = key_fields
+    for (period, change), owners in groups.items():
+        model.objects.filter(**{f'{owner_field}__in': owners, period_field: period}).update(
+            **{field: F(field) + delta for field, delta in change}
+        )
+
+
+def apply_rollup_deltas(removed, added):
+    """Apply the rollup changes for ``removed`` and ``added`` rows (see ``rollup_deltas``)."""
+    _ensure_rollup_rows(added)
+    monthly, daily = rollup_deltas(removed, added)
+    _apply(EnrollmentAttendanceMonth, ('enrollment_id', 'month'), monthly)
+    _apply(CourseAttendanceDay, ('course_id', 'date'), daily)
+
+
+def rebuild_rollups(attendance=Attendance, month_model=EnrollmentAttendanceMonth, day_model=CourseAttendanceDay):
+    """
+    Recompute both rollup tables from the attendance records. The model
+    arguments let migrations pass their historical models. Returns the number
+    of monthly and daily rows written.
+    """
+    with transaction.atomic():
+        month_model.objects.all().delete()
+        day_model.objects.all().delete()
+        if attendance is Attendance and storage_backend() == 'bitmap':
+            monthly, daily = _bitmap_rollups()
+        else:
+            monthly, daily = _row_rollups(attendance)
+        month_rows = month_model.objects.bulk_create(
+            (month_model(**row) for row in monthly), batch_size=BATCH_SIZE,
+        )
+        day_rows = day_model.objects.bulk_create(
+            (day_model(**row) for row in daily), batch_size=BATCH_SIZE,
+        )
+    return len(month_rows), len(day_rows)
+
+
+def _row_rollups(attendance):
+    counts = {
+        field: Count('pk', filter=Q(status=status))
+        for status, field in STATUS_FIELDS.items()
+    }
+    monthly = (
+        attendance.objects.order_by()
+        .annotate(month=TruncMonth('date'))
+        .values('enrollment_id', 'month')
+        .annotate(**counts)
+    )
+    daily = (
+        attendance.objects.order_by()
+        .values('date', course_id=F('enrollment__course_id'))
+        .annotate(**counts)
+    )
+    return monthly.iterator(chunk_size=2000), daily.iterator(chunk_size=2000)
+
+
+def _bitmap_rollups():
+    monthly, daily = [], defaultdict(Counter)
+    for bitmap in AttendanceBitmap.objects.annotate(
+        course_id=F('enrollment__course_id'),
+    ).order_by().iterator(chunk_size=2000):
+        counts = Counter()
+        for date, status in bitmap.items():
+            counts[STATUS_FIELDS[status]] += 1
+            daily[(bitmap.course_id, date)][STATUS_FIELDS[status]] += 1
+        monthly.append({'enrollment_id': bitmap.enrollment_id, 'month': bitmap.month, **counts})
+    return monthly, [
+        {'course_id': course_id, 'date': date, **counts} for (course_id, date), counts in daily.items()
+    ]
+
+
+class AttendanceSummary:
+    __slots__ = COUNT_FIELDS
+
+    def __init__(self, present=0, absent=0, late=0, excused=0):
+        self.present = present or 0
+        self.absent = absent or 0
+        self.late = late or 0
+        self.excused = excused or 0
+
+    def __add__(self, other):
+        return AttendanceSummary(**{field: getattr(self, field) + getattr(other, field) for field in COUNT_FIELDS})
+
+    @property
+    def total(self):
+        return self.present + self.absent + self.late + self.excused
+
+    @property
+    def attended(self):
+        return self.present + self.late
+
+    @property
+    def percentage(self):
+        counted = self.total - self.excused
+        return round(self.attended / counted * 100, 2) if counted else 0
+
+    def as_dict(self):
+        data = {field: getattr(self, field) for field in COUNT_FIELDS}
+        data['percentage'] = self.percentage
+        return data
+
+
+def _sum_rollups(queryset):
+    return AttendanceSummary(**queryset.aggregate(**{field: Sum(field) for field in COUNT_FIELDS}))
+
+
+def _count_records(enrollment_ids, start, end):
+    counts = Counter(
+        STATUS_FIELDS[entry.status] for entry in attendance_records(enrollment_ids, start, end, remarks=False)
+    )
+    return AttendanceSummary(**counts)
+
+
+def _month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def _split_range(start, end):
+    """
+    Split ``[start, end]`` (either bound may be ``None``) into the whole
+    months it covers and the leftover days at either end. Returns
+    ``(months, edges)``: ``months`` is a ``(first_day, last_day)`` pair, or
+    ``None`` when no month is covered in full, and ``edges`` lists the
+    ``(from, to)`` day ranges outside those months.
+    """
+    one_day = datetime.timedelta(days=1)
+    first = start if start is None or start.day == 1 else _month_end(start) + one_day
+    last = end if end is None or end == _month_end(end) else month_start(end) - one_day
+    if first is not None and last is not None and first > last:
+        return None, [(start, end)]
+    edges = []
+    if start is not None and start != first:
+        edges.append((start, first - one_day))
+    if end is not None and end != last:
+        edges.append((last + one_day, end))
+    return (first, last), edges
+
+
+def attendance_summary(student=None, enrollment=None, course=None, start=None, end=None):
+    """
+    Attendance counts for one ``student``, ``enrollment`` or ``course``,
+    optionally limited to dates between ``start`` and ``end`` inclusive.
+    Course totals come from the daily rollup. Student and enrollment totals
+    come from the monthly rollup, with the days of partially covered months
+    at either end of the range counted from the stored records directly.
+    """
+    if course is not None:
+        days = CourseAttendanceDay.objects.filter(course=course)
+        if start is not None:
+            days = days.filter(date__gte=start)
+        if end is not None:
+            days = days.filter(date__lte=end)
+        return _sum_rollups(days)
+
+    if enrollment is not None:
+        months = EnrollmentAttendanceMonth.objects.filter(enrollment=enrollment)
+        enrollment_ids = [enrollment.pk]
+    elif student is not None:
+        months = EnrollmentAttendanceMonth.objects.filter(enrollment__student=student)
+        enrollment_ids = Enrollment.objects.filter(student=student).values('pk')
+    else:
+        raise ValueError('attendance_summary() needs a student, enrollment or course.')
+
+    months_covered, edges = _split_range(start, end)
+    summary = AttendanceSummary()
+    if months_covered is not None:
+        first, last = months_covered
+        if first is not None:
+            months = months.filter(month__gte=first)
+        if last is not None:
+            months = months.filter(month__lte=last)
+        summary += _sum_rollups(months)
+    for edge_start, edge_end in edges:
+        summary += _count_records(enrollment_ids, edge_start, edge_end)
+    return summary
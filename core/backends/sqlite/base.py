@@ -0,0 +1,93 @@
+"""
+SQLite tuned for serving concurrent requests (``ENGINE = 'core.backends.sqlite'``).
+
+Every new connection gets ``PRAGMAS``:
+
+* ``journal_mode=wal``: readers no longer wait for a writer and a writer no
+  longer waits for readers; only writers queue behind each other.
+* ``synchronous=normal``: in WAL mode a commit is durable across an
+  application crash and the file cannot be corrupted; only a power loss can
+  lose the last commits.
+* ``cache_size``, ``mmap_size`` and ``temp_store`` keep hot pages, and the
+  temporary B-trees of sorts and GROUP BYs, in memory.
+* ``busy_timeout``: a connection that finds the database locked waits for it
+  inside SQLite instead of failing at once.
+
+Set ``transaction_mode: 'IMMEDIATE'`` in ``OPTIONS`` along with this backend.
+Transactions then take the write lock when they begin, instead of at their
+first write. A deferred transaction that reads before it writes can fail
+right away if another connection commits in between, whatever the busy
+timeout.
+
+Statements that still hit ``database is locked`` outside a transaction
+(including the ``BEGIN`` of one) are retried ``LOCK_RETRIES`` times with
+exponential backoff and jitter. A statement inside a transaction is not
+retried: the lock it is waiting for may be held by a transaction that is
+waiting on this one.
+
+``OPTIONS`` may override any of the pragmas (``'pragmas': {...}``), and also
+``lock_retries`` and ``retry_delay``.
+"""
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.backends.sqlite3.base import Database
+
+PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    # Negative values are KiB: 64 MB of page cache per connection.
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+    # Milliseconds.
+    'busy_timeout': 5000,
+}
+LOCK_RETRIES = 3
+# Seconds before the first retry; doubled after every attempt.
+RETRY_DELAY = 0.05
+
+
+def is_locked(exc):
+    return isinstance(exc, Database.OperationalError) and 'is locked' in str(exc)
+
+
+class RetryingCursorWrapper(base.SQLiteCursorWrapper):
+    lock_retries = LOCK_RETRIES
+    retry_delay = RETRY_DELAY
+
+    def execute(self, query, params=None):
+        attempt = 0
+        while True:
+            try:
+                return super().execute(query, params)
+            except Database.OperationalError as exc:
+                if not is_locked(exc) or attempt >= self.lock_retries or self.connection.in_transaction:
+                    raise
+            time.sleep(self.retry_delay * 2 ** attempt * random.uniform(0.5, 1.5))
+            attempt += 1
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**PRAGMAS, **options.get('pragmas', {})}
+        self.lock_retries = options.get('lock_retries', LOCK_RETRIES)
+        self.retry_delay = options.get('retry_delay', RETRY_DELAY)
+        kwargs = super().get_connection_params()
+        for name in ('pragmas', 'lock_retries', 'retry_delay'):
+            kwargs.pop(name, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.lock_retries = self.lock_retries
+        cursor.retry_delay = self.retry_delay
+        return cursor
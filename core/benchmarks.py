@@ -0,0 +1,144 @@
+"""
+Per-view benchmarks against whatever data is in the database (see
+``manage.py generate_dataset``).
+
+Every GET route in ``core.urls`` is requested, plus every admin changelist.
+Routes that take a ``pk`` get a representative object (the first student
+with enrollments, the course with the most active enrollments), and the
+export route is run for each export. After a warm-up request, each route is
+timed ``repeat`` times and its median wall time and query count are kept.
+
+Results can be saved as a JSON baseline and later compared with one. A route
+regresses when it runs more queries than in the baseline, or when its median
+time grows by more than ``tolerance`` and by at least ``min_ms``.
+"""
+import fnmatch
+import json
+import statistics
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from . import urls
+from .exports import EXPORTS
+from .models import Announcement, Attendance, Course, Enrollment, Grade, Student
+
+DATASET_MODELS = (Student, Course, Enrollment, Grade, Attendance, Announcement)
+# Event streams never finish; see manage.py benchmark_live.
+STREAMS = {'live_events'}
+
+
+class Route:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+
+def dataset_size():
+    return {model._meta.model_name: model.objects.count() for model in DATASET_MODELS}
+
+
+def _sample_pks():
+    return {
+        'student': Enrollment.objects.order_by('pk').values_list('student_id', flat=True).first()
+        or Student.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'course': Course.objects.order_by('-active_enrolled', 'pk').values_list('pk', flat=True).first(),
+    }
+
+
+def routes(only=(), skip=()):
+    """Every benchmarked route, filtered by ``fnmatch`` patterns on the route name."""
+    pks = _sample_pks()
+    found = []
+    for pattern in urls.urlpatterns:
+        if not isinstance(pattern, URLPattern) or pattern.name is None or pattern.name in STREAMS:
+            continue
+        converters = pattern.pattern.converters
+        if 'kind' in converters:
+            found += [
+                Route(f'{pattern.name}[{kind}]', reverse(pattern.name, kwargs={'kind': kind}))
+                for kind in EXPORTS
+            ]
+            continue
+        kwargs = {}
+        if 'pk' in converters:
+            model = 'course' if 'course' in pattern.name else 'student'
+            if pks[model] is None:
+                continue
+            kwargs['pk'] = pks[model]
+        found.append(Route(pattern.name, reverse(pattern.name, kwargs=kwargs)))
+    for model in admin.site._registry:
+        name = f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist'
+        found.append(Route(name, reverse(name)))
+    return [
+        route for route in found
+        if (not only or any(fnmatch.fnmatch(route.name, pattern) for pattern in only))
+        and not any(fnmatch.fnmatch(route.name, pattern) for pattern in skip)
+    ]
+
+
+def _get(client, path):
+    response = client.get(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run(route_list, repeat=5):
+    """``{route name: {'ms', 'queries', 'status'}}``; POST-only routes are left out."""
+    results = {}
+    # Requests run as a throwaway superuser so staff-only pages are included.
+    with override_settings(QUERY_PROFILER={'ENABLED': False}), transaction.atomic():
+        user = User.objects.create_superuser('benchmark-user', 'benchmark@example.com', None)
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(user)
+        for route in route_list:
+            if _get(client, route.path).status_code == 405:
+                continue
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = _get(client, route.path)
+                    timings.append(time.perf_counter() - start)
+            results[route.name] = {
+                'ms': round(statistics.median(timings) * 1000, 2),
+                'queries': len(queries),
+                'status': response.status_code,
+            }
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, min_ms=2.0):
+    """
+    ``[(route name, reason)]`` for every route that regressed against the
+    ``baseline`` results. Routes missing from either side are ignored.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append((name, f"{before['queries']} -> {result['queries']} queries"))
+        slower = result['ms'] - before['ms']
+        if slower > before['ms'] * tolerance and slower >= min_ms:
+            regressions.append((name, f"{before['ms']:.1f} -> {result['ms']:.1f} ms"))
+        if result['status'] != before['status']:
+            regressions.append((name, f"status {before['status']} -> {result['status']}"))
+    return regressions
+
+
+def save_baseline(path, results):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({'dataset': dataset_size(), 'routes': results}, indent=2, sort_keys=True) + '\n')
+
+
+def load_baseline(path):
+    return json.loads(path.read_text())
@@ -0,0 +1,121 @@
+"""
+Denormalized headline counters for the dashboard.
+
+Each counter is a row in ``DashboardCounter`` adjusted with ``F()`` updates
+from model signals, so the dashboard reads every number with one primary-key
+lookup instead of running a ``COUNT(*)`` per figure. Writes that bypass
+signals (``bulk_create``, ``QuerySet.update``) are corrected by
+``manage.py reconcile_counters``.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Student, Course, Enrollment, DashboardCounter
+
+
+class CounterSpec:
+    def __init__(self, name, model, **conditions):
+        self.name = name
+        self.model = model
+        self.conditions = conditions
+
+    def matches(self, values):
+        return all(values.get(field) == value for field, value in self.conditions.items())
+
+    def count(self):
+        return self.model.objects.filter(**self.conditions).count()
+
+
+COUNTERS = [
+    CounterSpec('students.total', Student),
+    CounterSpec('students.active', Student, status='Active'),
+    CounterSpec('courses.total', Course),
+    CounterSpec('courses.active', Course, is_active=True),
+    CounterSpec('enrollments.total', Enrollment),
+    CounterSpec('enrollments.active', Enrollment, status='Active'),
+]
+
+COUNTERS_BY_NAME = {spec.name: spec for spec in COUNTERS}
+
+
+def tracked_fields(model):
+    """Fields whose value decides which counters a ``model`` row belongs to."""
+    fields = set()
+    for spec in COUNTERS:
+        if spec.model is model:
+            fields.update(spec.conditions)
+    return fields
+
+
+def counter_deltas(model, before, after):
+    """
+    Work out how each counter changes when a row moves from ``before`` to
+    ``after``. Either side is ``None`` for a created or deleted row.
+    """
+    deltas = {}
+    for spec in COUNTERS:
+        if spec.model is not model:
+            continue
+        delta = int(after is not None and spec.matches(after)) - int(before is not None and spec.matches(before))
+        if delta:
+            deltas[spec.name] = delta
+    return deltas
+
+
+def created_deltas(model, instances):
+    """Combined counter changes for ``instances`` inserted without signals."""
+    fields = tracked_fields(model)
+    total = {}
+    for instance in instances:
+        after = {field: getattr(instance, field) for field in fields}
+        for name, delta in counter_deltas(model, None, after).items():
+            total[name] = total.get(name, 0) + delta
+    return total
+
+
+def apply_deltas(deltas):
+    # update() bypasses auto_now, so stamp the change explicitly.
+    now = timezone.now()
+    for name, delta in deltas.items():
+        updated = DashboardCounter.objects.filter(name=name).update(value=F('value') + delta, updated_at=now)
+        if not updated:
+            # First write since the counter table was created: seed it from
+            # the table itself, which already includes this change.
+            _seed(COUNTERS_BY_NAME[name])
+
+
+def _seed(spec):
+    try:
+        with transaction.atomic():
+            return DashboardCounter.objects.create(name=spec.name, value=spec.count()).value
+    except IntegrityError:
+        return DashboardCounter.objects.get(name=spec.name).value
+
+
+def read_counters():
+    """Return ``{name: value}`` for every dashboard counter in one query."""
+    values = dict(
+        DashboardCounter.objects.filter(name__in=COUNTERS_BY_NAME).values_list('name', 'value')
+    )
+    for name, spec in COUNTERS_BY_NAME.items():
+        if name not in values:
+            values[name] = _seed(spec)
+    return values
+
+
+def reconcile(fix=True):
+    """
+    Recount every counter from its table. Returns ``[(name, stored, actual)]``
+    for counters that had drifted, correcting them unless ``fix`` is false.
+    """
+    drift = []
+    with transaction.atomic():
+        stored = dict(DashboardCounter.objects.select_for_update().values_list('name', 'value'))
+        for spec in COUNTERS:
+            actual = spec.count()
+            if stored.get(spec.name) != actual:
+                drift.append((spec.name, stored.get(spec.name), actual))
+                if fix:
+                    DashboardCounter.objects.update_or_create(name=spec.name, defaults={'value': actual})
+    return drift
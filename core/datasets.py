@@ -0,0 +1,303 @@
+"""
+Reproducible synthetic datasets for development and benchmarks.
+
+``generate`` fills every core model with plausible data: students with a
+persistent ability and punctuality, courses spread over the last few years,
+enrollments whose status follows the course dates, grades drawn around the
+student's ability, and attendance on two class days a week. The same seed,
+options and ``as_of`` date always produce the same rows.
+
+Rows are written in bulk one chunk of students at a time, so memory use
+doesn't grow with the dataset. Bulk inserts skip the signal
+handlers, so the counters, seat counts and attendance rollups are rebuilt
+once at the end, and the affected caches are invalidated.
+"""
+import datetime
+import random
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import attendance, counters, fragments, services, summaries, transcripts
+from .grading import DEFAULT_SCALE
+from .models import (
+    Announcement, Attendance, AttendanceBitmap, Course, Enrollment, Grade, Student,
+)
+
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Kiran', 'Meera',
+    'Neha', 'Nikhil', 'Priya', 'Rahul', 'Riya', 'Rohan', 'Saanvi', 'Sahil', 'Sneha', 'Vikram',
+    'Alex', 'Maria', 'James', 'Sofia', 'Daniel', 'Emma', 'Lucas', 'Olivia', 'Noah', 'Mia',
+)
+LAST_NAMES = (
+    'Sharma', 'Verma', 'Gupta', 'Patel', 'Singh', 'Kumar', 'Reddy', 'Iyer', 'Nair', 'Joshi',
+    'Mehta', 'Rao', 'Das', 'Bose', 'Kapoor', 'Malhotra', 'Smith', 'Garcia', 'Mueller', 'Rossi',
+)
+CITIES = (
+    ('Mumbai', 'Maharashtra'), ('Pune', 'Maharashtra'), ('Delhi', 'Delhi'), ('Bengaluru', 'Karnataka'),
+    ('Chennai', 'Tamil Nadu'), ('Hyderabad', 'Telangana'), ('Kolkata', 'West Bengal'),
+    ('Jaipur', 'Rajasthan'), ('Ahmedabad', 'Gujarat'), ('Kochi', 'Kerala'),
+)
+SUBJECTS = (
+    'Algorithms', 'Databases', 'Operating Systems', 'Networks', 'Machine Learning', 'Statistics',
+    'Linear Algebra', 'Calculus', 'Physics', 'Chemistry', 'Economics', 'Accounting', 'Marketing',
+    'Design', 'Literature', 'History', 'Psychology', 'Biology', 'Web Development', 'Security',
+)
+LEVELS = ('Beginner', 'Intermediate', 'Advanced')
+INSTRUCTORS = tuple(f'Dr. {name}' for name in LAST_NAMES)
+ASSIGNMENTS = ('Quiz', 'Assignment', 'Lab', 'Project', 'Midterm', 'Final Exam')
+# (value, weight)
+GENDERS = (('M', 49), ('F', 49), ('O', 2))
+STUDENT_STATUSES = (('Active', 80), ('Inactive', 8), ('Graduated', 10), ('Suspended', 2))
+FINISHED_STATUSES = (('Completed', 80), ('Failed', 8), ('Dropped', 12))
+RUNNING_STATUSES = (('Active', 92), ('Dropped', 8))
+CHUNK_SIZE = 1000
+BATCH_SIZE = 2000
+MAX_PREFIX_LENGTH = 5  # course codes are the prefix and five digits
+
+
+class Options:
+    """How much to generate. The defaults make a small development database."""
+
+    def __init__(self, students=1000, courses=50, enrollments_per_student=5, grades_per_enrollment=6,
+                 attendance_days=10, announcements=20, seed=0, prefix='SYN', as_of=None):
+        self.students = students
+        self.courses = courses
+        self.enrollments_per_student = min(enrollments_per_student, courses)
+        self.grades_per_enrollment = grades_per_enrollment
+        self.attendance_days = attendance_days
+        self.announcements = announcements
+        self.seed = seed
+        self.prefix = prefix
+        self.as_of = as_of or datetime.date.today()
+
+
+def _choice(rng, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def _bulk_create_dated(model, objs, field):
+    """
+    ``bulk_create`` that keeps the dates set on the ``auto_now_add`` ``field``.
+    The insert stamps the current date; the generated ones are then written
+    back with one prepared ``UPDATE``, leaving the field definition (shared
+    with every other thread) alone.
+    """
+    dates = [getattr(obj, field) for obj in objs]
+    objs = model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    target = model._meta.get_field(field)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {quote(model._meta.db_table)} SET {quote(target.column)} = %s '
+            f'WHERE {quote(model._meta.pk.column)} = %s',
+            [(target.get_db_prep_save(value, connection), obj.pk) for obj, value in zip(objs, dates)],
+        )
+    for obj, value in zip(objs, dates):
+        setattr(obj, field, value)
+    return objs
+
+
+def exists(prefix):
+    return Student.objects.filter(student_id__startswith=prefix).exists() or \
+        Course.objects.filter(course_code__startswith=prefix).exists()
+
+
+def generate(options, progress=None):
+    """
+    Generate a dataset as described by ``options``. ``progress(model, count)``
+    is called after every chunk. Returns ``{model name: rows created}``.
+    """
+    rng = random.Random(options.seed)
+    created = dict.fromkeys(('students', 'courses', 'enrollments', 'grades', 'attendance', 'announcements'), 0)
+
+    def report(name, count):
+        created[name] += count
+        if progress is not None:
+            progress(name, created[name])
+
+    courses = _create_courses(rng, options)
+    report('courses', len(courses))
+    for offset in range(0, options.students, CHUNK_SIZE):
+        with transaction.atomic():
+            counts = _create_chunk(rng, options, courses, offset, min(CHUNK_SIZE, options.students - offset))
+        for name, count in counts.items():
+            report(name, count)
+    report('announcements', _create_announcements(rng, options))
+
+    _rebuild_derived_data()
+    return created
+
+
+def _create_courses(rng, options):
+    expected = options.students * options.enrollments_per_student / max(options.courses, 1)
+    courses = []
+    for index in range(options.courses):
+        start = options.as_of - datetime.timedelta(days=rng.randint(-30, 3 * 365))
+        weeks = rng.choice((8, 10, 12, 12, 16))
+        subject = rng.choice(SUBJECTS)
+        courses.append(Course(
+            course_code=f'{options.prefix}{index:05d}',
+            course_name=f'{rng.choice(LEVELS)} {subject}',
+            description=f'A {weeks}-week course on {subject.lower()}.',
+            credits=rng.choice((2, 3, 3, 4, 4, 5)),
+            instructor=rng.choice(INSTRUCTORS),
+            duration_weeks=weeks,
+            difficulty_level=rng.choice(LEVELS),
+            max_students=max(10, int(expected * rng.uniform(0.9, 1.5))),
+            fees=rng.choice((0, 499, 999, 1499, 2999)),
+            start_date=start,
+            end_date=start + datetime.timedelta(weeks=weeks),
+            is_active=rng.random() < 0.9,
+        ))
+    return Course.objects.bulk_create(courses, batch_size=BATCH_SIZE)
+
+
+def _create_chunk(rng, options, courses, offset, count):
+    students, traits = [], []
+    for index in range(offset, offset + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city, state = rng.choice(CITIES)
+        students.append(Student(
+            first_name=first,
+            last_name=last,
+            email=f'{first}.{last}.{options.prefix}{index}@example.com'.lower(),
+            phone=f'9{rng.randrange(10 ** 9):09d}',
+            date_of_birth=options.as_of - datetime.timedelta(days=rng.randint(17 * 365, 30 * 365)),
+            gender=_choice(rng, GENDERS),
+            address=f'{rng.randint(1, 500)} {rng.choice(LAST_NAMES)} Road',
+            city=city,
+            state=state,
+            postal_code=f'{rng.randint(110000, 799999)}',
+            country='India',
+            enrollment_date=options.as_of - datetime.timedelta(days=rng.randint(0, 4 * 365)),
+            student_id=f'{options.prefix}{index:07d}',
+            status=_choice(rng, STUDENT_STATUSES),
+        ))
+        # (ability, punctuality): the mean grade and the chance of turning up.
+        traits.append((rng.gauss(72, 12), rng.betavariate(12, 1.5)))
+    students = _bulk_create_dated(Student, students, 'enrollment_date')
+
+    enrollments, enrollment_traits = [], []
+    for student, trait in zip(students, traits):
+        for course in rng.sample(courses, options.enrollments_per_student):
+            finished = course.end_date < options.as_of
+            status = _choice(rng, FINISHED_STATUSES if finished else RUNNING_STATUSES)
+            final_grade = ''
+            if status == 'Failed':
+                final_grade = 'F'
+            elif status == 'Completed' and rng.random() < 0.7:
+                final_grade = DEFAULT_SCALE.letter(min(100, max(0, rng.gauss(trait[0], 6))))
+            enrollments.append(Enrollment(
+                student=student,
+                course=course,
+                enrollment_date=course.start_date - datetime.timedelta(days=rng.randint(0, 30)),
+                status=status,
+                final_grade=final_grade,
+                completion_date=course.end_date if status in ('Completed', 'Failed') else None,
+            ))
+            enrollment_traits.append((course, trait))
+    enrollments = _bulk_create_dated(Enrollment, enrollments, 'enrollment_date')
+
+    grades, records = [], []
+    for enrollment, (course, (ability, punctuality)) in zip(enrollments, enrollment_traits):
+        last_day = min(course.end_date, options.as_of)
+        span = max((last_day - course.start_date).days, 0)
+        graded = options.grades_per_enrollment
+        if enrollment.status == 'Dropped':
+            graded //= 3
+        for number in range(graded if span else 0):
+            total = rng.choice((10, 20, 50, 100))
+            percentage = min(100, max(0, rng.gauss(ability, 10)))
+            grades.append((
+                enrollment.pk,
+                f'{ASSIGNMENTS[number % len(ASSIGNMENTS)]} {number // len(ASSIGNMENTS) + 1}',
+                f'{total * percentage / 100:.1f}',
+                total,
+                (course.start_date + datetime.timedelta(days=span * (number + 1) // (graded + 1))).isoformat(),
+                '',
+            ))
+        day, step = course.start_date, 3
+        for _ in range(options.attendance_days):
+            if day > last_day:
+                break
+            roll = rng.random()
+            if roll < punctuality:
+                status = 'Present' if rng.random() < 0.93 else 'Late'
+            else:
+                status = 'Absent' if rng.random() < 0.75 else 'Excused'
+            records.append((enrollment.pk, day, status))
+            # Two class days a week.
+            day += datetime.timedelta(days=step)
+            step = 7 - step
+    _insert(Grade, ('enrollment', 'assignment_name', 'marks_obtained', 'total_marks', 'date', 'remarks'), grades)
+    _write_attendance(records)
+    transcripts.invalidate(student.pk for student in students)
+    return {
+        'students': len(students),
+        'enrollments': len(enrollments),
+        'grades': len(grades),
+        'attendance': len(records),
+    }
+
+
+def _insert(model, fields, rows):
+    """
+    Insert plain tuples of database values. The grade and attendance tables
+    are an order of magnitude bigger than the rest, and building a model
+    instance per row would dominate the run time.
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(
+                f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows[start:start + BATCH_SIZE],
+            )
+
+
+def _write_attendance(records):
+    if attendance.storage_backend() == 'rows':
+        _insert(
+            Attendance, ('enrollment', 'date', 'status', 'remarks'),
+            [(enrollment_id, date.isoformat(), status, '') for enrollment_id, date, status in records],
+        )
+        return
+    bitmaps = {}
+    for enrollment_id, date, status in records:
+        key = (enrollment_id, attendance.month_start(date))
+        if key not in bitmaps:
+            bitmaps[key] = AttendanceBitmap(enrollment_id=enrollment_id, month=key[1])
+        bitmaps[key].set_status(date.day, status)
+    AttendanceBitmap.objects.bulk_create(bitmaps.values(), batch_size=BATCH_SIZE)
+
+
+def _create_announcements(rng, options):
+    announcements = [
+        Announcement(
+            title=f'{rng.choice(SUBJECTS)} {rng.choice(("schedule change", "guest lecture", "exam notice", "results"))}',
+            content=f'Details for {rng.choice(SUBJECTS).lower()} students. ' * rng.randint(1, 5),
+            created_at=datetime.datetime.combine(
+                options.as_of - datetime.timedelta(days=rng.randint(0, 90)), datetime.time(9),
+                tzinfo=datetime.timezone.utc,
+            ),
+            is_active=rng.random() < 0.7,
+            priority=rng.choice(('Low', 'Medium', 'Medium', 'High')),
+        )
+        for _ in range(options.announcements)
+    ]
+    return len(_bulk_create_dated(Announcement, announcements, 'created_at'))
+
+
+def _rebuild_derived_data():
+    counters.reconcile()
+    services.reconcile_seats()
+    # Random enrollment can overfill a course; the real services never do.
+    Course.objects.filter(max_students__lt=F('active_enrolled')).update(max_students=F('active_enrolled'))
+    attendance.rebuild_rollups()
+    summaries.rebuild()
+    for model in (Student, Course, Enrollment, Announcement):
+        fragments.bump(model._meta.label_lower)
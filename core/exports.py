@@ -0,0 +1,288 @@
+"""
+Constant-memory CSV/JSONL exports.
+
+Rows are read with ``values_list(...).iterator()`` so neither model instances
+nor the full result set are ever held in memory, turned into lines one at a
+time and, optionally, pushed through an incremental gzip compressor. The same
+generators feed ``StreamingHttpResponse`` and the ``export_data`` command.
+Under ASGI, ``aiter_chunks`` hands them to the response one chunk at a time;
+Django would otherwise read a sync iterator to the end before sending.
+"""
+import csv
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .attendance import attendance_records, storage_backend
+from .models import Student, Course, Enrollment, Grade, Attendance, AttendanceBitmap
+from .search import search
+from .transcripts import with_transcript
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _student_filter(queryset, params, prefix=''):
+    """Apply the ``student_list`` filters (``q``, ``status``) to ``queryset``."""
+    query = params.get(f'{prefix}q', '')
+    status = params.get(f'{prefix}status', '')
+    if not prefix:
+        if query:
+            queryset = search(queryset, query)
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset
+    students = Student.objects.all()
+    if query:
+        students = search(students, query)
+    if status:
+        students = students.filter(status=status)
+    if query or status:
+        queryset = queryset.filter(**{f'{EXPORT_PATHS[queryset.model]}student__in': students.values('pk')})
+    return queryset
+
+
+def _course_filter(queryset, params, prefix='course_'):
+    """Apply the ``course_list`` filters (``q``, ``difficulty``) to ``queryset``."""
+    query = params.get(f'{prefix}q', '')
+    difficulty = params.get('difficulty', '')
+    if not (query or difficulty):
+        return queryset
+    courses = Course.objects.all()
+    if query:
+        courses = search(courses, query)
+    if difficulty:
+        courses = courses.filter(difficulty_level=difficulty)
+    return queryset.filter(**{f'{EXPORT_PATHS[queryset.model]}course__in': courses.values('pk')})
+
+
+# Path from each exported model to its enrollment.
+EXPORT_PATHS = {
+    Enrollment: '',
+    Grade: 'enrollment__',
+    Attendance: 'enrollment__',
+    AttendanceBitmap: 'enrollment__',
+}
+
+
+def _related_filters(queryset, params):
+    queryset = _student_filter(queryset, params, prefix='student_')
+    return _course_filter(queryset, params)
+
+
+def _transcript_filters(queryset, params):
+    # Only whole students are filtered out, so the GPA windows still see every
+    # enrollment of the students that remain.
+    return with_transcript(_student_filter(queryset, params, prefix='student_'))
+
+
+class Export:
+    def __init__(self, model, columns, filters, ordering=('pk',)):
+        self.model = model
+        self.columns = columns
+        self.filters = filters
+        self.ordering = ordering
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+    def rows(self, params):
+        queryset = self.filters(self.model.objects.all(), params)
+        lookups = [lookup for _, lookup in self.columns]
+        return queryset.order_by(*self.ordering).values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+
+
+class AttendanceExport(Export):
+    """Reads from whichever attendance storage is configured."""
+
+    def rows(self, params):
+        if storage_backend() != 'bitmap':
+            return super().rows(params)
+        return self._bitmap_rows(params)
+
+    def _bitmap_rows(self, params):
+        enrollments = self.filters(AttendanceBitmap.objects.all(), params).values('enrollment_id')
+        labels = Enrollment.objects.filter(pk__in=enrollments).order_by('pk').values_list(
+            'pk', 'student__student_id', 'course__course_code',
+        )
+        # Decode a few hundred enrollments at a time to keep memory flat.
+        batch = {}
+        for pk, student_id, course_code in labels.iterator(chunk_size=CHUNK_SIZE):
+            batch[pk] = (student_id, course_code)
+            if len(batch) >= 500:
+                yield from self._decode(batch)
+                batch = {}
+        yield from self._decode(batch)
+
+    def _decode(self, labels):
+        if not labels:
+            return
+        for entry in attendance_records(list(labels)):
+            student_id, course_code = labels[entry.enrollment_id]
+            yield (None, student_id, course_code, entry.date, entry.status, entry.remarks)
+
+
+EXPORTS = {
+    'students': Export(
+        Student,
+        [
+            ('student_id', 'student_id'),
+            ('first_name', 'first_name'),
+            ('last_name', 'last_name'),
+            ('email', 'email'),
+            ('phone', 'phone'),
+            ('date_of_birth', 'date_of_birth'),
+            ('gender', 'gender'),
+            ('city', 'city'),
+            ('state', 'state'),
+            ('postal_code', 'postal_code'),
+            ('country', 'country'),
+            ('status', 'status'),
+            ('enrollment_date', 'enrollment_date'),
+        ],
+        _student_filter,
+    ),
+    'enrollments': Export(
+        Enrollment,
+        [
+            ('enrollment_id', 'pk'),
+            ('student_id', 'student__student_id'),
+            ('student_first_name', 'student__first_name'),
+            ('student_last_name', 'student__last_name'),
+            ('student_email', 'student__email'),
+            ('course_code', 'course__course_code'),
+            ('course_name', 'course__course_name'),
+            ('instructor', 'course__instructor'),
+            ('credits', 'course__credits'),
+            ('status', 'status'),
+            ('enrollment_date', 'enrollment_date'),
+            ('final_grade', 'final_grade'),
+            ('completion_date', 'completion_date'),
+        ],
+        _related_filters,
+    ),
+    'grades': Export(
+        Grade,
+        [
+            ('grade_id', 'pk'),
+            ('student_id', 'enrollment__student__student_id'),
+            ('course_code', 'enrollment__course__course_code'),
+            ('assignment_name', 'assignment_name'),
+            ('marks_obtained', 'marks_obtained'),
+            ('total_marks', 'total_marks'),
+            ('date', 'date'),
+            ('remarks', 'remarks'),
+        ],
+        _related_filters,
+    ),
+    'attendance': AttendanceExport(
+        Attendance,
+        [
+            ('attendance_id', 'pk'),
+            ('student_id', 'enrollment__student__student_id'),
+            ('course_code', 'enrollment__course__course_code'),
+            ('date', 'date'),
+            ('status', 'status'),
+            ('remarks', 'remarks'),
+        ],
+        _related_filters,
+    ),
+    'transcripts': Export(
+        Enrollment,
+        [
+            ('student_id', 'student__student_id'),
+            ('first_name', 'student__first_name'),
+            ('last_name', 'student__last_name'),
+            ('term_year', 'term_year'),
+            ('season', 'season'),
+            ('course_code', 'course__course_code'),
+            ('course_name', 'course__course_name'),
+            ('credits', 'course__credits'),
+            ('status', 'status'),
+            ('letter', 'letter'),
+            ('grade_points', 'grade_points'),
+            ('term_gpa', 'term_gpa'),
+            ('term_credits', 'term_credits'),
+            ('cumulative_gpa', 'cumulative_gpa'),
+            ('cumulative_credits', 'cumulative_credits'),
+        ],
+        _transcript_filters,
+        ordering=('student__student_id', 'term_year', 'term_season', 'course__course_code'),
+    ),
+}
+
+
+class _LineBuffer:
+    """File-like object that hands back whatever csv.writer wrote last."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(export, rows):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(export.headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(export, rows):
+    headers = export.headers
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(headers, row))) + '\n'
+
+
+def gzip_stream(chunks):
+    """Gzip-compress an iterable of bytes incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _batched_bytes(lines, batch_bytes=64 * 1024):
+    """Group small text lines into larger byte chunks to cut per-write overhead."""
+    buffer, size = [], 0
+    for line in lines:
+        encoded = line.encode('utf-8')
+        buffer.append(encoded)
+        size += len(encoded)
+        if size >= batch_bytes:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def stream_export(kind, params, fmt='csv', compress=False):
+    """Return an iterator of bytes for export ``kind`` filtered by ``params``."""
+    if kind not in EXPORTS:
+        raise ExportError(f'Unknown export {kind!r}; choose from {", ".join(EXPORTS)}.')
+    if fmt not in FORMATS:
+        raise ExportError(f'Unknown format {fmt!r}; choose from {", ".join(FORMATS)}.')
+    export = EXPORTS[kind]
+    rows = export.rows(params)
+    lines = csv_lines(export, rows) if fmt == 'csv' else jsonl_lines(export, rows)
+    chunks = _batched_bytes(lines)
+    return gzip_stream(chunks) if compress else chunks
+
+
+async def aiter_chunks(chunks):
+    """Async iterator over ``chunks``, producing each one in the request's worker thread."""
+    chunks = iter(chunks)
+    # Thread-sensitive, so the database cursor stays on the thread that opened it.
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
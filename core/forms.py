@@ -1,5 +1,6 @@
 from django import forms
 from .models import Student, Course, Enrollment, Grade, Attendance, Announcement
+from .attendance import AttendanceEntry
 
 class StudentForm(forms.ModelForm):
     class Meta:
@@ -90,7 +91,8 @@ class CourseForm(forms.ModelForm):
         fields = [
             'course_code', 'course_name', 'description', 'credits', 
             'instructor', 'duration_weeks', 'difficulty_level', 
-            'max_students', 'fees', 'start_date', 'end_date', 'is_active'
+            'max_students', 'fees', 'start_date', 'end_date', 'is_active',
+            'grading_scale',
         ]
         widgets = {
             'course_code': forms.TextInput(attrs={
@@ -144,6 +146,9 @@ class CourseForm(forms.ModelForm):
             'is_active': forms.CheckboxInput(attrs={
                 'class': 'form-check-input'
             }),
+            'grading_scale': forms.Select(attrs={
+                'class': 'form-control'
+            }),
         }
 
 class EnrollmentForm(forms.ModelForm):
@@ -226,3 +231,77 @@ class AnnouncementForm(forms.ModelForm):
             'priority': forms.Select(attrs={'class': 'form-control'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
+
+class BulkEnrollmentForm(forms.Form):
+    student_ids = forms.CharField(
+        label='Student IDs',
+        widget=forms.Textarea(attrs={
+            'rows': 3,
+            'class': 'form-control',
+            'placeholder': 'STU001, STU002, ...'
+        }),
+    )
+
+    def clean_student_ids(self):
+        codes = list(dict.fromkeys(
+            code for code in self.cleaned_data['student_ids'].replace(',', ' ').split() if code
+        ))
+        students = {student.student_id: student for student in Student.objects.filter(student_id__in=codes)}
+        unknown = [code for code in codes if code not in students]
+        if unknown:
+            raise forms.ValidationError(f"Unknown student IDs: {', '.join(unknown)}")
+        return [students[code] for code in codes]
+
+class AttendanceRosterForm(forms.Form):
+    """One status and remarks field per enrollment on a course's roster."""
+
+    def __init__(self, *args, enrollments, initial_records=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.enrollments = list(enrollments)
+        initial_records = initial_records or {}
+        for enrollment in self.enrollments:
+            status, remarks = initial_records.get(enrollment.pk, ('Present', ''))
+            self.fields[f'status_{enrollment.pk}'] = forms.ChoiceField(
+                choices=Attendance.STATUS_CHOICES,
+                initial=status,
+                widget=forms.Select(attrs={'class': 'form-control'}),
+            )
+            self.fields[f'remarks_{enrollment.pk}'] = forms.CharField(
+                required=False,
+                initial=remarks,
+                widget=forms.TextInput(attrs={
+                    'class': 'form-control',
+                    'placeholder': 'Optional remarks...'
+                }),
+            )
+
+    def rows(self):
+        """``(enrollment, status field, remarks field)`` for the template."""
+        for enrollment in self.enrollments:
+            yield enrollment, self[f'status_{enrollment.pk}'], self[f'remarks_{enrollment.pk}']
+
+    def entries(self, date):
+        for enrollment in self.enrollments:
+            yield AttendanceEntry(
+                enrollment.pk,
+                date,
+                self.cleaned_data[f'status_{enrollment.pk}'],
+                self.cleaned_data[f'remarks_{enrollment.pk}'],
+            )
+
+class ImportFileForm(forms.Form):
+    file = forms.FileField(widget=forms.FileInput(attrs={
+        'class': 'form-control',
+        'accept': '.csv,.xlsx'
+    }))
+    dry_run = forms.BooleanField(
+        required=False,
+        label='Dry run (validate only, save nothing)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
+class StudentImportForm(StudentForm):
+    """StudentForm rules for rows of an import file, which carry no image."""
+
+    class Meta(StudentForm.Meta):
+        fields = [field for field in StudentForm.Meta.fields if field != 'profile_image']
@@ -0,0 +1,178 @@
+"""
+Versioned caching for rendered template fragments.
+
+Every model a fragment depends on has a version number in the cache that is
+bumped whenever a row of that model is saved or deleted. A cached fragment
+remembers the versions it was rendered against, so a write invalidates every
+fragment built from that model without having to know their keys.
+
+With stale-while-revalidate enabled an invalidated fragment keeps being served
+for a short grace period while a single request, holding a cache lock,
+re-renders it. A burst of requests right after a write therefore costs one
+round of queries instead of one per request.
+
+The versions are only as shared as the cache that holds them. With a
+per-process cache such as ``LocMemCache``, a write in one worker process
+leaves the others serving old fragments and ETags. ``manage.py check
+--deploy`` therefore fails (``core.E001``) unless the fragment cache is shared.
+Silence the check for deployments that run a single process.
+
+Versions are bumped when a write commits on the primary, but a read replica
+may not have the write yet. Anything stamped with the versions (fragment
+renders here, API bodies with an ETag) is therefore built from the primary,
+or old rows would be cached under the new version for good.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Error
+
+from . import replicas
+
+FRAGMENTS = {
+    'recent_students': ('core.student',),
+    'recent_enrollments': ('core.enrollment', 'core.student', 'core.course'),
+    'top_courses': ('core.course', 'core.enrollment'),
+    'announcements': ('core.announcement',),
+}
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+    'STALE_WHILE_REVALIDATE': True,
+    'STALE_TIMEOUT': 60,
+    'LOCK_TIMEOUT': 10,
+}
+
+KEY_PREFIX = 'fragments'
+# Cache backends whose contents are private to one process.
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def get_setting(name):
+    return getattr(settings, 'FRAGMENT_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[get_setting('CACHE_ALIAS')]
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """Deployment check: the fragment cache must be shared by every worker process."""
+    alias = get_setting('CACHE_ALIAS')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [Error(
+        f'The fragment cache {alias!r} uses {backend}, which each worker process keeps to itself.',
+        hint=(
+            'Point FRAGMENT_CACHE["CACHE_ALIAS"] at a shared cache such as Redis or Memcached, '
+            'or silence core.E001 if the site runs a single process.'
+        ),
+        id='core.E001',
+    )]
+
+
+def _version_key(label):
+    return f'{KEY_PREFIX}:version:{label}'
+
+
+def _modified_key(label):
+    return f'{KEY_PREFIX}:modified:{label}'
+
+
+def bump(label):
+    """Invalidate every fragment that depends on the model ``label``."""
+    cache = _cache()
+    key = _version_key(label)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing (first write or evicted); any new value invalidates.
+        cache.set(key, time.time_ns(), timeout=None)
+    cache.set(_modified_key(label), time.time(), timeout=None)
+
+
+def current_versions(labels):
+    cache = _cache()
+    keys = [_version_key(label) for label in labels]
+    stored = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in stored}
+    if missing:
+        for key, value in missing.items():
+            if not cache.add(key, value, timeout=None):
+                missing[key] = cache.get(key)
+        stored.update(missing)
+    return tuple(stored[key] for key in keys)
+
+
+def last_modified(labels):
+    """
+    When a row of any of the models ``labels`` was last written, as an aware
+    datetime. Unknown labels count as modified now.
+    """
+    cache = _cache()
+    keys = [_modified_key(label) for label in labels]
+    stored = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in stored:
+            stored[key] = now if cache.add(key, now, timeout=None) else cache.get(key, now)
+    return datetime.datetime.fromtimestamp(max(stored.values()), tz=datetime.timezone.utc)
+
+
+def is_fresh(name):
+    """Whether the cached copy of fragment ``name`` is current and unexpired."""
+    entry = _cache().get(f'{KEY_PREFIX}:{name}')
+    return (
+        entry is not None
+        and entry['expires'] > time.time()
+        and entry['versions'] == current_versions(FRAGMENTS[name])
+    )
+
+
+def get_or_render(name, render):
+    """
+    Return the cached HTML for fragment ``name``, calling ``render()`` to build
+    it when it is missing, expired or invalidated.
+    """
+    cache = _cache()
+    key = f'{KEY_PREFIX}:{name}'
+    versions = current_versions(FRAGMENTS[name])
+    now = time.time()
+    entry = cache.get(key)
+
+    if entry is not None and entry['versions'] == versions and entry['expires'] > now:
+        return entry['html']
+
+    swr = get_setting('STALE_WHILE_REVALIDATE')
+    if entry is not None and swr and entry['stale_until'] > now:
+        if not cache.add(f'{key}:lock', 1, timeout=get_setting('LOCK_TIMEOUT')):
+            # Someone else is already rebuilding it.
+            return entry['html']
+        try:
+            return _store(cache, key, versions, _render(render))
+        finally:
+            cache.delete(f'{key}:lock')
+
+    return _store(cache, key, versions, _render(render))
+
+
+def _render(render):
+    with replicas.primary():
+        return render()
+
+
+def _store(cache, key, versions, html):
+    timeout = get_setting('TIMEOUT')
+    stale_timeout = get_setting('STALE_TIMEOUT') if get_setting('STALE_WHILE_REVALIDATE') else 0
+    now = time.time()
+    cache.set(key, {
+        'versions': versions,
+        'html': html,
+        'expires': now + timeout,
+        'stale_until': now + timeout + stale_timeout,
+    }, timeout=timeout + stale_timeout)
+    return html
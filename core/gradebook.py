@@ -0,0 +1,186 @@
+"""
+Per-course gradebook.
+
+Every grade for a course is fetched with one flat ``values_list`` query and
+scattered into a students x assignments NumPy matrix of percentages. Letters
+(on the course's grading scale), per-assignment statistics and histograms are
+then computed with array operations instead of calling
+``Grade.percentage``/``Grade.grade_letter`` for every cell. Missing grades are ``NaN`` and are ignored by the statistics.
+"""
+import csv
+import io
+
+from .grading import scale_for
+from .models import Enrollment, Grade, grade_percentage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HISTOGRAM_BINS = 10
+
+
+class GradebookUnavailable(RuntimeError):
+    pass
+
+
+def letters_for(percentages, scale):
+    """Letter grades on ``scale`` for an array of percentages; missing cells become ''."""
+    index = np.searchsorted(scale.bounds, percentages, side='right')
+    return np.where(np.isnan(percentages), '', np.asarray(scale.letters)[index])
+
+
+def _optional(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+class Gradebook:
+    def __init__(self, course, students, assignments, percentages):
+        self.course = course
+        self.students = students
+        self.assignments = assignments
+        self.percentages = percentages
+        self.scale = scale_for(course)
+        self.letters = letters_for(percentages, self.scale)
+
+        graded = ~np.isnan(percentages)
+        self.counts = graded.sum(axis=0)
+        filled = np.where(graded, percentages, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.means = filled.sum(axis=0) / self.counts
+            self.stds = np.sqrt((np.where(graded, percentages - self.means, 0.0) ** 2).sum(axis=0) / self.counts)
+            row_counts = graded.sum(axis=1)
+            self.averages = filled.sum(axis=1) / row_counts
+        self.medians = (
+            np.nanmedian(percentages, axis=0) if percentages.size else np.empty(0)
+        )
+
+        # Bucket every graded cell and count per column in one bincount.
+        columns = len(assignments)
+        rows, cols = np.nonzero(graded)
+        values = percentages[rows, cols]
+        bins = np.clip((values // (100 / HISTOGRAM_BINS)).astype(int), 0, HISTOGRAM_BINS - 1)
+        self.histograms = np.bincount(
+            cols * HISTOGRAM_BINS + bins, minlength=columns * HISTOGRAM_BINS,
+        ).reshape(columns, HISTOGRAM_BINS)
+        letters = len(self.scale.letters)
+        letter_index = np.searchsorted(self.scale.bounds, values, side='right')
+        self.letter_counts = np.bincount(
+            cols * letters + letter_index, minlength=columns * letters,
+        ).reshape(columns, letters)
+
+    @property
+    def histogram_labels(self):
+        width = 100 // HISTOGRAM_BINS
+        return [f'{low}-{low + width}' for low in range(0, 100, width)]
+
+    def rows(self):
+        """``(student, average, [(percentage, letter), ...])`` for each student."""
+        percentages = self.percentages.tolist()
+        letters = self.letters.tolist()
+        averages = self.averages.tolist()
+        for index, student in enumerate(self.students):
+            cells = [
+                (None if value != value else value, letter)
+                for value, letter in zip(percentages[index], letters[index])
+            ]
+            average = averages[index]
+            yield student, (None if average != average else round(average, 2)), cells
+
+    def statistics(self):
+        """Per-assignment statistics, in column order."""
+        return [
+            {
+                'assignment': assignment,
+                'count': int(self.counts[index]),
+                'mean': _optional(self.means[index]),
+                'median': _optional(self.medians[index]),
+                'std': _optional(self.stds[index]),
+                'histogram': self.histograms[index].tolist(),
+                'letters': dict(zip(self.scale.letters, self.letter_counts[index].tolist())),
+            }
+            for index, assignment in enumerate(self.assignments)
+        ]
+
+    def as_dict(self):
+        return {
+            'course': self.course.course_code,
+            'assignments': self.assignments,
+            'histogram_bins': self.histogram_labels,
+            'students': [
+                {
+                    'student_id': student['student_id'],
+                    'name': student['name'],
+                    'average': average,
+                    'grades': {
+                        assignment: {'percentage': percentage, 'letter': letter}
+                        for assignment, (percentage, letter) in zip(self.assignments, cells)
+                        if percentage is not None
+                    },
+                }
+                for student, average, cells in self.rows()
+            ],
+            'statistics': self.statistics(),
+        }
+
+    def to_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        header = ['student_id', 'name']
+        for assignment in self.assignments:
+            header += [assignment, f'{assignment} letter']
+        writer.writerow(header + ['average'])
+        for student, average, cells in self.rows():
+            row = [student['student_id'], student['name']]
+            for percentage, letter in cells:
+                row += ['' if percentage is None else percentage, letter]
+            writer.writerow(row + ['' if average is None else average])
+        return output.getvalue()
+
+
+def build_gradebook(course):
+    """Build the ``Gradebook`` for ``course`` with two queries."""
+    if np is None:
+        raise GradebookUnavailable('The gradebook requires the numpy package.')
+
+    enrollments = list(
+        Enrollment.objects.filter(course=course)
+        .order_by('student__last_name', 'student__first_name', 'pk')
+        .values_list('pk', 'student__student_id', 'student__first_name', 'student__last_name')
+    )
+    students = [
+        {'student_id': student_id, 'name': f'{first_name} {last_name}'}
+        for _, student_id, first_name, last_name in enrollments
+    ]
+    grades = list(
+        Grade.objects.filter(enrollment__course=course)
+        .order_by('date', 'pk')
+        .values_list(
+            'enrollment_id', 'assignment_name', grade_percentage(rounded=True),
+        )
+    )
+    if not grades:
+        return Gradebook(course, students, [], np.empty((len(students), 0)))
+
+    enrollment_ids, names, values = zip(*grades)
+    # Columns in the order assignments were first graded.
+    unique_names, first_seen, columns = np.unique(
+        np.asarray(names, dtype=object), return_index=True, return_inverse=True,
+    )
+    order = np.argsort(first_seen, kind='stable')
+    position = np.empty_like(order)
+    position[order] = np.arange(len(order))
+    assignments = unique_names[order].tolist()
+
+    # Enrollment ids are unique, so a sorted copy maps each grade to its row.
+    row_ids = np.asarray([pk for pk, *_ in enrollments])
+    row_order = np.argsort(row_ids)
+    rows = row_order[np.searchsorted(row_ids, enrollment_ids, sorter=row_order)]
+
+    # Rounded in SQL like everywhere else; a zero total gives NULL, i.e. NaN.
+    values = np.asarray(values, dtype=float)
+    percentages = np.full((len(students), len(assignments)), np.nan)
+    # Later grades for the same cell overwrite earlier ones.
+    percentages[rows, position[columns.ravel()]] = values
+    return Gradebook(course, students, assignments, percentages)
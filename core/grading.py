@@ -0,0 +1,136 @@
+"""
+Letter grades on configurable grading scales.
+
+A course uses its ``GradingScale`` or, without one, the standard scale. The
+boundaries of every scale are loaded with one query and cached, so turning
+percentages into letters needs no query per grade:
+
+* in SQL, ``letter_case`` builds a ``CASE`` on the course's scale and the
+  percentage, so grades can be sorted, filtered and counted by letter
+  (``Grade.objects.with_letters()``, ``letter_distribution``);
+* in Python, ``Scale.letter`` bisects the cached boundaries.
+
+The cache is cleared by the signal handlers whenever a scale or boundary
+changes.
+"""
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.db.models.lookups import Exact
+
+from . import replicas
+from .models import Grade, GradeBoundary
+
+# Lower bounds of each letter on the standard scale.
+LETTER_BOUNDARIES = (40, 50, 60, 70, 80, 90)
+LETTERS = ('F', 'D', 'C', 'B', 'B+', 'A', 'A+')
+FAIL_LETTER = LETTERS[0]
+
+CACHE_KEY = 'grading:scales'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class Scale:
+    """``letters[i]`` runs from ``bounds[i - 1]`` up to ``bounds[i]``; ``letters[0]`` is the fail letter."""
+    __slots__ = ('bounds', 'letters')
+
+    def __init__(self, bounds, letters):
+        self.bounds = tuple(bounds)
+        self.letters = tuple(letters)
+
+    @classmethod
+    def from_boundaries(cls, boundaries):
+        """Build a scale from ``(min_percentage, letter)`` pairs."""
+        boundaries = sorted((float(minimum), letter) for minimum, letter in boundaries)
+        return cls([minimum for minimum, _ in boundaries], [FAIL_LETTER, *(letter for _, letter in boundaries)])
+
+    def letter(self, percentage):
+        if percentage is None:
+            return ''
+        return self.letters[bisect_right(self.bounds, percentage)]
+
+    def case(self, expression):
+        """SQL ``CASE`` turning the percentage ``expression`` into a letter."""
+        return Case(
+            *[
+                When(**{f'{expression}__gte': bound}, then=Value(letter))
+                for bound, letter in reversed(list(zip(self.bounds, self.letters[1:])))
+            ],
+            When(**{f'{expression}__isnull': False}, then=Value(FAIL_LETTER)),
+            default=None,
+            output_field=CharField(),
+        )
+
+
+DEFAULT_SCALE = Scale(LETTER_BOUNDARIES, LETTERS)
+
+
+def scales():
+    """``{scale_pk: Scale}`` for every grading scale, from the cache or one query."""
+    table = cache.get(CACHE_KEY)
+    if table is None:
+        boundaries = {}
+        rows = GradeBoundary.objects.order_by().values_list('scale_id', 'min_percentage', 'letter')
+        # Cached until the next change, so not from a replica that may lag.
+        with replicas.primary():
+            rows = list(rows)
+        for scale_id, minimum, letter in rows:
+            boundaries.setdefault(scale_id, []).append((minimum, letter))
+        table = {pk: Scale.from_boundaries(pairs) for pk, pairs in boundaries.items()}
+        cache.set(CACHE_KEY, table, CACHE_TIMEOUT)
+    return table
+
+
+def scale_for(course):
+    return scales().get(course.grading_scale_id, DEFAULT_SCALE)
+
+
+def invalidate():
+    """Forget the cached boundaries now and again once the transaction commits."""
+    cache.delete(CACHE_KEY)
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+def letter_case(expression, scale):
+    """
+    SQL ``CASE`` turning the percentage ``expression`` into a letter on the
+    grading scale whose pk is ``scale`` (a field path, or an expression such as
+    ``OuterRef``), falling back to the standard scale.
+    """
+    table = scales()
+    if not table:
+        return DEFAULT_SCALE.case(expression)
+    if isinstance(scale, str):
+        scale = F(scale)
+    return Case(
+        *[When(Exact(scale, pk), then=grading_scale.case(expression)) for pk, grading_scale in table.items()],
+        default=DEFAULT_SCALE.case(expression),
+        output_field=CharField(),
+    )
+
+
+def letter_distribution(grades=None):
+    """``{course_pk: {letter: count}}`` over ``grades`` (every grade by default), in one query."""
+    if grades is None:
+        grades = Grade.objects.all()
+    distribution = {}
+    for course_id, letter, count in (
+        grades.with_letters().order_by()
+        .values_list('enrollment__course_id', 'letter').annotate(count=Count('pk'))
+    ):
+        distribution.setdefault(course_id, {})[letter] = count
+    return distribution
+
+
+def distribution_rows(course, counts):
+    """``[(letter, count)]`` on the scale of ``course``, best letter first; empty without grades."""
+    if not counts:
+        return []
+    return [(letter, counts.get(letter, 0)) for letter in reversed(scale_for(course).letters)]
+
+
+def course_distribution(course):
+    counts = letter_distribution(Grade.objects.filter(enrollment__course=course)).get(course.pk, {})
+    return distribution_rows(course, counts)
@@ -0,0 +1,200 @@
+"""
+Resized variants of student profile images.
+
+Uploads are hashed before they are stored. An upload whose content already
+exists reuses the stored file and its ``ImageAsset`` instead of being saved
+again. A new upload gets a pending asset, and once the upload commits a worker
+thread writes square WebP and JPEG variants in every size of ``SIZES``. Pages
+then serve a variant close to the size they show instead of the original
+photo, and fall back to the original until the variants are ready.
+
+``manage.py generate_thumbnails`` builds assets for images uploaded before
+this existed, and retries assets that failed or were lost with a restart.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import fragments
+from .models import ImageAsset, Student
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is required by ImageField anyway
+    Image = ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Worker threads resizing images; 0 resizes inline when the upload commits.
+    'WORKERS': 2,
+    # Square edge lengths in pixels.
+    'SIZES': (96, 192, 320),
+    'QUALITY': 80,
+    'DIRECTORY': 'students/variants',
+}
+# format -> (file extension, Pillow format, MIME type)
+FORMATS = {
+    'webp': ('webp', 'WEBP', 'image/webp'),
+    'jpeg': ('jpg', 'JPEG', 'image/jpeg'),
+}
+CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, 'IMAGE_PIPELINE', {}).get(name, DEFAULTS[name])
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def variant_name(content_hash, size, fmt):
+    extension = FORMATS[fmt][0]
+    return f"{get_setting('DIRECTORY')}/{content_hash[:2]}/{content_hash}-{size}.{extension}"
+
+
+def variant_urls(asset, fmt):
+    """``[(size, url)]`` of the ``fmt`` variants of a ready ``asset``."""
+    return [
+        (size, default_storage.url(variant_name(asset.content_hash, size, fmt)))
+        for size in get_setting('SIZES')
+    ]
+
+
+def prepare_upload(student):
+    """
+    Called before ``student`` is saved. Points a new upload at the stored copy
+    of identical content, if there is one, so it isn't written twice.
+    """
+    image = student.profile_image
+    if not image:
+        student.profile_asset = None
+        return
+    if image._committed:
+        return
+    digest = content_hash(image.file)
+    asset = ImageAsset.objects.filter(content_hash=digest).first()
+    if asset is not None and default_storage.exists(asset.original):
+        student.profile_image = asset.original
+        student.profile_asset = asset
+    else:
+        student.profile_asset = None
+        student._uploaded_image_hash = digest
+
+
+def register_upload(student):
+    """Called after ``student`` is saved: record a new upload and queue its variants."""
+    digest = student.__dict__.pop('_uploaded_image_hash', None)
+    if digest is None:
+        return
+    asset, created = ImageAsset.objects.get_or_create(
+        content_hash=digest, defaults={'original': student.profile_image.name},
+    )
+    if not created and asset.original != student.profile_image.name:
+        # The same file was uploaded concurrently, or its stored copy had gone
+        # missing: keep whichever copy exists.
+        if default_storage.exists(asset.original):
+            default_storage.delete(student.profile_image.name)
+            student.profile_image = asset.original
+        else:
+            asset.original = student.profile_image.name
+            asset.status = 'Pending'
+            asset.save(update_fields=['original', 'status'])
+            created = True
+    student.profile_asset = asset
+    Student.objects.filter(pk=student.pk).update(profile_image=student.profile_image.name, profile_asset=asset)
+    if created:
+        transaction.on_commit(lambda: submit(asset.pk))
+
+
+def submit(asset_pk):
+    """Generate the variants of an asset on the worker pool."""
+    global _executor
+    workers = get_setting('WORKERS')
+    if not workers:
+        return _run(asset_pk)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(workers, thread_name_prefix='image-variants')
+    return _executor.submit(_run, asset_pk)
+
+
+def _run(asset_pk):
+    try:
+        generate_variants(ImageAsset.objects.get(pk=asset_pk))
+    except Exception:
+        logger.exception('Could not generate variants for image asset %s', asset_pk)
+    finally:
+        close_old_connections()
+
+
+def _square(image, size):
+    return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+
+
+def generate_variants(asset):
+    """Write every variant of ``asset`` and mark it ready (or failed)."""
+    sizes = sorted(get_setting('SIZES'), reverse=True)
+    try:
+        with default_storage.open(asset.original) as file, Image.open(file) as image:
+            width, height = image.size
+            # Let the JPEG decoder downscale by a power of two while reading;
+            # a phone photo then decodes at a fraction of its size.
+            image.draft('RGB', (sizes[0], sizes[0]))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            for size in sizes:
+                # Shrink step by step so each size resamples the previous one.
+                image = _square(image, size)
+                for fmt, (_, pillow_format, _) in FORMATS.items():
+                    buffer = io.BytesIO()
+                    image.save(buffer, pillow_format, quality=get_setting('QUALITY'))
+                    name = variant_name(asset.content_hash, size, fmt)
+                    if default_storage.exists(name):
+                        default_storage.delete(name)
+                    default_storage.save(name, ContentFile(buffer.getvalue()))
+    except (OSError, ValueError) as exc:
+        logger.warning('Image %s could not be resized: %s', asset.original, exc)
+        ImageAsset.objects.filter(pk=asset.pk).update(status='Failed')
+        return False
+    ImageAsset.objects.filter(pk=asset.pk).update(status='Ready', width=width, height=height)
+    # Cached fragments embed the avatar markup.
+    transaction.on_commit(lambda: fragments.bump(Student._meta.label_lower))
+    return True
+
+
+def backfill(students=None):
+    """
+    Create assets for stored profile images that have none, sharing one asset
+    between identical files. Returns the assets that still need variants.
+    """
+    if students is None:
+        students = Student.objects.all()
+    students = students.filter(profile_asset__isnull=True).exclude(profile_image='').exclude(profile_image=None)
+    for student in students.only('pk', 'profile_image').iterator():
+        try:
+            with default_storage.open(student.profile_image.name) as file:
+                digest = content_hash(file)
+        except OSError:
+            logger.warning('Profile image %s is missing', student.profile_image.name)
+            continue
+        asset, _ = ImageAsset.objects.get_or_create(
+            content_hash=digest, defaults={'original': student.profile_image.name},
+        )
+        Student.objects.filter(pk=student.pk).update(profile_asset=asset)
+    return ImageAsset.objects.exclude(status='Ready')
@@ -0,0 +1,339 @@
+"""
+Streaming bulk imports.
+
+Files are read row by row (CSV through the csv module, XLSX through openpyxl's
+read-only mode) and processed in fixed-size chunks, so memory use depends on
+the chunk size and not on the length of the file. Each chunk is validated,
+then written with ``bulk_create``/``bulk_update`` in its own transaction; rows
+that fail validation are reported and skipped without aborting the import.
+A file that cannot be read (not UTF-8, malformed CSV, a broken workbook)
+raises ``ImportFileError``; chunks before the unreadable part stay written.
+"""
+import codecs
+import csv
+import io
+import zipfile
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+
+from . import counters, fragments, live, summaries, transcripts
+from .forms import StudentImportForm
+from .models import Enrollment, Grade, Student, StudentSummary
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        prefix = 'Dry run: would have ' if self.dry_run else ''
+        return (
+            f'{prefix}created {self.created}, updated {self.updated}; '
+            f'{self.error_count} of {self.rows} row(s) rejected.'
+        )
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def iter_csv(fileobj):
+    if isinstance(fileobj, io.TextIOBase):
+        text = fileobj
+    else:
+        text = codecs.getreader('utf-8-sig')(fileobj)
+    reader = csv.reader(text)
+    try:
+        header = next(reader, None)
+        if header is None:
+            raise ImportFileError('The file is empty.')
+        columns = [_normalize_header(value) for value in header]
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, dict(zip(columns, (value.strip() for value in values)))
+    except UnicodeDecodeError:
+        raise ImportFileError(
+            f'The file is not UTF-8 text (after line {reader.line_num}); save it as "CSV UTF-8" and try again.'
+        )
+    except csv.Error as exc:
+        raise ImportFileError(f'Line {reader.line_num + 1} is not valid CSV: {exc}.')
+
+
+def iter_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFileError('Reading .xlsx files requires the openpyxl package.')
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError, ValueError):
+        raise ImportFileError('The file is not a valid .xlsx workbook.')
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ImportFileError('The workbook is empty.')
+        columns = [_normalize_header(value) for value in header]
+        for line, values in enumerate(rows, start=2):
+            cells = ['' if value is None else str(value).strip() for value in values]
+            if any(cells):
+                yield line, dict(zip(columns, cells))
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename):
+    """Yield ``(line_number, {column: value})`` for every non-blank data row."""
+    name = filename.lower()
+    if name.endswith('.xlsx'):
+        return iter_xlsx(fileobj)
+    if name.endswith('.csv') or name.endswith('.txt'):
+        return iter_csv(fileobj)
+    raise ImportFileError('Unsupported file type; upload a .csv or .xlsx file.')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class RowValidator:
+    """
+    Validate dict rows with a ModelForm's rules (form field cleaning,
+    ``clean_<field>`` hooks and model validation) while building the form only
+    once, instead of instantiating a form per row. Uniqueness is left to the
+    caller.
+    """
+
+    def __init__(self, form_class):
+        self.form = form_class()
+        self.model = form_class._meta.model
+        self.exclude = [field.name for field in self.model._meta.fields if field.name not in self.form.fields]
+        self.defaults = {
+            field.name: field.get_default()
+            for field in self.model._meta.fields
+            if field.name in self.form.fields and field.has_default()
+        }
+
+    def __call__(self, row):
+        form = self.form
+        form.cleaned_data = {}
+        errors = []
+        for name, field in form.fields.items():
+            value = row.get(name, '')
+            if value == '' and name in self.defaults:
+                value = self.defaults[name]
+            try:
+                form.cleaned_data[name] = field.clean(value)
+                if hasattr(form, f'clean_{name}'):
+                    form.cleaned_data[name] = getattr(form, f'clean_{name}')()
+            except ValidationError as exc:
+                errors.append(f"{name}: {'; '.join(exc.messages)}")
+        if errors:
+            raise ValidationError(errors)
+
+        instance = self.model(**form.cleaned_data)
+        try:
+            instance.full_clean(exclude=self.exclude, validate_unique=False, validate_constraints=False)
+        except ValidationError as exc:
+            raise ValidationError([
+                f"{name}: {'; '.join(messages)}" for name, messages in exc.message_dict.items()
+            ])
+        return instance
+
+
+def _require_columns(row, columns):
+    missing = [column for column in columns if column not in row]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+
+
+# Grades
+
+GRADE_COLUMNS = ('student_id', 'course_code', 'assignment_name', 'marks_obtained', 'total_marks')
+
+
+def _clean_grade_row(row, enrollment_lookup, fields):
+    enrollment_id = enrollment_lookup.get((row.get('student_id', ''), row.get('course_code', '')))
+    if enrollment_id is None:
+        raise ValidationError(
+            f"No enrollment for student {row.get('student_id')!r} in course {row.get('course_code')!r}."
+        )
+    assignment_name = fields['assignment_name'].clean(row.get('assignment_name', ''))
+    marks_obtained = fields['marks_obtained'].clean(row.get('marks_obtained', ''))
+    total_marks = fields['total_marks'].clean(row.get('total_marks', ''))
+    if total_marks <= 0:
+        raise ValidationError('total_marks must be greater than zero.')
+    if not 0 <= marks_obtained <= total_marks:
+        raise ValidationError('marks_obtained must be between 0 and total_marks.')
+    return Grade(
+        enrollment_id=enrollment_id,
+        assignment_name=assignment_name,
+        marks_obtained=marks_obtained,
+        total_marks=total_marks,
+        remarks=row.get('remarks', ''),
+    )
+
+
+def _grade_form_fields():
+    return {
+        name: Grade._meta.get_field(name).formfield()
+        for name in ('assignment_name', 'marks_obtained', 'total_marks')
+    }
+
+
+def import_grades(rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Create or update grades from rows keyed by ``student_id``, ``course_code``
+    and ``assignment_name``. An existing grade for the same enrollment and
+    assignment is updated in place. Returns an ``ImportReport``.
+    """
+    report = ImportReport(dry_run=dry_run)
+    fields = _grade_form_fields()
+    # One query for every enrollment instead of one per row.
+    enrollment_lookup = {
+        (student_id, course_code): pk
+        for pk, student_id, course_code in Enrollment.objects.values_list(
+            'pk', 'student__student_id', 'course__course_code'
+        ).order_by().iterator(chunk_size=10000)
+    }
+
+    checked_header = False
+    for chunk in chunked(rows, chunk_size):
+        if not checked_header:
+            _require_columns(chunk[0][1], GRADE_COLUMNS)
+            checked_header = True
+
+        grades = {}
+        for line, row in chunk:
+            report.rows += 1
+            try:
+                grade = _clean_grade_row(row, enrollment_lookup, fields)
+            except ValidationError as exc:
+                report.add_error(line, '; '.join(exc.messages))
+                continue
+            # Later rows for the same enrollment and assignment win.
+            grades[(grade.enrollment_id, grade.assignment_name)] = grade
+
+        if grades:
+            _write_grades(grades, report)
+    return report
+
+
+def _write_grades(grades, report):
+    enrollment_ids = {enrollment_id for enrollment_id, _ in grades}
+    assignment_names = {assignment_name for _, assignment_name in grades}
+    existing = {}
+    for pk, enrollment_id, assignment_name in Grade.objects.filter(
+        enrollment_id__in=enrollment_ids, assignment_name__in=assignment_names,
+    ).order_by('pk').values_list('pk', 'enrollment_id', 'assignment_name'):
+        existing[(enrollment_id, assignment_name)] = pk
+
+    to_create, to_update = [], []
+    for key, grade in grades.items():
+        if key in existing:
+            grade.pk = existing[key]
+            to_update.append(grade)
+        else:
+            to_create.append(grade)
+
+    report.created += len(to_create)
+    report.updated += len(to_update)
+    if report.dry_run:
+        return
+    with transaction.atomic():
+        Grade.objects.bulk_create(to_create, batch_size=500)
+        Grade.objects.bulk_update(to_update, ['marks_obtained', 'total_marks', 'remarks'], batch_size=500)
+        # bulk writes skip the signals that drop cached transcripts and
+        # refresh student summaries.
+        student_ids = list(Enrollment.objects.filter(pk__in=enrollment_ids).values_list('student_id', flat=True))
+        transcripts.invalidate(student_ids)
+        summaries.refresh(student_ids)
+
+
+# Students
+
+STUDENT_COLUMNS = ('first_name', 'last_name', 'email', 'student_id')
+
+
+def _insert_batch_size(model, objs, limit=1000):
+    """Largest batch the database accepts for ``model`` rows, capped at ``limit``."""
+    connection = connections[router.db_for_write(model)]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    return max(1, min(limit, connection.ops.bulk_batch_size(fields, objs)))
+
+
+def import_students(rows, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Create students from rows using ``StudentForm`` rules. Emails and student
+    IDs are checked for duplicates against sets preloaded from the database
+    (and against earlier rows of the same file) rather than with a query per
+    row. Returns an ``ImportReport``.
+    """
+    report = ImportReport(dry_run=dry_run)
+    validate = RowValidator(StudentImportForm)
+    emails = set(Student.objects.values_list('email', flat=True).order_by().iterator(chunk_size=10000))
+    student_ids = set(Student.objects.values_list('student_id', flat=True).order_by().iterator(chunk_size=10000))
+
+    checked_header = False
+    for chunk in chunked(rows, chunk_size):
+        if not checked_header:
+            _require_columns(chunk[0][1], STUDENT_COLUMNS)
+            checked_header = True
+
+        students = []
+        for line, row in chunk:
+            report.rows += 1
+            try:
+                student = validate(row)
+            except ValidationError as exc:
+                report.add_error(line, '; '.join(exc.messages))
+                continue
+            if student.email in emails:
+                report.add_error(line, f'email: A student with email {student.email!r} already exists.')
+                continue
+            if student.student_id in student_ids:
+                report.add_error(line, f'student_id: A student with ID {student.student_id!r} already exists.')
+                continue
+            emails.add(student.email)
+            student_ids.add(student.student_id)
+            students.append(student)
+
+        report.created += len(students)
+        if students and not dry_run:
+            _write_students(students)
+    return report
+
+
+def _write_students(students):
+    with transaction.atomic():
+        Student.objects.bulk_create(students, batch_size=_insert_batch_size(Student, students))
+        # bulk_create skips model signals; keep the dashboard in step and give
+        # each student the (empty) summary its profile page reads.
+        StudentSummary.objects.bulk_create(
+            [StudentSummary(student_id=student.pk) for student in students], batch_size=summaries.BATCH_SIZE,
+        )
+        counters.apply_deltas(counters.created_deltas(Student, students))
+        transaction.on_commit(lambda: fragments.bump(Student._meta.label_lower))
+        live.publish('counters')
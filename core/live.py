@@ -0,0 +1,323 @@
+"""
+Live dashboard updates over server-sent events.
+
+``/live/events/`` (served under ASGI) streams three kinds of events to open
+dashboards, so they no longer have to reload:
+
+* ``announcement``: a new active announcement;
+* ``enrollments``: how many enrollments were just made, and the latest ones
+  with their student and course names;
+* ``counters``: the dashboard counters after students, courses or enrollments
+  changed.
+
+Writers call ``publish`` from the signal handlers and the bulk paths. Once
+the transaction commits, a small message naming the kind and the rows goes to
+the hub of every process serving streams. A hub gathers messages for
+``COALESCE_SECONDS``, loads what changed with at most one query per kind, and
+wakes every connected client with the batch. A burst of writes, such as a
+bulk enrollment, reaches the clients as one batch, and the queries run once
+per process instead of once per client.
+
+Clients all wait on one future that the hub replaces after every batch. There
+is no thread or queue per client, so a process can hold thousands of idle
+streams. A client that reconnects sends ``Last-Event-ID`` and is sent the
+batches it missed, as long as the hub still has them.
+
+With the ``local`` backend a message only reaches the hub of the process that
+wrote. The ``socket`` backend fans messages out to every process on the
+machine through Unix datagram sockets in ``SOCKET_DIR``. It stands in for a
+broker such as Redis pub/sub when several worker processes serve the site.
+"""
+import asyncio
+import atexit
+import collections
+import contextvars
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from . import counters, replicas
+from .models import Announcement, Enrollment
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # 'local' (this process only) or 'socket' (every process on the machine).
+    'BACKEND': 'local',
+    'SOCKET_DIR': None,
+    # Seconds messages are gathered into one batch.
+    'COALESCE_SECONDS': 0.5,
+    # Seconds between comments that keep idle connections open through proxies.
+    'KEEPALIVE_SECONDS': 15,
+    # Batches kept for clients that reconnect.
+    'HISTORY': 100,
+    # Announcements and enrollments sent per batch; older ones in a burst are
+    # only counted.
+    'LATEST': 5,
+    # Milliseconds browsers wait before reconnecting.
+    'RETRY_MS': 5000,
+}
+MAX_MESSAGE = 64 * 1024
+SEND_TIMEOUT = 0.5
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, 'LIVE_EVENTS', {}).get(name, DEFAULTS[name])
+
+
+def publish(kind, pks=()):
+    """Send ``kind`` ('announcement', 'enrollment' or 'counters') to the hubs once the transaction commits."""
+    pks = list(pks)
+    message = {'kind': kind, 'pks': pks[-get_setting('LATEST'):], 'count': len(pks)}
+    transaction.on_commit(lambda: _send(message))
+
+
+def _send(message):
+    if get_setting('BACKEND') == 'socket':
+        _send_to_sockets(json.dumps(message).encode())
+    else:
+        deliver(message)
+
+
+def deliver(message):
+    """Hand ``message`` to this process's hub, from any thread."""
+    hub = _hub
+    if hub is None:
+        # Nobody in this process is listening.
+        return
+    try:
+        hub.loop.call_soon_threadsafe(hub.receive, message)
+    except RuntimeError:
+        # The hub's event loop has been closed.
+        pass
+
+
+def _socket_dir():
+    directory = Path(get_setting('SOCKET_DIR'))
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def _send_to_sockets(data):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        # A hub's queue holds only a few datagrams; give a busy one a moment
+        # to drain it rather than dropping the message.
+        sock.settimeout(SEND_TIMEOUT)
+        for path in _socket_dir().glob('*.sock'):
+            try:
+                sock.sendto(data, str(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Left behind by a process that is gone.
+                path.unlink(missing_ok=True)
+            except TimeoutError:
+                logger.warning('Live events hub at %s is not keeping up; dropped a message.', path)
+
+
+class Pending:
+    """Messages received since the last batch, merged."""
+
+    def __init__(self):
+        self.announcements = []
+        self.enrollments = []
+        self.new_enrollments = 0
+        self.counters = False
+
+    def add(self, message):
+        kind = message.get('kind')
+        if kind == 'announcement':
+            self.announcements += message['pks']
+        elif kind == 'enrollment':
+            self.enrollments += message['pks']
+            self.new_enrollments += message['count']
+        elif kind == 'counters':
+            self.counters = True
+
+
+def load_events(pending):
+    """``[(event name, data)]`` for a batch, with at most one query per kind."""
+    latest = get_setting('LATEST')
+    events = []
+    # Replicas may not have the rows that were just written.
+    with replicas.primary():
+        if pending.announcements:
+            announcements = Announcement.objects.filter(pk__in=pending.announcements[-latest:], is_active=True)
+            events += [
+                ('announcement', {
+                    'id': announcement.pk,
+                    'title': announcement.title,
+                    'content': announcement.content,
+                    'priority': announcement.priority,
+                    'created_at': announcement.created_at,
+                })
+                for announcement in announcements.order_by('created_at', 'pk')
+            ]
+        if pending.enrollments:
+            enrollments = (
+                Enrollment.objects.filter(pk__in=pending.enrollments[-latest:])
+                .select_related('student', 'course').order_by('-pk')
+            )
+            events.append(('enrollments', {
+                'count': pending.new_enrollments,
+                'latest': [
+                    {
+                        'id': enrollment.pk,
+                        'student': enrollment.student.full_name,
+                        'course': enrollment.course.course_name,
+                        'date': enrollment.enrollment_date,
+                    }
+                    for enrollment in enrollments
+                ],
+            }))
+        if pending.counters:
+            events.append(('counters', counters.read_counters()))
+    return events
+
+
+class Hub:
+    """Batches messages and broadcasts them to the streams open in one event loop."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        # Event ids are only meaningful to the hub that issued them.
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.history = collections.deque(maxlen=get_setting('HISTORY'))
+        self.clients = 0
+        self._waiter = loop.create_future()
+        self._pending = None
+        self._tasks = set()
+        self._socket = self._socket_path = None
+
+    def start(self):
+        if get_setting('BACKEND') != 'socket':
+            return
+        self._socket_path = _socket_dir() / f'{os.getpid()}-{self.epoch}.sock'
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(str(self._socket_path))
+        self.loop.add_reader(self._socket.fileno(), self._read_socket)
+        atexit.register(self.close)
+
+    def close(self):
+        if self._socket is None:
+            return
+        try:
+            self.loop.remove_reader(self._socket.fileno())
+        except (RuntimeError, ValueError):
+            pass
+        self._socket.close()
+        self._socket_path.unlink(missing_ok=True)
+        self._socket = None
+
+    def _read_socket(self):
+        while True:
+            try:
+                data = self._socket.recv(MAX_MESSAGE)
+            except BlockingIOError:
+                return
+            try:
+                self.receive(json.loads(data))
+            except ValueError:
+                continue
+
+    def receive(self, message):
+        if self._pending is None:
+            self._pending = Pending()
+            self.loop.call_later(get_setting('COALESCE_SECONDS'), self._start_batch)
+        self._pending.add(message)
+
+    def _start_batch(self):
+        pending, self._pending = self._pending, None
+        if not self.clients:
+            return
+        # Not in the context of the request that happened to start the hub:
+        # its thread-sensitive executor is gone once that request ends.
+        task = self.loop.create_task(self._send_batch(pending), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send_batch(self, pending):
+        # async_views imports the views, which import this module.
+        from .async_views import gather_queries
+        try:
+            events, = await gather_queries(lambda: load_events(pending))
+        except Exception:
+            logger.exception('Could not load live events.')
+            return
+        if events:
+            self.broadcast(events)
+
+    def broadcast(self, events):
+        self.seq += 1
+        self.history.append((self.seq, events))
+        waiter, self._waiter = self._waiter, self.loop.create_future()
+        waiter.set_result(None)
+
+    async def wait(self, timeout):
+        """Wait for the next batch; false if ``timeout`` seconds pass first."""
+        done, _ = await asyncio.wait([self._waiter], timeout=timeout)
+        return bool(done)
+
+    def resume_point(self, last_event_id):
+        """The batch a client reconnecting with ``last_event_id`` saw last."""
+        epoch, _, seq = (last_event_id or '').partition('-')
+        if epoch == self.epoch and seq.isdigit() and int(seq) <= self.seq:
+            return int(seq)
+        return self.seq
+
+    def since(self, seq):
+        return [(number, events) for number, events in self.history if number > seq]
+
+
+def get_hub():
+    """The hub of the running event loop, started on first use."""
+    global _hub
+    loop = asyncio.get_running_loop()
+    with _hub_lock:
+        if _hub is None or _hub.loop is not loop:
+            if _hub is not None:
+                _hub.close()
+            _hub = Hub(loop)
+            _hub.start()
+    return _hub
+
+
+def format_batch(epoch, seq, events):
+    return ''.join(
+        f'id: {epoch}-{seq}\nevent: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+        for name, data in events
+    )
+
+
+async def stream(hub, last_event_id=None):
+    """
+    The text of one client's event stream: the batches it missed, then each
+    new batch as it comes, with keep-alive comments while idle.
+    """
+    hub.clients += 1
+    try:
+        seq = hub.resume_point(last_event_id)
+        yield f"retry: {get_setting('RETRY_MS')}\n\n"
+        while True:
+            batches = hub.since(seq)
+            if batches:
+                seq = batches[-1][0]
+                yield ''.join(format_batch(hub.epoch, number, events) for number, events in batches)
+            elif seq < hub.seq:
+                # Older than the history; skip to the present.
+                seq = hub.seq
+            elif not await hub.wait(get_setting('KEEPALIVE_SECONDS')):
+                yield ': keep-alive\n\n'
+    finally:
+        hub.clients -= 1
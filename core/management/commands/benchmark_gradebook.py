@@ -0,0 +1,125 @@
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.gradebook import HISTOGRAM_BINS, GradebookUnavailable, build_gradebook
+from core.models import Course, Enrollment, Grade, Student
+
+
+def property_gradebook(course):
+    """The per-instance approach: call ``percentage``/``grade_letter`` for every cell."""
+    grades = Grade.objects.filter(enrollment__course=course).select_related('enrollment__student', 'enrollment__course')
+    cells, columns = {}, {}
+    for grade in grades:
+        cells[(grade.enrollment.student.student_id, grade.assignment_name)] = (
+            grade.percentage, grade.grade_letter,
+        )
+        columns.setdefault(grade.assignment_name, []).append(float(grade.percentage))
+    stats = {}
+    for assignment, values in columns.items():
+        histogram = [0] * HISTOGRAM_BINS
+        for value in values:
+            histogram[min(max(int(value // (100 / HISTOGRAM_BINS)), 0), HISTOGRAM_BINS - 1)] += 1
+        stats[assignment] = (
+            statistics.mean(values), statistics.median(values), statistics.pstdev(values), histogram,
+        )
+    return cells, stats
+
+
+class Command(BaseCommand):
+    help = 'Compare the vectorized gradebook with the per-instance property approach.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Benchmark an existing course by code instead of synthetic data.')
+        parser.add_argument('--students', type=int, default=300)
+        parser.add_argument('--assignments', type=int, default=40)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options['course']:
+            course = Course.objects.filter(course_code=options['course']).first()
+            if course is None:
+                raise CommandError(f"No course with code {options['course']!r}.")
+            self.run(course, options['repeat'])
+            return
+        # Synthetic data lives only inside this transaction.
+        with transaction.atomic():
+            course = self.create_dataset(options['students'], options['assignments'])
+            self.run(course, options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_dataset(self, student_count, assignment_count):
+        rng = random.Random(0)
+        course = Course.objects.create(
+            course_code='BENCH-GB', course_name='Gradebook Benchmark', description='Synthetic',
+            credits=3, instructor='Benchmark', max_students=student_count,
+        )
+        students = Student.objects.bulk_create(
+            Student(
+                first_name=f'First{index}', last_name=f'Last{index}',
+                email=f'gradebook-bench-{index}@example.com', phone='0000000000',
+                date_of_birth=date(2000, 1, 1), gender='O', address='Synthetic',
+                student_id=f'BENCH-GB-{index:05d}',
+            )
+            for index in range(student_count)
+        )
+        enrollments = Enrollment.objects.bulk_create(
+            Enrollment(student=student, course=course) for student in students
+        )
+        Grade.objects.bulk_create(
+            (
+                Grade(
+                    enrollment=enrollment, assignment_name=f'Assignment {number + 1}',
+                    marks_obtained=rng.randint(0, 100), total_marks=100,
+                )
+                for enrollment in enrollments
+                for number in range(assignment_count)
+            ),
+            batch_size=2000,
+        )
+        return course
+
+    def time(self, function, course, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function(course)
+            timings.append(time.perf_counter() - start)
+        return result, min(timings)
+
+    def run(self, course, repeat):
+        try:
+            gradebook, vectorized = self.time(build_gradebook, course, repeat)
+        except GradebookUnavailable as exc:
+            raise CommandError(str(exc))
+        (cells, stats), per_instance = self.time(property_gradebook, course, repeat)
+
+        # The two approaches must agree before their timings mean anything.
+        mismatches = 0
+        for student, _, row in gradebook.rows():
+            for assignment, (percentage, letter) in zip(gradebook.assignments, row):
+                expected = cells.get((student['student_id'], assignment))
+                if percentage is None:
+                    mismatches += expected is not None
+                elif expected is None or abs(float(expected[0]) - percentage) > 0.005 or expected[1] != letter:
+                    mismatches += 1
+        for column in gradebook.statistics():
+            mean, median, std, histogram = stats[column['assignment']]
+            if (abs(mean - column['mean']) > 0.01 or abs(median - column['median']) > 0.01
+                    or abs(std - column['std']) > 0.01 or histogram != column['histogram']):
+                mismatches += 1
+
+        self.stdout.write(
+            f'{course.course_code}: {len(gradebook.students)} students x '
+            f'{len(gradebook.assignments)} assignments (best of {repeat})'
+        )
+        self.stdout.write(f'  property-based: {per_instance * 1000:8.1f} ms')
+        self.stdout.write(f'  vectorized:     {vectorized * 1000:8.1f} ms  ({per_instance / vectorized:.1f}x)')
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'  {mismatches} cell(s) or column(s) differ between the two.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('  Results match.'))
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from core import live
+from core.management.commands.benchmark_servers import asgi_scope, percentile
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold idle live-event streams open in several ASGI worker processes, publish '
+        'bursts of changes from this one through the socket backend, and report memory '
+        'per connection, fan-out latency and how many batches each burst became. '
+        'Connections are made in-process, so the server\'s own socket costs are not included.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help='Worker processes holding streams.')
+        parser.add_argument('--connections', type=int, default=2000, help='Streams per worker process.')
+        parser.add_argument('--rounds', type=int, default=5, help='Bursts to publish.')
+        parser.add_argument('--burst', type=int, default=200, help='Changes published per burst.')
+        parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+        parser.add_argument('--socket-dir', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            settings.LIVE_EVENTS = {**settings.LIVE_EVENTS, 'BACKEND': 'socket', 'SOCKET_DIR': options['socket_dir']}
+            asyncio.run(self.work(options))
+            return
+
+        with tempfile.TemporaryDirectory() as directory:
+            settings.LIVE_EVENTS = {**settings.LIVE_EVENTS, 'BACKEND': 'socket', 'SOCKET_DIR': directory}
+            results, published = self.run_workers(directory, options)
+
+        coalesce = live.get_setting('COALESCE_SECONDS')
+        self.stdout.write(
+            f"{options['processes']} processes x {options['connections']} streams, "
+            f"{options['rounds']} bursts of {options['burst']} changes, {coalesce}s coalescing window"
+        )
+        latencies, batches = [], []
+        for index, result in enumerate(results):
+            self.stdout.write(
+                f"  worker {index}: connected in {result['connect_seconds']:.2f}s, "
+                f"{result['bytes_per_connection'] / 1024:.1f} KiB per stream"
+            )
+            for received in result['received']:
+                batches.append(len(received))
+                latencies += [at - published[number] for number, at in received]
+        if not latencies:
+            raise CommandError('No events reached the streams.')
+        self.stdout.write(
+            f"  batches per stream: {min(batches)}-{max(batches)} for {options['rounds']} bursts"
+        )
+        self.stdout.write(
+            f"  publish to delivery (ms): p50 {statistics.median(latencies) * 1000:.1f}, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.1f}"
+        )
+
+    def run_workers(self, directory, options):
+        env = dict(os.environ, DJANGO_ASYNC_VIEWS='1')
+        children = [
+            subprocess.Popen(
+                [
+                    sys.executable, '-m', 'django', 'benchmark_live', '--worker', '--socket-dir', directory,
+                    '--connections', str(options['connections']), '--rounds', str(options['rounds']),
+                ],
+                env=env, cwd=settings.BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for _ in range(options['processes'])
+        ]
+        for child in children:
+            # Each worker prints a line once all of its streams are open.
+            if not child.stdout.readline():
+                raise CommandError(f'Worker failed:\n{child.stderr.read()}')
+
+        published = {}
+        pause = live.get_setting('COALESCE_SECONDS') * 2 + 0.5
+        for number in range(1, options['rounds'] + 1):
+            published[number] = time.time()
+            for _ in range(options['burst']):
+                live.publish('counters')
+            time.sleep(pause)
+
+        results = []
+        for child in children:
+            stdout, stderr = child.communicate()
+            if child.returncode:
+                raise CommandError(f'Worker failed:\n{stderr}')
+            results.append(json.loads(stdout.strip().splitlines()[-1]))
+        return results, published
+
+    async def work(self, options):
+        # Worker process: hold the streams and note when each batch arrives.
+        handler = ASGIHandler()
+        count, rounds = options['connections'], options['rounds']
+        disconnect = asyncio.Event()
+        connected = asyncio.Semaphore(0)
+        received = [[] for _ in range(count)]
+
+        def client(index):
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                body = message.get('body', b'')
+                if body.startswith(b'retry:'):
+                    connected.release()
+                elif b'event: ' in body:
+                    received[index].append((len(received[index]) + 1, time.time()))
+
+            return handler(asgi_scope('/live/events/'), receive, send)
+
+        before = rss_bytes()
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(client(index)) for index in range(count)]
+        for _ in range(count):
+            await connected.acquire()
+        connect_seconds = time.perf_counter() - start
+        bytes_per_connection = (rss_bytes() - before) / count
+        sys.stdout.write('ready\n')
+        sys.stdout.flush()
+
+        deadline = time.monotonic() + rounds * (live.get_setting('COALESCE_SECONDS') * 2 + 0.5) + 30
+        while any(len(batches) < rounds for batches in received) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        self.stdout.write(json.dumps({
+            'connect_seconds': connect_seconds,
+            'bytes_per_connection': bytes_per_connection,
+            'received': received,
+        }))
@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Course, Student
+
+SERVERS = ('wsgi', 'asgi')
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def wsgi_environ(path):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+
+
+def asgi_scope(path):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare p50/p99 latency of the dashboard and detail pages under the WSGI '
+        'and ASGI handlers with concurrent clients. Runs against the configured '
+        'database, so point it at a populated one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per page.')
+        parser.add_argument('--server', choices=SERVERS, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['server']:
+            # Child process: settings were loaded with the matching views.
+            results = self.measure(options['server'], options['clients'], options['requests'])
+            self.stdout.write(json.dumps(results))
+            return
+
+        self.paths()  # fail early on an empty database
+        results = {server: self.run_child(server, options) for server in SERVERS}
+        self.stdout.write(
+            f"{options['clients']} clients, {options['requests']} requests per page "
+            f"(ms; p50 / p99 / requests per second)"
+        )
+        for path in results['wsgi']:
+            self.stdout.write(path)
+            for server in SERVERS:
+                row = results[server][path]
+                self.stdout.write(
+                    f"  {server}: {row['p50']:8.1f} {row['p99']:8.1f} {row['throughput']:8.1f}"
+                )
+
+    def run_child(self, server, options):
+        # ASYNC_VIEWS picks the views when the URLconf is imported, so each
+        # server gets a fresh process.
+        env = dict(os.environ, DJANGO_ASYNC_VIEWS='1' if server == 'asgi' else '0')
+        completed = subprocess.run(
+            [
+                sys.executable, '-m', 'django', 'benchmark_servers', '--server', server,
+                '--clients', str(options['clients']), '--requests', str(options['requests']),
+            ],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f'{server} benchmark failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def paths(self):
+        student = Student.objects.order_by('pk').values_list('pk', flat=True).first()
+        course = Course.objects.order_by('pk').values_list('pk', flat=True).first()
+        if student is None or course is None:
+            raise CommandError('The database needs at least one student and one course.')
+        return ['/dashboard/', f'/students/{student}/', f'/courses/{course}/']
+
+    def measure(self, server, clients, count):
+        paths = self.paths()
+        run = self.run_wsgi if server == 'wsgi' else self.run_asgi
+        results = {}
+        for path in paths:
+            run(path, clients, clients)  # warm up caches and connections
+            start = time.perf_counter()
+            timings = run(path, clients, count)
+            elapsed = time.perf_counter() - start
+            results[path] = {
+                'p50': statistics.median(timings) * 1000,
+                'p99': percentile(timings, 0.99) * 1000,
+                'throughput': count / elapsed,
+            }
+        return results
+
+    def run_wsgi(self, path, clients, count):
+        # A threaded WSGI server: one request per worker thread at a time.
+        handler = WSGIHandler()
+
+        def request(_):
+            start = time.perf_counter()
+            response = handler(wsgi_environ(path), lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(clients) as pool:
+            return list(pool.map(request, range(count)))
+
+    def run_asgi(self, path, clients, count):
+        handler = ASGIHandler()
+
+        async def request():
+            disconnect = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                pass
+
+            start = time.perf_counter()
+            await handler(asgi_scope(path), receive, send)
+            elapsed = time.perf_counter() - start
+            disconnect.set()
+            return elapsed
+
+        async def client(remaining, timings):
+            while remaining:
+                remaining.pop()
+                timings.append(await request())
+
+        async def main():
+            remaining, timings = list(range(count)), []
+            await asyncio.gather(*(client(remaining, timings) for _ in range(clients)))
+            return timings
+
+        return asyncio.run(main())
@@ -0,0 +1,188 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from core.attendance import AttendanceEntry, record_attendance
+from core.management.commands.benchmark_servers import percentile, wsgi_environ
+from core.models import Course, Enrollment, Grade, Student
+
+PROFILES = ('default', 'production')
+
+
+def summarize(timings):
+    if not timings:
+        return {'p50': 0.0, 'p99': 0.0}
+    return {'p50': statistics.median(timings) * 1000, 'p99': percentile(timings, 0.99) * 1000}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure throughput of mixed read and write traffic from several worker processes, '
+        'with the default SQLite settings and with the production profile '
+        '(DJANGO_SQLITE_PROFILE=production). Runs on copies of the configured database, '
+        'so point it at a populated one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes.')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per worker process.')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of traffic per profile.')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Share of requests that write.')
+        parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+        parser.add_argument('--database', help=argparse.SUPPRESS)
+        parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.work(options)))
+            return
+
+        source = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+        if not Enrollment.objects.exists():
+            raise CommandError('The database needs enrollments; see manage.py generate_dataset.')
+        connections.close_all()
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in PROFILES:
+                # A fresh copy per profile: WAL mode sticks to the file.
+                copy = Path(directory) / f'{profile}.sqlite3'
+                with sqlite3.connect(source) as src, sqlite3.connect(copy) as dst:
+                    src.backup(dst)
+                results[profile] = self.run_profile(profile, copy, options)
+
+        self.stdout.write(
+            f"{options['processes']} processes x {options['threads']} threads, "
+            f"{options['write_ratio']:.0%} writes, {options['duration']:.0f}s per profile"
+        )
+        self.stdout.write(
+            f"{'profile':12} {'req/s':>8} {'reads/s':>8} {'writes/s':>8} {'errors':>7} "
+            f"{'read p50':>9} {'read p99':>9} {'write p50':>9} {'write p99':>9}"
+        )
+        for profile, row in results.items():
+            self.stdout.write(
+                f"{profile:12} {row['throughput']:8.1f} {row['reads_per_second']:8.1f} "
+                f"{row['writes_per_second']:8.1f} {row['errors']:7d} "
+                f"{row['read']['p50']:9.1f} {row['read']['p99']:9.1f} "
+                f"{row['write']['p50']:9.1f} {row['write']['p99']:9.1f}"
+            )
+
+    def run_profile(self, profile, database, options):
+        env = dict(os.environ, DJANGO_SQLITE_PROFILE=profile)
+        # Let every process finish starting Django before the clock starts.
+        start_at = time.time() + 3 + options['processes'] * 0.5
+        children = [
+            subprocess.Popen(
+                [
+                    sys.executable, '-m', 'django', 'benchmark_sqlite', '--worker',
+                    '--database', str(database), '--start-at', str(start_at),
+                    '--threads', str(options['threads']), '--duration', str(options['duration']),
+                    '--write-ratio', str(options['write_ratio']),
+                ],
+                env=env, cwd=settings.BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for _ in range(options['processes'])
+        ]
+        reads, writes, errors = [], [], 0
+        for child in children:
+            stdout, stderr = child.communicate()
+            if child.returncode:
+                raise CommandError(f'{profile} worker failed:\n{stderr}')
+            result = json.loads(stdout.strip().splitlines()[-1])
+            reads += result['reads']
+            writes += result['writes']
+            errors += result['errors']
+        duration = options['duration']
+        return {
+            'throughput': (len(reads) + len(writes)) / duration,
+            'reads_per_second': len(reads) / duration,
+            'writes_per_second': len(writes) / duration,
+            'errors': errors,
+            'read': summarize(reads),
+            'write': summarize(writes),
+        }
+
+    def work(self, options):
+        # Worker process: serve the copy made for this run.
+        connections.settings[DEFAULT_DB_ALIAS]['NAME'] = options['database']
+        students = list(Student.objects.values_list('pk', flat=True))
+        courses = list(Course.objects.values_list('pk', flat=True))
+        enrollments = list(Enrollment.objects.values_list('pk', flat=True))
+        connections.close_all()
+        handler = WSGIHandler()
+        paths = (
+            lambda rng: f'/students/{rng.choice(students)}/',
+            lambda rng: f'/courses/{rng.choice(courses)}/',
+            lambda rng: '/api/students/?status=Active&fields=student_id,first_name,last_name',
+        )
+        reads, writes, lock = [], [], threading.Lock()
+        errors = [0]
+
+        def read(rng):
+            response = handler(wsgi_environ(paths[rng.randrange(len(paths))](rng)), lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            # The handler turns a locked database into a 500 response.
+            if response.status_code >= 500:
+                raise OperationalError(f'{response.status_code} response')
+
+        def write(rng):
+            # The same request cycle as a view: the signals open and close
+            # (or keep) the connection.
+            request_started.send(sender=self.__class__)
+            try:
+                enrollment = rng.choice(enrollments)
+                if rng.random() < 0.5:
+                    day = datetime.date(2026, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+                    record_attendance([AttendanceEntry(enrollment, day, rng.choice(('Present', 'Absent', 'Late')))])
+                else:
+                    Grade.objects.create(
+                        enrollment_id=enrollment, assignment_name='Benchmark',
+                        marks_obtained=rng.randint(0, 10), total_marks=10,
+                    )
+            finally:
+                request_finished.send(sender=self.__class__)
+
+        def client(seed, deadline):
+            rng = random.Random(seed)
+            local_reads, local_writes, local_errors = [], [], 0
+            while time.time() < deadline:
+                is_write = rng.random() < options['write_ratio']
+                start = time.perf_counter()
+                try:
+                    (write if is_write else read)(rng)
+                except OperationalError:
+                    local_errors += 1
+                    continue
+                (local_writes if is_write else local_reads).append(time.perf_counter() - start)
+            with lock:
+                reads.extend(local_reads)
+                writes.extend(local_writes)
+                errors[0] += local_errors
+
+        time.sleep(max(options['start_at'] - time.time(), 0))
+        deadline = options['start_at'] + options['duration']
+        threads = [
+            threading.Thread(target=client, args=(f'{os.getpid()}-{index}', deadline))
+            for index in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {'reads': reads, 'writes': writes, 'errors': errors[0]}
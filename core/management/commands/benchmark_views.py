@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every page and API route and every admin changelist against the current database, '
+        'and compare wall time and query counts with a stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per route (median is kept).')
+        parser.add_argument('--baseline', type=Path, default=Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json')
+        parser.add_argument('--save', action='store_true', help='Store the results as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative slowdown before a route counts as regressed.')
+        parser.add_argument('--min-ms', type=float, default=2.0,
+                            help='Slowdowns smaller than this many milliseconds are ignored.')
+        parser.add_argument('--only', action='append', default=[], help='Route name pattern to include (repeatable).')
+        parser.add_argument('--skip', action='append', default=[], help='Route name pattern to exclude (repeatable).')
+
+    def handle(self, *args, **options):
+        route_list = benchmarks.routes(only=options['only'], skip=options['skip'])
+        if not route_list:
+            raise CommandError('No routes match.')
+        results = benchmarks.run(route_list, repeat=options['repeat'])
+
+        baseline = {}
+        if not options['save'] and options['baseline'].exists():
+            stored = benchmarks.load_baseline(options['baseline'])
+            baseline = stored['routes']
+            if stored['dataset'] != benchmarks.dataset_size():
+                self.stdout.write(self.style.WARNING(
+                    'The database does not hold the dataset the baseline was recorded with; '
+                    'timings are not comparable.'
+                ))
+
+        self.stdout.write(f"{'route':48} {'status':>6} {'ms':>9} {'base ms':>9} {'queries':>8} {'base':>5}")
+        for name, result in results.items():
+            before = baseline.get(name, {})
+            self.stdout.write(
+                f"{name:48} {result['status']:>6} {result['ms']:>9.1f} {before.get('ms', ''):>9} "
+                f"{result['queries']:>8} {before.get('queries', ''):>5}"
+            )
+
+        if options['save']:
+            benchmarks.save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['baseline']}."))
+            return
+        if not baseline:
+            self.stdout.write('No baseline to compare with; run with --save to record one.')
+            return
+        regressions = benchmarks.compare(results, baseline, options['tolerance'], options['min_ms'])
+        for name, reason in regressions:
+            self.stdout.write(self.style.ERROR(f'{name}: {reason}'))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s) against the baseline.')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.attendance import BATCH_SIZE, STORAGE_BACKENDS, convert_storage
+
+
+class Command(BaseCommand):
+    help = 'Copy attendance between row storage and packed monthly bitmaps.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=STORAGE_BACKENDS, help='Storage to copy the attendance into.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--delete-source', action='store_true',
+            help='Delete the source records once they have been copied.',
+        )
+
+    def handle(self, *args, **options):
+        copied = convert_storage(
+            options['target'], batch_size=options['batch_size'], delete_source=options['delete_source'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Copied {copied} attendance record(s) to {options['target']} storage."))
+        current = getattr(settings, 'ATTENDANCE_STORAGE', 'rows')
+        if current != options['target']:
+            self.stdout.write(self.style.WARNING(
+                f"ATTENDANCE_STORAGE is still {current!r}; set it to {options['target']!r} to use the copy."
+            ))
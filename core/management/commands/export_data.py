@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exports import EXPORTS, FORMATS, ExportError, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream students, enrollments, grades or attendance to CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Gzip-compress the output.')
+        parser.add_argument('--output', '-o', help='Write to this file instead of standard output.')
+        parser.add_argument('--q', help='Student search (students export).')
+        parser.add_argument('--status', help='Student status (students export).')
+        parser.add_argument('--student-q', help='Only rows for students matching this search.')
+        parser.add_argument('--student-status', help='Only rows for students with this status.')
+        parser.add_argument('--course-q', help='Only rows for courses matching this search.')
+        parser.add_argument('--difficulty', help='Only rows for courses of this difficulty.')
+
+    def handle(self, *args, **options):
+        params = {
+            key: options[key] for key in (
+                'q', 'status', 'student_q', 'student_status', 'course_q', 'difficulty',
+            ) if options[key]
+        }
+        try:
+            stream = stream_export(options['kind'], params, fmt=options['format'], compress=options['gzip'])
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in stream:
+                    output.write(chunk)
+        else:
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,60 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import datasets
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a reproducible synthetic dataset. For a production-sized one try '
+        '--students 100000 --courses 2000 --enrollments-per-student 10 --grades-per-enrollment 10 '
+        '--attendance-days 10.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = datasets.Options()
+        parser.add_argument('--students', type=int, default=defaults.students)
+        parser.add_argument('--courses', type=int, default=defaults.courses)
+        parser.add_argument('--enrollments-per-student', type=int, default=defaults.enrollments_per_student)
+        parser.add_argument('--grades-per-enrollment', type=int, default=defaults.grades_per_enrollment)
+        parser.add_argument('--attendance-days', type=int, default=defaults.attendance_days,
+                            help='Attendance records per enrollment (fewer for courses that just started).')
+        parser.add_argument('--announcements', type=int, default=defaults.announcements)
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--prefix', default=defaults.prefix,
+                            help='Prefix of the generated student IDs and course codes.')
+        parser.add_argument('--as-of', type=datetime.date.fromisoformat,
+                            help='Date the dataset is generated relative to (YYYY-MM-DD, default today).')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if not prefix or len(prefix) > datasets.MAX_PREFIX_LENGTH:
+            raise CommandError(f'--prefix must be 1 to {datasets.MAX_PREFIX_LENGTH} characters.')
+        if datasets.exists(prefix):
+            raise CommandError(f'Students or courses with prefix {prefix!r} already exist; pick another --prefix.')
+        if options['courses'] < 1:
+            raise CommandError('Need at least one course.')
+
+        start = time.perf_counter()
+        created = datasets.generate(
+            datasets.Options(
+                students=options['students'],
+                courses=options['courses'],
+                enrollments_per_student=options['enrollments_per_student'],
+                grades_per_enrollment=options['grades_per_enrollment'],
+                attendance_days=options['attendance_days'],
+                announcements=options['announcements'],
+                seed=options['seed'],
+                prefix=prefix,
+                as_of=options['as_of'],
+            ),
+            progress=self.progress if options['verbosity'] > 1 else None,
+        )
+        for name, count in created.items():
+            self.stdout.write(f'  {name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'Generated in {time.perf_counter() - start:.1f}s.'))
+
+    def progress(self, name, count):
+        self.stdout.write(f'{name}: {count}')
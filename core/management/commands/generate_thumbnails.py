@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import images
+from core.models import ImageAsset
+
+
+class Command(BaseCommand):
+    help = 'Create resized variants for stored profile images that have none, or that failed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate the variants of every image.')
+        parser.add_argument('--workers', type=int, default=images.get_setting('WORKERS') or 1)
+
+    def handle(self, *args, **options):
+        pending = images.backfill()
+        assets = ImageAsset.objects.all() if options['all'] else pending
+        assets = list(assets)
+
+        def generate(asset):
+            try:
+                return images.generate_variants(asset)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max(options['workers'], 1)) as pool:
+            results = list(pool.map(generate, assets))
+        failed = results.count(False)
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {len(results) - failed} image(s).'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} image(s) could not be read; see the log.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.imports import DEFAULT_CHUNK_SIZE, ImportFileError, import_grades, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Import grades from a CSV or XLSX file keyed by student_id, course_code and assignment_name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without saving anything.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as fileobj:
+                report = import_grades(
+                    iter_rows(fileobj, path),
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                )
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+
+        for line, message in report.errors:
+            self.stderr.write(f'line {line}: {message}')
+        if report.error_count > len(report.errors):
+            self.stderr.write(f'... {report.error_count - len(report.errors)} more error(s) not shown')
+        style = self.style.WARNING if report.error_count else self.style.SUCCESS
+        self.stdout.write(style(report.summary()))
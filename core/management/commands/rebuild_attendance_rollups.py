@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.attendance import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the monthly enrollment and daily course attendance rollups from Attendance.'
+
+    def handle(self, *args, **options):
+        months, days = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {months} enrollment-month and {days} course-day rollup row(s).'
+        ))
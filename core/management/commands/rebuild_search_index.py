@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search indexes for students and courses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        tables = search.rebuild(connection)
+        if not tables:
+            raise CommandError(
+                f'Full-text search is not supported on the {connection.vendor!r} backend; '
+                'list views fall back to substring matching.'
+            )
+        for table in tables:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {table}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.summaries import BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-student summaries shown on the student profile page.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Students per batch.')
+
+    def handle(self, *args, **options):
+        count = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} student summar{"y" if count == 1 else "ies"}.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core import counters, services
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard counters and course seat counts from scratch and report any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift; leave the stored counters untouched.',
+        )
+
+    def handle(self, *args, **options):
+        fix = not options['check']
+        drift = counters.reconcile(fix=fix)
+        drift += [
+            (f'{course.course_code}.active_enrolled', stored, actual)
+            for course, stored, actual in services.reconcile_seats(fix=fix)
+        ]
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All counters are in sync.'))
+            return
+        for name, stored, actual in drift:
+            self.stdout.write(self.style.WARNING(f'{name}: stored={stored} actual={actual}'))
+        verb = 'Found' if options['check'] else 'Corrected'
+        self.stdout.write(f'{verb} drift in {len(drift)} counter(s).')
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database into every SQLite read replica (DJANGO_DB_REPLICAS).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep copying every this many seconds instead of once.')
+
+    def handle(self, *args, **options):
+        aliases = replicas.get_setting('ALIASES')
+        if not aliases:
+            raise CommandError('No read replicas are configured; set DJANGO_DB_REPLICAS.')
+        while True:
+            for alias in aliases:
+                start = time.perf_counter()
+                replicas.sync(alias)
+                self.stdout.write(f'Synced {alias} in {time.perf_counter() - start:.2f}s')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.management.base import BaseCommand, CommandError
+
+from core import fragments, transcripts
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute every student\'s transcript in one query and store it in the cache. '
+        'Needs a cache shared with the web processes (Redis, Memcached, database or file based); '
+        'entries in a per-process cache such as LocMemCache are gone when this command exits.'
+    )
+
+    def handle(self, *args, **options):
+        backend = settings.CACHES.get(DEFAULT_CACHE_ALIAS, {}).get('BACKEND')
+        if backend in fragments.PROCESS_LOCAL_BACKENDS:
+            raise CommandError(
+                f'The default cache uses {backend}, which only this process can see, so there is '
+                'nothing to warm. Configure a shared cache backend first.'
+            )
+        start = time.perf_counter()
+        count = transcripts.warm_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f'Cached {count} transcript(s) in {time.perf_counter() - start:.1f}s.'
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_announcement_alter_attendance_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['-enrollment_date', 'id'], name='student_list_seek_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['status', '-enrollment_date', 'id'], name='student_status_seek_idx'),
+        ),
+    ]
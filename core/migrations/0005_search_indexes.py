@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    from core import search
+    search.install(schema_editor.connection)
+
+
+def drop_search_indexes(apps, schema_editor):
+    from core import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_student_list_seek_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:16
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    Student = apps.get_model('core', 'Student')
+    Course = apps.get_model('core', 'Course')
+    Enrollment = apps.get_model('core', 'Enrollment')
+    DashboardCounter = apps.get_model('core', 'DashboardCounter')
+    values = {
+        'students.total': Student.objects.count(),
+        'students.active': Student.objects.filter(status='Active').count(),
+        'courses.total': Course.objects.count(),
+        'courses.active': Course.objects.filter(is_active=True).count(),
+        'enrollments.total': Enrollment.objects.count(),
+        'enrollments.active': Enrollment.objects.filter(status='Active').count(),
+    }
+    DashboardCounter.objects.bulk_create(
+        DashboardCounter(name=name, value=value) for name, value in values.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:19
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_active_enrolled(apps, schema_editor):
+    Course = apps.get_model('core', 'Course')
+    Enrollment = apps.get_model('core', 'Enrollment')
+    active = Enrollment.objects.filter(course=models.OuterRef('pk'), status='Active')
+    totals = active.order_by().values('course').annotate(total=models.Count('pk')).values('total')
+    Course.objects.update(active_enrolled=Coalesce(models.Subquery(totals[:1]), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_dashboard_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='active_enrolled',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_active_enrolled, migrations.RunPython.noop),
+    ]
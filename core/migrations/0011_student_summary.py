@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_image_assets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSummary',
+            fields=[
+                ('present', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('excused', models.PositiveIntegerField(default=0)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='core.student')),
+                ('active_courses', models.PositiveIntegerField(default=0)),
+                ('completed_courses', models.PositiveIntegerField(default=0)),
+                ('dropped_courses', models.PositiveIntegerField(default=0)),
+                ('failed_courses', models.PositiveIntegerField(default=0)),
+                ('average_grade', models.FloatField(blank=True, null=True)),
+                ('recent_grades', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
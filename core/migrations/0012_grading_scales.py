@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:11
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_student_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradingScale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='grading_scale',
+            field=models.ForeignKey(blank=True, help_text='Leave empty for the standard scale (A+ from 90%, A from 80%, ... D from 40%).', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='courses', to='core.gradingscale'),
+        ),
+        migrations.CreateModel(
+            name='GradeBoundary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('letter', models.CharField(choices=[('A+', 'A+'), ('A', 'A'), ('B+', 'B+'), ('B', 'B'), ('C', 'C'), ('D', 'D')], max_length=2)),
+                ('min_percentage', models.DecimalField(decimal_places=2, max_digits=5, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)])),
+                ('scale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boundaries', to='core.gradingscale')),
+            ],
+            options={
+                'ordering': ['scale', 'min_percentage'],
+                'unique_together': {('scale', 'letter'), ('scale', 'min_percentage')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:31
+
+import core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_grading_scales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchEntry',
+            fields=[
+                ('course', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='core.course')),
+                ('document', core.models.SearchDocumentField(db_column='core_course_fts')),
+            ],
+            options={
+                'db_table': 'core_course_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentSearchEntry',
+            fields=[
+                ('student', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='core.student')),
+                ('document', core.models.SearchDocumentField(db_column='core_student_fts')),
+            ],
+            options={
+                'db_table': 'core_student_fts',
+                'managed': False,
+            },
+        ),
+    ]
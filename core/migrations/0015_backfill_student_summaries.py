@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def backfill_summaries(apps, schema_editor):
+    # 0011 created the table empty, leaving every existing student on the
+    # slow compute-on-read path. The summaries are built from the current
+    # models, which match the schema as of this migration.
+    from core import replicas, summaries
+
+    with replicas.primary():
+        summaries.rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_replica_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,47 @@
-from django.db import models
+import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models, router, transaction
+from django.db.models import Avg, Count, F, FloatField, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+class StudentQuerySet(models.QuerySet):
+    LIST_FIELDS = (
+        'first_name', 'last_name', 'email', 'phone', 'city',
+        'enrollment_date', 'student_id', 'status', 'profile_image',
+    )
+
+    def for_list(self):
+        """Load only the columns rendered by the student list."""
+        return self.select_related('profile_asset').only(
+            *self.LIST_FIELDS, 'profile_asset__content_hash', 'profile_asset__status',
+        )
+
+class ImageAsset(models.Model):
+    """
+    An uploaded image, stored once per distinct content. Resized variants are
+    generated in the background by core.images.
+    """
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Ready', 'Ready'),
+        ('Failed', 'Failed'),
+    ]
+    
+    content_hash = models.CharField(max_length=64, unique=True)
+    original = models.CharField(max_length=255, help_text='Storage name of the uploaded file')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.original} ({self.status})"
+
 class Student(models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
@@ -33,13 +72,22 @@ class Student(models.Model):
     student_id = models.CharField(max_length=20, unique=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Active')
     profile_image = models.ImageField(upload_to='students/', null=True, blank=True)
+    profile_asset = models.ForeignKey(
+        ImageAsset, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='students',
+    )
     parent_name = models.CharField(max_length=200, blank=True)
     parent_phone = models.CharField(max_length=15, blank=True)
     emergency_contact = models.CharField(max_length=15, blank=True)
     blood_group = models.CharField(max_length=5, blank=True)
     
+    objects = StudentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-enrollment_date']
+        indexes = [
+            models.Index(fields=['-enrollment_date', 'id'], name='student_list_seek_idx'),
+            models.Index(fields=['status', '-enrollment_date', 'id'], name='student_status_seek_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.student_id})"
@@ -53,6 +101,41 @@ class Student(models.Model):
         today = timezone.now().date()
         return today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
 
+class GradingScale(models.Model):
+    """
+    Lower percentage bounds of the letter grades, attached to courses. Courses
+    without one use the standard scale in core.grading.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    description = models.TextField(blank=True)
+    
+    def __str__(self):
+        return self.name
+
+class GradeBoundary(models.Model):
+    """The lowest percentage that earns ``letter``; anything below every boundary is an F."""
+    LETTER_CHOICES = [
+        ('A+', 'A+'),
+        ('A', 'A'),
+        ('B+', 'B+'),
+        ('B', 'B'),
+        ('C', 'C'),
+        ('D', 'D'),
+    ]
+    
+    scale = models.ForeignKey(GradingScale, on_delete=models.CASCADE, related_name='boundaries')
+    letter = models.CharField(max_length=2, choices=LETTER_CHOICES)
+    min_percentage = models.DecimalField(
+        max_digits=5, decimal_places=2, validators=[MinValueValidator(0), MaxValueValidator(100)],
+    )
+    
+    class Meta:
+        unique_together = [('scale', 'letter'), ('scale', 'min_percentage')]
+        ordering = ['scale', 'min_percentage']
+    
+    def __str__(self):
+        return f"{self.scale}: {self.letter} from {self.min_percentage}%"
+
 class Course(models.Model):
     DIFFICULTY_CHOICES = [
         ('Beginner', 'Beginner'),
@@ -72,17 +155,71 @@ class Course(models.Model):
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    grading_scale = models.ForeignKey(
+        GradingScale, on_delete=models.PROTECT, null=True, blank=True, related_name='courses',
+        help_text='Leave empty for the standard scale (A+ from 90%, A from 80%, ... D from 40%).',
+    )
+    # Denormalized number of Active enrollments, maintained with F() updates by
+    # core.services and core.signals. Never assign it directly.
+    active_enrolled = models.PositiveIntegerField(default=0, editable=False, db_index=True)
     
     def __str__(self):
         return f"{self.course_code} - {self.course_name}"
     
+    def save(self, *args, **kwargs):
+        if self.pk is None and not self._state.adding:
+            # Saved again after delete(), which also removed its enrollments.
+            self.active_enrolled = 0
+        elif (
+            self.pk is not None and not self._state.adding
+            and kwargs.get('update_fields') is None and not kwargs.get('force_insert')
+        ):
+            # Don't write back a possibly stale seat counter when editing.
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'active_enrolled'
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def enrolled_count(self):
-        return self.enrollment_set.filter(status='Active').count()
+        return self.active_enrolled
     
     @property
     def seats_available(self):
-        return self.max_students - self.enrolled_count
+        return max(self.max_students - self.active_enrolled, 0)
+
+PERCENTAGE_PLACES = 2
+
+def grade_percentage(prefix='', rounded=False):
+    """
+    SQL expression for a grade's percentage, optionally through a relation.
+    ``rounded`` rounds it half up to ``PERCENTAGE_PLACES`` like
+    ``Grade.percentage``, so letters computed in SQL and in Python agree at
+    the boundaries.
+    """
+    percentage = (
+        Cast(F(f'{prefix}marks_obtained'), FloatField()) * 100.0
+        / Cast(F(f'{prefix}total_marks'), FloatField())
+    )
+    return Round(percentage, PERCENTAGE_PLACES) if rounded else percentage
+
+class EnrollmentQuerySet(models.QuerySet):
+    def with_grade_stats(self):
+        """
+        Annotate each enrollment with ``grade_avg``, ``grade_count``,
+        ``grade_min``, ``grade_max`` and ``latest_grade`` (all percentages)
+        computed in SQL.
+        """
+        percentage = grade_percentage('grade__')
+        latest = Grade.objects.filter(enrollment=OuterRef('pk')).order_by('-date', '-pk')
+        return self.annotate(
+            grade_avg=Avg(percentage),
+            grade_count=Count('grade'),
+            grade_min=Min(percentage),
+            grade_max=Max(percentage),
+            latest_grade=Subquery(latest.annotate(value=grade_percentage()).values('value')[:1]),
+        )
 
 class Enrollment(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
@@ -97,6 +234,8 @@ class Enrollment(models.Model):
     final_grade = models.CharField(max_length=2, blank=True)
     completion_date = models.DateField(null=True, blank=True)
     
+    objects = EnrollmentQuerySet.as_manager()
+    
     class Meta:
         unique_together = ('student', 'course')
         ordering = ['-enrollment_date']
@@ -104,13 +243,42 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student} enrolled in {self.course}"
     
+    def clean(self):
+        # Friendly check for the admin and EnrollmentForm; the seat claim made
+        # when saving (see core.signals) is the one that cannot race.
+        if self.status != 'Active' or self.course_id is None:
+            return
+        if not self._state.adding:
+            stored = Enrollment.objects.filter(pk=self.pk).values('course_id', 'status').first()
+            if stored == {'course_id': self.course_id, 'status': 'Active'}:
+                return  # Already holds its seat.
+        course = Course.objects.only('max_students', 'active_enrolled').get(pk=self.course_id)
+        if course.active_enrolled >= course.max_students:
+            raise ValidationError({'course': f'{self.course} has no seats left.'})
+    
+    def save(self, *args, **kwargs):
+        # The post_save seat claim may raise CourseFull; roll the row back with it.
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Enrollment, instance=self)):
+            super().save(*args, **kwargs)
+    
     @property
     def average_grade(self):
-        grades = self.grade_set.all()
-        if grades:
-            total = sum((g.marks_obtained / g.total_marks) * 100 for g in grades)
-            return round(total / len(grades), 2)
-        return 0
+        if hasattr(self, 'grade_avg'):
+            average = self.grade_avg
+        else:
+            average = self.grade_set.aggregate(value=Avg(grade_percentage()))['value']
+        return round(average, 2) if average is not None else 0
+
+class GradeQuerySet(models.QuerySet):
+    def with_letters(self):
+        """
+        Annotate each grade with its ``percent`` and its ``letter`` on the
+        grading scale of its course, computed in SQL.
+        """
+        from .grading import letter_case  # core.grading imports the models
+        return self.annotate(percent=grade_percentage(rounded=True)).annotate(
+            letter=letter_case('percent', 'enrollment__course__grading_scale'),
+        )
 
 class Grade(models.Model):
     enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE)
@@ -120,6 +288,8 @@ class Grade(models.Model):
     date = models.DateField(auto_now_add=True)
     remarks = models.TextField(blank=True)
     
+    objects = GradeQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-date']
     
@@ -128,28 +298,43 @@ class Grade(models.Model):
     
     @property
     def percentage(self):
-        return round((self.marks_obtained / self.total_marks) * 100, 2)
+        # Unsaved grades may hold ints or floats.
+        percentage = Decimal(str(self.marks_obtained)) / Decimal(str(self.total_marks)) * 100
+        return percentage.quantize(Decimal(1).scaleb(-PERCENTAGE_PLACES), ROUND_HALF_UP)
     
     @property
     def grade_letter(self):
-        perc = self.percentage
-        if perc >= 90: return 'A+'
-        elif perc >= 80: return 'A'
-        elif perc >= 70: return 'B+'
-        elif perc >= 60: return 'B'
-        elif perc >= 50: return 'C'
-        elif perc >= 40: return 'D'
-        else: return 'F'
+        """
+        The letter on the course's grading scale. Lists should load grades
+        ``with_letters()`` or with ``select_related('enrollment__course')``;
+        otherwise each grade looks up its course's scale with a query.
+        """
+        if hasattr(self, 'letter'):
+            return self.letter
+        from .grading import DEFAULT_SCALE, scales, scale_for  # core.grading imports the models
+        if not self.enrollment_id:
+            scale = DEFAULT_SCALE
+        elif Grade.enrollment.is_cached(self) and Enrollment.course.is_cached(self.enrollment):
+            scale = scale_for(self.enrollment.course)
+        else:
+            scale_id = (
+                Enrollment.objects.filter(pk=self.enrollment_id)
+                .values_list('course__grading_scale', flat=True).first()
+            )
+            scale = scales().get(scale_id, DEFAULT_SCALE)
+        return scale.letter(self.percentage)
 
 class Attendance(models.Model):
-    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE)
-    date = models.DateField()
-    status = models.CharField(max_length=10, choices=[
+    STATUS_CHOICES = [
         ('Present', 'Present'),
         ('Absent', 'Absent'),
         ('Late', 'Late'),
         ('Excused', 'Excused'),
-    ])
+    ]
+    
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE)
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     remarks = models.TextField(blank=True)
     
     class Meta:
@@ -159,6 +344,131 @@ class Attendance(models.Model):
     def __str__(self):
         return f"{self.enrollment.student} - {self.date} - {self.status}"
 
+class AttendanceCounts(models.Model):
+    """Per-status attendance counts, kept in step with ``Attendance`` by core.attendance."""
+    present = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    excused = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+class EnrollmentAttendanceMonth(AttendanceCounts):
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='attendance_months')
+    month = models.DateField(help_text='First day of the month')
+    
+    class Meta:
+        unique_together = ('enrollment', 'month')
+    
+    def __str__(self):
+        return f"{self.enrollment_id} - {self.month:%Y-%m}"
+
+class StudentSummary(AttendanceCounts):
+    """
+    The figures on a student's profile page, refreshed by core.summaries
+    whenever the student's enrollments, grades or attendance change.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    active_courses = models.PositiveIntegerField(default=0)
+    completed_courses = models.PositiveIntegerField(default=0)
+    dropped_courses = models.PositiveIntegerField(default=0)
+    failed_courses = models.PositiveIntegerField(default=0)
+    average_grade = models.FloatField(null=True, blank=True)
+    # Latest grades, newest first: assignment_name, course_name,
+    # marks_obtained, total_marks and date.
+    recent_grades = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Summary of {self.student_id}"
+    
+    @property
+    def total_courses(self):
+        return self.active_courses + self.completed_courses + self.dropped_courses + self.failed_courses
+    
+    def latest_grades(self):
+        """``recent_grades`` as unsaved ``Grade`` objects carrying a ``course_name`` and ``letter``."""
+        grades = []
+        for entry in self.recent_grades:
+            grade = Grade(
+                assignment_name=entry['assignment_name'],
+                marks_obtained=Decimal(entry['marks_obtained']),
+                total_marks=Decimal(entry['total_marks']),
+                date=datetime.date.fromisoformat(entry['date']),
+            )
+            grade.course_name = entry['course_name']
+            if 'letter' in entry:
+                grade.letter = entry['letter']
+            grades.append(grade)
+        return grades
+
+class CourseAttendanceDay(AttendanceCounts):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='attendance_days')
+    date = models.DateField()
+    
+    class Meta:
+        unique_together = ('course', 'date')
+    
+    def __str__(self):
+        return f"{self.course_id} - {self.date}"
+
+class AttendanceBitmap(models.Model):
+    """
+    One month of an enrollment's attendance. Bit ``day - 1`` of ``days`` marks
+    a recorded day and bits ``2 * (day - 1)`` and up of ``statuses`` hold its
+    status code (see ``STATUS_CODES``). Remarks live in ``AttendanceRemark``.
+    """
+    STATUS_CODES = {'Present': 0, 'Absent': 1, 'Late': 2, 'Excused': 3}
+    CODE_STATUSES = {code: status for status, code in STATUS_CODES.items()}
+    
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    month = models.DateField(help_text='First day of the month')
+    days = models.IntegerField(default=0)
+    statuses = models.BigIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('enrollment', 'month')
+    
+    def __str__(self):
+        return f"{self.enrollment_id} - {self.month:%Y-%m}"
+    
+    def status_on(self, day):
+        if not self.days >> (day - 1) & 1:
+            return None
+        return self.CODE_STATUSES[self.statuses >> (2 * (day - 1)) & 3]
+    
+    def set_status(self, day, status):
+        shift = 2 * (day - 1)
+        self.days |= 1 << (day - 1)
+        self.statuses = self.statuses & ~(3 << shift) | self.STATUS_CODES[status] << shift
+    
+    def clear(self, day):
+        self.days &= ~(1 << (day - 1))
+        self.statuses &= ~(3 << (2 * (day - 1)))
+    
+    def items(self):
+        """``(date, status)`` for every recorded day, in date order."""
+        days, statuses = self.days, self.statuses
+        day = 1
+        while days:
+            if days & 1:
+                yield self.month.replace(day=day), self.CODE_STATUSES[statuses & 3]
+            days >>= 1
+            statuses >>= 2
+            day += 1
+
+class AttendanceRemark(models.Model):
+    enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name='attendance_remarks')
+    date = models.DateField()
+    remarks = models.TextField()
+    
+    class Meta:
+        unique_together = ('enrollment', 'date')
+    
+    def __str__(self):
+        return f"{self.enrollment_id} - {self.date}"
+
 class Announcement(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
@@ -175,3 +485,58 @@ class Announcement(models.Model):
     
     def __str__(self):
         return self.title
+
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class SearchDocumentField(models.TextField):
+    """
+    The hidden column of an FTS5 table, named after the table. ``MATCH`` and
+    the ranking functions such as ``bm25()`` take it as their first operand.
+    """
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+    
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+class StudentSearchEntry(models.Model):
+    """A row of the students' full-text index (core/search.py), joined to filter and rank in one pass."""
+    student = models.OneToOneField(
+        Student, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='search_entry',
+    )
+    document = SearchDocumentField(db_column='core_student_fts')
+    
+    class Meta:
+        managed = False
+        db_table = 'core_student_fts'
+
+class CourseSearchEntry(models.Model):
+    """A row of the courses' full-text index (core/search.py)."""
+    course = models.OneToOneField(
+        Course, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', related_name='search_entry',
+    )
+    document = SearchDocumentField(db_column='core_course_fts')
+    
+    class Meta:
+        managed = False
+        db_table = 'core_course_fts'
+
+class ReplicaHeartbeat(models.Model):
+    """
+    A single row the primary rewrites whenever replicas are synced. Its age on
+    a replica is how far that replica is behind (core/replicas.py).
+    """
+    beat_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"Heartbeat at {self.beat_at}"
@@ -0,0 +1,148 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Turn a user-supplied ``per_page`` value into a safe page size."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Seek-based pagination over a fixed ordering.
+
+    Instead of ``OFFSET n`` every page is fetched with a ``WHERE`` clause that
+    continues after (or before) the boundary row of the previous page, so page
+    1000 costs the same as page 1 as long as the ordering is backed by an index.
+    The last ordering field must be unique (normally ``pk``) to break ties.
+    """
+
+    def __init__(self, queryset, ordering, per_page=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.ordering = [self._parse(term) for term in ordering]
+        self.per_page = per_page
+
+    @staticmethod
+    def _parse(term):
+        descending = term.startswith('-')
+        return term.lstrip('-'), descending
+
+    def _order_by(self, reverse=False):
+        terms = []
+        for name, descending in self.ordering:
+            if descending != reverse:
+                terms.append(f'-{name}')
+            else:
+                terms.append(name)
+        return terms
+
+    def _boundary_filter(self, values, reverse=False):
+        # (a, b, c) > (x, y, z) expanded into
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _row_values(self, obj):
+        return [getattr(obj, name) for name, _ in self.ordering]
+
+    def encode_cursor(self, obj):
+        raw = json.dumps(self._row_values(obj), cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+
+        model = self.queryset.model
+        decoded = []
+        for (name, _), value in zip(self.ordering, values):
+            try:
+                field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                # Annotations keep their JSON type.
+                decoded.append(value)
+                continue
+            try:
+                decoded.append(field.to_python(value))
+            except ValidationError:
+                raise InvalidCursor(cursor)
+        return decoded
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the ``after`` cursor, the page preceding the
+        ``before`` cursor, or the first page when neither is given.
+        """
+        reverse = bool(before) and not after
+        queryset = self.queryset.order_by(*self._order_by(reverse))
+        cursor = after or before
+        if cursor:
+            queryset = queryset.filter(self._boundary_filter(self.decode_cursor(cursor), reverse))
+
+        # One extra row tells us whether another page exists in that direction.
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage(rows)
+
+        if reverse:
+            next_cursor = self.encode_cursor(rows[-1])
+            previous_cursor = self.encode_cursor(rows[0]) if has_more else None
+        else:
+            next_cursor = self.encode_cursor(rows[-1]) if has_more else None
+            previous_cursor = self.encode_cursor(rows[0]) if cursor else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
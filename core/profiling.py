@@ -0,0 +1,274 @@
+"""
+Sampled per-request database profiling.
+
+``QueryProfilerMiddleware`` profiles a random ``SAMPLE_RATE`` share of
+requests. For those it wraps every database connection with an execute
+wrapper and records each statement's SQL and time. When the response is ready
+it writes one JSON line to a rotating log. The line holds the view name, the
+query count, the total database time, statements repeated with the same shape
+(the signature of an N+1 loop), and the slowest statements. Statements slower
+than ``SLOW_QUERY_MS`` also get their ``EXPLAIN QUERY PLAN``. Requests that
+are not sampled cost one call to ``random()``.
+
+``read_log`` and ``summarize`` turn the log back into the per-view report
+shown at ``/profiling/queries/``.
+
+Queries that async views run on worker threads (see ``async_views``) use their
+own connections and are not recorded.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Share of requests profiled, from 0 to 1.
+    'SAMPLE_RATE': 0.01,
+    'SLOW_QUERY_MS': 100,
+    'EXPLAIN': True,
+    # Statements kept per request, slowest first.
+    'TOP_QUERIES': 5,
+    'LOG_FILE': 'logs/queries.log',
+    'MAX_BYTES': 5 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+}
+
+logger = logging.getLogger('core.queries')
+_handler_lock = threading.Lock()
+
+# ``IN (%s, %s, %s)`` with any number of parameters is one query shape.
+_PARAM_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+_NUMBER = re.compile(r'\b\d+\b')
+
+
+def get_setting(name):
+    return getattr(settings, 'QUERY_PROFILER', {}).get(name, DEFAULTS[name])
+
+
+def log_path():
+    path = Path(get_setting('LOG_FILE'))
+    return path if path.is_absolute() else Path(settings.BASE_DIR) / path
+
+
+def _ensure_handler():
+    """Attach the rotating file handler the first time something is logged."""
+    if logger.handlers:
+        return
+    with _handler_lock:
+        if logger.handlers:
+            return
+        path = log_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=get_setting('MAX_BYTES'), backupCount=get_setting('BACKUP_COUNT'), encoding='utf-8',
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def signature(sql):
+    """The shape of a statement: parameter lists collapsed and literal numbers removed."""
+    return _NUMBER.sub('N', _PARAM_LIST.sub('%s, ...', sql))
+
+
+class Statement:
+    __slots__ = ('alias', 'sql', 'params', 'many', 'duration')
+
+    def __init__(self, alias, sql, params, many, duration):
+        self.alias = alias
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.duration = duration
+
+
+class QueryProfile:
+    """Records every statement run on any database connection while active."""
+
+    def __init__(self):
+        self.statements = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._recorder(connection.alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _recorder(self, alias):
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.statements.append(Statement(alias, sql, params, many, time.perf_counter() - start))
+        return record
+
+    @property
+    def db_time(self):
+        return sum(statement.duration for statement in self.statements)
+
+    def duplicates(self):
+        """``[(signature, count)]`` of statement shapes run more than once, most repeated first."""
+        counts = Counter(signature(statement.sql) for statement in self.statements)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+    def slowest(self, limit):
+        return sorted(self.statements, key=lambda statement: statement.duration, reverse=True)[:limit]
+
+
+def explain(statement):
+    """The query plan of a slow ``SELECT`` as a list of lines, or ``None``."""
+    if statement.many or not statement.sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    connection = connections[statement.alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + statement.sql, statement.params)
+            return [' '.join(str(value) for value in row) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def build_record(request, response, profile, duration):
+    match = getattr(request, 'resolver_match', None)
+    slow_ms = get_setting('SLOW_QUERY_MS')
+    slowest = []
+    for statement in profile.slowest(get_setting('TOP_QUERIES')):
+        entry = {'sql': statement.sql, 'ms': round(statement.duration * 1000, 2)}
+        if get_setting('EXPLAIN') and entry['ms'] >= slow_ms:
+            entry['plan'] = explain(statement)
+        slowest.append(entry)
+    return {
+        'time': timezone.now().isoformat(),
+        'view': match.view_name if match is not None else None,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'ms': round(duration * 1000, 2),
+        'queries': len(profile.statements),
+        'db_ms': round(profile.db_time * 1000, 2),
+        'duplicates': [{'sql': sql, 'count': count} for sql, count in profile.duplicates()],
+        'slowest': slowest,
+    }
+
+
+def _sampled():
+    return get_setting('ENABLED') and random.random() < get_setting('SAMPLE_RATE')
+
+
+def _log(request, response, profile, duration):
+    _ensure_handler()
+    logger.info(json.dumps(build_record(request, response, profile, duration), default=str))
+
+
+class QueryProfilerMiddleware:
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with QueryProfile() as profile:
+            response = self.get_response(request)
+        _log(request, response, profile, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+
+        # Connections belong to threads. Sync views and middleware run on the
+        # request's thread-sensitive worker thread, so wrap its connections.
+        profile = QueryProfile()
+        start = time.perf_counter()
+        await sync_to_async(profile.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(profile.__exit__)(None, None, None)
+        # EXPLAIN runs on the same connections.
+        await sync_to_async(_log)(request, response, profile, time.perf_counter() - start)
+        return response
+
+
+def read_log():
+    """Every record in the current log and its rotated backups, oldest first."""
+    path = log_path()
+    files = [path.with_name(f'{path.name}.{index}') for index in range(get_setting('BACKUP_COUNT'), 0, -1)]
+    records = []
+    for file in files + [path]:
+        if not file.exists():
+            continue
+        with open(file, encoding='utf-8') as lines:
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    return records
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(records, top=5):
+    """Per-view totals for the report, most expensive (total database time) first."""
+    views = {}
+    for record in records:
+        views.setdefault(record['view'] or record['path'], []).append(record)
+
+    summary = []
+    for view, entries in views.items():
+        duplicates, slowest = Counter(), {}
+        for entry in entries:
+            for duplicate in entry['duplicates']:
+                duplicates[duplicate['sql']] = max(duplicates[duplicate['sql']], duplicate['count'])
+            for statement in entry['slowest']:
+                kept = slowest.get(statement['sql'])
+                if kept is None or statement['ms'] > kept['ms']:
+                    slowest[statement['sql']] = statement
+        queries = [entry['queries'] for entry in entries]
+        db_ms = [entry['db_ms'] for entry in entries]
+        summary.append({
+            'view': view,
+            'requests': len(entries),
+            'avg_queries': sum(queries) / len(entries),
+            'max_queries': max(queries),
+            'avg_db_ms': sum(db_ms) / len(entries),
+            'p95_db_ms': _percentile(db_ms, 0.95),
+            'total_db_ms': sum(db_ms),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates.most_common(top)],
+            'slowest': sorted(slowest.values(), key=lambda statement: statement['ms'], reverse=True)[:top],
+        })
+    summary.sort(key=lambda row: row['total_db_ms'], reverse=True)
+    return summary
@@ -0,0 +1,252 @@
+"""
+Read replicas.
+
+``ReplicaRouter`` sends reads to one of the read replicas in
+``DATABASE_REPLICAS['ALIASES']`` and sends every write to ``default``, the
+primary. A request keeps the replica it picked first, so its pages never mix
+two copies taken at different times. Reads go to the primary instead:
+
+* for the rest of a request once it has written anything, and inside
+  transactions on the primary;
+* for ``PIN_SECONDS`` after a request that wrote. ``ReplicaMiddleware`` sets
+  a cookie, so the redirect after a save (and the next few clicks) show the
+  change even if the replicas have not caught up;
+* for the apps in ``PRIMARY_APPS``. Sessions and users are read on every
+  request, and a replica behind a login would log the user out again;
+* when no replica is usable. A replica that cannot be connected to is left
+  out for ``RETRY_AFTER`` seconds, then tried again. A replica whose copy of
+  the ``ReplicaHeartbeat`` row is more than ``MAX_LAG_SECONDS`` old is left
+  out until it catches up; the heartbeat is read at most every
+  ``LAG_CHECK_SECONDS``.
+
+Locally the replicas are SQLite files (``DJANGO_DB_REPLICAS`` in settings),
+kept up to date by ``manage.py sync_replicas``, which writes the heartbeat on
+the primary before each copy. Other replication setups need a job that
+rewrites it regularly.
+"""
+import contextvars
+import logging
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ALIASES': [],
+    # Seconds a client reads from the primary after it wrote.
+    'PIN_SECONDS': 5,
+    # Seconds before a replica that failed to connect is tried again.
+    'RETRY_AFTER': 30,
+    'PRIMARY_APPS': ('auth', 'sessions'),
+    'COOKIE_NAME': 'read_primary',
+    # Seconds a replica may be behind the primary; None to never check.
+    'MAX_LAG_SECONDS': 300,
+    # Seconds a lag check is trusted before the heartbeat is read again.
+    'LAG_CHECK_SECONDS': 5,
+}
+
+# alias -> time.monotonic() of its last failed connection attempt
+_failures = {}
+# alias -> (time.monotonic() of its last lag check, whether it was fresh)
+_lag_checks = {}
+
+
+def get_setting(name):
+    return getattr(settings, 'DATABASE_REPLICAS', {}).get(name, DEFAULTS[name])
+
+
+class RoutingState:
+    __slots__ = ('pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+def _current_state():
+    # Outside a request (management commands, worker threads) the state lives
+    # as long as the thread's context.
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, e.g. right after another process wrote."""
+    token = _state.set(RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def is_usable(alias):
+    """Whether ``alias`` is connected, or can be connected to now, and is not too far behind."""
+    connection = connections[alias]
+    if connection.connection is None:
+        failed_at = _failures.get(alias)
+        if failed_at is not None and time.monotonic() - failed_at < get_setting('RETRY_AFTER'):
+            return False
+        try:
+            connection.ensure_connection()
+        except DatabaseError as exc:
+            _failures[alias] = time.monotonic()
+            logger.warning('Read replica %s is unavailable: %s', alias, exc)
+            return False
+        _failures.pop(alias, None)
+    return is_fresh(alias)
+
+
+def beat():
+    """Rewrite the heartbeat on the primary."""
+    from .models import ReplicaHeartbeat  # the router is loaded before the models
+
+    ReplicaHeartbeat.objects.using(DEFAULT_DB_ALIAS).update_or_create(pk=1, defaults={'beat_at': timezone.now()})
+
+
+def lag(alias):
+    """Seconds since the heartbeat ``alias`` holds was written, or ``None`` without one."""
+    from .models import ReplicaHeartbeat
+
+    beat_at = ReplicaHeartbeat.objects.using(alias).values_list('beat_at', flat=True).first()
+    return None if beat_at is None else (timezone.now() - beat_at).total_seconds()
+
+
+def is_fresh(alias):
+    max_lag = get_setting('MAX_LAG_SECONDS')
+    if max_lag is None:
+        return True
+    now = time.monotonic()
+    checked = _lag_checks.get(alias)
+    if checked is not None and now - checked[0] < get_setting('LAG_CHECK_SECONDS'):
+        return checked[1]
+    try:
+        seconds = lag(alias)
+    except DatabaseError:
+        seconds = None
+    fresh = seconds is not None and seconds <= max_lag
+    if not fresh and (checked is None or checked[1]):
+        logger.warning(
+            'Read replica %s is %s behind; reading from the primary until it catches up.', alias,
+            'an unknown time' if seconds is None else f'{seconds:.0f}s',
+        )
+    _lag_checks[alias] = (now, fresh)
+    return fresh
+
+
+def _choose_replica():
+    aliases = list(get_setting('ALIASES'))
+    random.shuffle(aliases)
+    return next((alias for alias in aliases if is_usable(alias)), DEFAULT_DB_ALIAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not get_setting('ALIASES') or model._meta.app_label in get_setting('PRIMARY_APPS'):
+            return DEFAULT_DB_ALIAS
+        state = _current_state()
+        if state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None or not is_usable(state.replica):
+            state.replica = _choose_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current_state()
+        state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema from the primary with the data.
+        return db not in get_setting('ALIASES')
+
+
+class ReplicaMiddleware:
+    """
+    Reads from the primary for requests that write and for ``PIN_SECONDS`` after.
+
+    Under ASGI the routing state is set in the event loop. Worker threads
+    that run sync code for the request get a copy of the context, so they share
+    the same ``RoutingState`` object, and a write there pins the rest of the
+    request.
+    """
+    sync_capable = async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.routing_state(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = self.routing_state(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    def routing_state(self, request):
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or get_setting('COOKIE_NAME') in request.COOKIES
+        return RoutingState(pinned=pinned)
+
+    def pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                get_setting('COOKIE_NAME'), '1', max_age=get_setting('PIN_SECONDS'), httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def replica_path(alias):
+    """The file of an SQLite replica, from a plain path or a ``file:`` URI."""
+    name = str(connections[alias].settings_dict['NAME'])
+    return urlsplit(name).path if name.startswith('file:') else name
+
+
+def sync(alias):
+    """
+    Copy the primary into the SQLite replica ``alias`` with SQLite's online
+    backup. The copy is consistent, and connections already open on the
+    replica see the new data once it is done.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    if primary.vendor != 'sqlite' or connections[alias].vendor != 'sqlite':
+        raise ValueError('Only SQLite replicas can be synced by copying.')
+    beat()
+    primary.ensure_connection()
+    with sqlite3.connect(replica_path(alias)) as target:
+        primary.connection.backup(target)
+    target.close()
+    _lag_checks.pop(alias, None)
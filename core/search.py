@@ -0,0 +1,207 @@
+"""
+Full-text search over students and courses.
+
+On SQLite each searchable model gets an external-content FTS5 table kept in
+sync by triggers, so every write path (forms, admin, ``bulk_create``,
+``QuerySet.update``) updates the index in the same transaction. Other
+databases, or SQLite builds without FTS5, fall back to ``icontains`` filters.
+
+``StudentSearchEntry`` and ``CourseSearchEntry`` map the index tables as
+unmanaged models, so ``search`` joins them through the ORM and works inside
+subqueries as well.
+"""
+import re
+
+from django.db import DatabaseError, connections
+from django.db.models import F, FloatField, Func, Q, Value
+
+from .models import Student, Course
+
+
+class SearchIndex:
+    def __init__(self, model, columns, weights):
+        self.model = model
+        self.columns = columns
+        self.weights = weights
+
+    @property
+    def source_table(self):
+        return self.model._meta.db_table
+
+    @property
+    def table(self):
+        return f'{self.source_table}_fts'
+
+    def create_sql(self):
+        columns = ', '.join(self.columns)
+        new_values = ', '.join(f'new.{column}' for column in self.columns)
+        old_values = ', '.join(f'old.{column}' for column in self.columns)
+        table, source = self.table, self.source_table
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"{columns}, content='{source}', content_rowid='id', "
+            f"tokenize=\"unicode61 remove_diacritics 2\", prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON {source} BEGIN "
+            f"INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON {source} BEGIN "
+            f"INSERT INTO {table}({table}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {table}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        ]
+
+    def drop_sql(self):
+        return [
+            f'DROP TRIGGER IF EXISTS {self.table}_ai',
+            f'DROP TRIGGER IF EXISTS {self.table}_ad',
+            f'DROP TRIGGER IF EXISTS {self.table}_au',
+            f'DROP TABLE IF EXISTS {self.table}',
+        ]
+
+    def rebuild_sql(self):
+        return f"INSERT INTO {self.table}({self.table}) VALUES ('rebuild')"
+
+
+INDEXES = {
+    Student: SearchIndex(
+        Student,
+        columns=('student_id', 'first_name', 'last_name', 'email'),
+        weights=(10.0, 5.0, 5.0, 2.0),
+    ),
+    Course: SearchIndex(
+        Course,
+        columns=('course_code', 'course_name', 'instructor'),
+        weights=(10.0, 5.0, 2.0),
+    ),
+}
+
+# Fields used when the FTS5 index is not available.
+FALLBACK_FIELDS = {
+    Student: ('first_name', 'last_name', 'student_id', 'email'),
+    Course: ('course_code', 'course_name', 'instructor'),
+}
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Some builds ship FTS5 as a loadable default without the compile flag.
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+        except DatabaseError:
+            return False
+    return True
+
+
+_known_indexes = set()
+
+
+def index_exists(connection, index):
+    if connection.vendor != 'sqlite':
+        return False
+    key = (connection.alias, connection.settings_dict['NAME'], index.table)
+    if key not in _known_indexes:
+        if index.table not in connection.introspection.table_names():
+            return False
+        _known_indexes.add(key)
+    return True
+
+
+def install(connection):
+    """Create the FTS tables and sync triggers, then populate them."""
+    if not fts5_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        for index in INDEXES.values():
+            for statement in index.create_sql():
+                cursor.execute(statement)
+            cursor.execute(index.rebuild_sql())
+    return True
+
+
+def repair(connection):
+    """
+    Recreate sync triggers that a table rebuild dropped and repopulate the
+    affected indexes. SQLite's schema editor implements most ``ALTER TABLE``
+    operations by copying the table, which silently discards its triggers.
+    Returns the names of the repaired index tables.
+    """
+    if not fts5_supported(connection):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        triggers = {row[0] for row in cursor.fetchall()}
+        repaired = []
+        for index in INDEXES.values():
+            expected = {f'{index.table}_{suffix}' for suffix in ('ai', 'ad', 'au')}
+            if expected <= triggers:
+                continue
+            for statement in index.create_sql():
+                cursor.execute(statement)
+            cursor.execute(index.rebuild_sql())
+            repaired.append(index.table)
+    return repaired
+
+
+def repair_after_migrate(using, **kwargs):
+    repair(connections[using])
+
+
+def uninstall(connection):
+    if connection.vendor != 'sqlite':
+        return
+    _known_indexes.clear()
+    with connection.cursor() as cursor:
+        for index in INDEXES.values():
+            for statement in index.drop_sql():
+                cursor.execute(statement)
+
+
+def rebuild(connection):
+    """Recreate missing indexes and repopulate all of them from their tables."""
+    if not install(connection):
+        return []
+    with connection.cursor() as cursor:
+        for index in INDEXES.values():
+            cursor.execute(f"INSERT INTO {index.table}({index.table}) VALUES ('optimize')")
+    return [index.table for index in INDEXES.values()]
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression where every word must match
+    as a prefix, e.g. ``jo smi`` -> ``"jo"* AND "smi"*``.
+    """
+    terms = re.findall(r'\w+', text)
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+
+def search(queryset, text):
+    """
+    Restrict ``queryset`` to rows matching ``text`` and annotate each row with
+    ``search_rank`` (lower is more relevant).
+    """
+    model = queryset.model
+    index = INDEXES[model]
+    match = build_match_query(text)
+    if not match or not index_exists(connections[queryset.db], index):
+        condition = Q()
+        for field in FALLBACK_FIELDS[model]:
+            condition |= Q(**{f'{field}__icontains': text})
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    # Joined once: the index is scanned for the MATCH and ranks the rows it
+    # finds, then each row is looked up by primary key.
+    return queryset.filter(search_entry__document__match=match).annotate(
+        search_rank=Func(
+            F('search_entry__document'), *[Value(weight) for weight in index.weights],
+            function='bm25', output_field=FloatField(),
+        )
+    )
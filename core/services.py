@@ -0,0 +1,202 @@
+"""
+Enrollment service.
+
+Seats are tracked in ``Course.active_enrolled`` and claimed with a conditional
+``UPDATE ... SET active_enrolled = active_enrolled + n WHERE active_enrolled + n
+<= max_students``. The check and the increment are one statement, so two
+concurrent requests can never both take the last seat: on a server database
+the row lock serializes them, and on SQLite the write lock does.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from . import counters, fragments, live, summaries, transcripts
+from .models import Course, Enrollment
+
+
+class EnrollmentError(Exception):
+    pass
+
+
+class CourseFull(EnrollmentError):
+    pass
+
+
+class CourseClosed(EnrollmentError):
+    pass
+
+
+class AlreadyEnrolled(EnrollmentError):
+    pass
+
+
+class BulkEnrollmentResult:
+    def __init__(self):
+        self.enrolled = []
+        self.already_enrolled = []
+        self.rejected = []
+
+    def as_dict(self):
+        return {
+            'enrolled': [student.student_id for student in self.enrolled],
+            'already_enrolled': [student.student_id for student in self.already_enrolled],
+            'rejected': [student.student_id for student in self.rejected],
+        }
+
+
+def _claim_seats(course, count):
+    """Atomically take ``count`` seats, raising if the course cannot take them."""
+    claimed = Course.objects.filter(
+        pk=course.pk,
+        is_active=True,
+        active_enrolled__lte=F('max_students') - count,
+    ).update(active_enrolled=F('active_enrolled') + count)
+    if not claimed:
+        if not Course.objects.filter(pk=course.pk, is_active=True).exists():
+            raise CourseClosed(f'{course} is not open for enrollment.')
+        raise CourseFull(f'{course} has no seats left.')
+
+
+def enroll_student(student, course):
+    """
+    Enroll ``student`` in ``course``, reactivating a dropped or failed
+    enrollment if one exists. Raises ``EnrollmentError`` subclasses when the
+    course is full or closed, or the student is already enrolled.
+    """
+    with transaction.atomic():
+        # Write first: on SQLite a transaction that reads before writing cannot
+        # wait for the write lock and fails with "database is locked" instead.
+        # Raising below rolls the claim back.
+        try:
+            _claim_seats(course, 1)
+        except CourseFull:
+            if Enrollment.objects.filter(student=student, course=course, status='Active').exists():
+                raise AlreadyEnrolled(f'{student} is already enrolled in {course}.')
+            raise
+
+        existing = Enrollment.objects.filter(student=student, course=course).first()
+        if existing is not None and existing.status == 'Active':
+            raise AlreadyEnrolled(f'{student} is already enrolled in {course}.')
+
+        enrollment = existing or Enrollment(student=student, course=course)
+        enrollment.status = 'Active'
+        # The seat is already counted; tell the signal handler not to add it again.
+        enrollment._seat_reserved = True
+        try:
+            with transaction.atomic():
+                enrollment.save()
+        except IntegrityError:
+            # A concurrent request enrolled the same student first. Leaving the
+            # outer block with an exception also releases the claimed seat.
+            raise AlreadyEnrolled(f'{student} is already enrolled in {course}.')
+    return enrollment
+
+
+def bulk_enroll(course, students):
+    """
+    Enroll as many of ``students`` as there are seats for, in list order, with
+    a fixed number of queries. Returns a ``BulkEnrollmentResult``.
+    """
+    result = BulkEnrollmentResult()
+    students = list({student.pk: student for student in students}.values())
+
+    with transaction.atomic():
+        # A no-op write takes the row lock on server databases and the
+        # database write lock on SQLite, so the seat count read next cannot
+        # change until this transaction ends.
+        if not Course.objects.filter(pk=course.pk).update(active_enrolled=F('active_enrolled')):
+            raise CourseClosed(f'{course} no longer exists.')
+        locked = Course.objects.only('max_students', 'is_active', 'active_enrolled').get(pk=course.pk)
+        if not locked.is_active:
+            raise CourseClosed(f'{course} is not open for enrollment.')
+
+        existing = {
+            enrollment.student_id: enrollment
+            for enrollment in Enrollment.objects.filter(course=course, student__in=students)
+        }
+        seats = max(locked.max_students - locked.active_enrolled, 0)
+        new, reactivated = [], []
+        for student in students:
+            enrollment = existing.get(student.pk)
+            if enrollment is not None and enrollment.status == 'Active':
+                result.already_enrolled.append(student)
+            elif seats <= 0:
+                result.rejected.append(student)
+            else:
+                seats -= 1
+                result.enrolled.append(student)
+                if enrollment is None:
+                    new.append(Enrollment(student=student, course=course))
+                else:
+                    reactivated.append(enrollment.pk)
+
+        if new:
+            Enrollment.objects.bulk_create(new)
+        if reactivated:
+            Enrollment.objects.filter(pk__in=reactivated).update(status='Active')
+        if result.enrolled:
+            Course.objects.filter(pk=course.pk).update(
+                active_enrolled=F('active_enrolled') + len(result.enrolled)
+            )
+            # bulk_create and update() skip model signals, so adjust the
+            # dashboard counters and fragment versions here.
+            counters.apply_deltas({
+                'enrollments.total': len(new),
+                'enrollments.active': len(result.enrolled),
+            })
+            transaction.on_commit(lambda: fragments.bump(Enrollment._meta.label_lower))
+            transcripts.invalidate(student.pk for student in result.enrolled)
+            summaries.refresh(student.pk for student in result.enrolled)
+            if new:
+                live.publish('enrollment', [enrollment.pk for enrollment in new])
+            live.publish('counters')
+    return result
+
+
+def seat_deltas(before, after):
+    """``{course_id: delta}`` for an enrollment moving from ``before`` to ``after``."""
+    deltas = {}
+    if before is not None and before['status'] == 'Active':
+        deltas[before['course_id']] = deltas.get(before['course_id'], 0) - 1
+    if after is not None and after['status'] == 'Active':
+        deltas[after['course_id']] = deltas.get(after['course_id'], 0) + 1
+    return {course_id: delta for course_id, delta in deltas.items() if delta}
+
+
+def apply_seat_deltas(deltas, enforce_capacity=False):
+    """
+    Adjust ``active_enrolled`` by ``{course_id: delta}``. With
+    ``enforce_capacity`` a course that would go over ``max_students`` raises
+    ``CourseFull`` instead, using the same conditional update as
+    ``enroll_student``.
+    """
+    for course_id, delta in deltas.items():
+        courses = Course.objects.filter(pk=course_id)
+        if not enforce_capacity or delta < 0:
+            courses.update(active_enrolled=F('active_enrolled') + delta)
+            continue
+        claimed = courses.filter(active_enrolled__lte=F('max_students') - delta).update(
+            active_enrolled=F('active_enrolled') + delta
+        )
+        if not claimed:
+            raise CourseFull(f'{Course.objects.get(pk=course_id)} has no seats left.')
+
+
+def reconcile_seats(fix=True):
+    """
+    Recount ``active_enrolled`` for every course. Returns
+    ``[(course, stored, actual)]`` for courses that had drifted.
+    """
+    drift = []
+    with transaction.atomic():
+        courses = Course.objects.only('course_code', 'course_name', 'active_enrolled').annotate(
+            actual_active=Count('enrollment', filter=Q(enrollment__status='Active')),
+        )
+        for course in courses:
+            if course.active_enrolled != course.actual_active:
+                drift.append((course, course.active_enrolled, course.actual_active))
+                if fix:
+                    Course.objects.filter(pk=course.pk).update(active_enrolled=course.actual_active)
+        if drift and fix:
+            transaction.on_commit(lambda: fragments.bump(Course._meta.label_lower))
+    return drift
@@ -0,0 +1,282 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import attendance, counters, fragments, grading, images, live, services, summaries, transcripts
+from .models import (
+    Student, Course, Enrollment, Grade, Attendance, Announcement, StudentSummary, GradingScale, GradeBoundary,
+)
+
+SEAT_FIELDS = ('course_id', 'status')
+ATTENDANCE_FIELDS = ('enrollment_id', 'date', 'status')
+
+
+def _tracked_fields(sender):
+    fields = counters.tracked_fields(sender)
+    if sender is Enrollment:
+        fields |= set(SEAT_FIELDS) | {'student_id'}
+    elif sender is Course:
+        fields |= {'credits', 'course_name', 'grading_scale_id'}
+    elif sender is Attendance:
+        fields |= set(ATTENDANCE_FIELDS)
+    return fields
+
+
+def _snapshot(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _remember_previous(sender, instance, fields):
+    """
+    Stash the stored values of ``fields`` on the instance before it is saved so
+    post_save handlers can tell what changed.
+    """
+    instance._previous_values = None
+    if instance._state.adding or not fields:
+        return
+    instance._previous_values = (
+        sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+    )
+
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Enrollment)
+@receiver(pre_save, sender=Attendance)
+def remember_counted_fields(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _remember_previous(sender, instance, _tracked_fields(sender))
+
+
+@receiver(pre_save, sender=Student)
+def deduplicate_profile_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    images.prepare_upload(instance)
+
+
+@receiver(post_save, sender=Student)
+def process_profile_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    images.register_upload(instance)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Enrollment)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before = None if created else getattr(instance, '_previous_values', None)
+    if not created and before is None:
+        # Row vanished between pre_save and post_save; nothing reliable to diff.
+        return
+    after = _snapshot(instance, counters.tracked_fields(sender))
+    deltas = counters.counter_deltas(sender, before, after)
+    counters.apply_deltas(deltas)
+    if deltas:
+        live.publish('counters')
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Enrollment)
+def update_counters_on_delete(sender, instance, **kwargs):
+    before = _snapshot(instance, counters.tracked_fields(sender))
+    deltas = counters.counter_deltas(sender, before, None)
+    counters.apply_deltas(deltas)
+    if deltas:
+        live.publish('counters')
+
+
+@receiver(post_save, sender=Enrollment)
+def update_seats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.__dict__.pop('_seat_reserved', False):
+        # services.enroll_student already claimed the seat.
+        return
+    before = None if created else getattr(instance, '_previous_values', None)
+    if not created and before is None:
+        return
+    after = _snapshot(instance, SEAT_FIELDS)
+    # Saves outside the enrollment service (admin, EnrollmentForm, scripts)
+    # must not overfill a course either.
+    services.apply_seat_deltas(services.seat_deltas(before, after), enforce_capacity=True)
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_seats_on_delete(sender, instance, **kwargs):
+    services.apply_seat_deltas(services.seat_deltas(_snapshot(instance, SEAT_FIELDS), None))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Announcement)
+def invalidate_fragments(sender, **kwargs):
+    # Bump after commit so a concurrent render cannot cache pre-commit data
+    # under the new version.
+    label = sender._meta.label_lower
+    transaction.on_commit(lambda: fragments.bump(label))
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=Announcement)
+def publish_live_event(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    if sender is Enrollment:
+        live.publish('enrollment', [instance.pk])
+    elif instance.is_active:
+        live.publish('announcement', [instance.pk])
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_transcript(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_values', None) or {}
+    transcripts.invalidate([instance.student_id, previous.get('student_id')])
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def invalidate_grade_transcript(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if Grade.enrollment.is_cached(instance):
+        student_ids = [instance.enrollment.student_id]
+    else:
+        student_ids = Enrollment.objects.filter(pk=instance.enrollment_id).values_list('student_id', flat=True)
+    transcripts.invalidate(student_ids)
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_transcripts(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if raw or created or previous is None:
+        return
+    if (previous['credits'], previous['grading_scale_id']) == (instance.credits, instance.grading_scale_id):
+        return
+    # Credits weight the GPA of everyone who took the course, and the scale
+    # gives the letter of courses without a final grade.
+    transcripts.invalidate(
+        Enrollment.objects.filter(course=instance).values_list('student_id', flat=True)
+    )
+
+
+def _cascaded_from(origin, *models):
+    """Whether a deletion started from an instance or queryset of one of ``models``."""
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(post_save, sender=Student)
+def create_student_summary(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    StudentSummary.objects.create(student=instance)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def refresh_enrollment_summary(sender, instance, origin=None, raw=False, **kwargs):
+    # A deleted student takes its summary with it.
+    if raw or _cascaded_from(origin, Student):
+        return
+    previous = getattr(instance, '_previous_values', None) or {}
+    summaries.refresh([instance.student_id, previous.get('student_id')])
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def refresh_record_summary(sender, instance, origin=None, raw=False, **kwargs):
+    # Deleting the enrollment (or its student or course) refreshes the
+    # summary once afterwards instead of once per grade row. Attendance rows
+    # refresh it from the rollup handlers, once the rollups it reads are
+    # up to date.
+    if raw or _cascaded_from(origin, Student, Course, Enrollment):
+        return
+    previous = getattr(instance, '_previous_values', None) or {}
+    summaries.refresh_enrollments([instance.enrollment_id, previous.get('enrollment_id')])
+
+
+@receiver(post_save, sender=Course)
+def refresh_course_summaries(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if raw or created or previous is None:
+        return
+    if (previous['course_name'], previous['grading_scale_id']) == (instance.course_name, instance.grading_scale_id):
+        return
+    # Recent grades show the course name and letter.
+    summaries.refresh(Enrollment.objects.filter(course=instance).values_list('student_id', flat=True))
+
+
+@receiver(post_save, sender=GradingScale)
+@receiver(post_delete, sender=GradingScale)
+@receiver(post_save, sender=GradeBoundary)
+@receiver(post_delete, sender=GradeBoundary)
+def regrade_scale_courses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    grading.invalidate()
+    scale_id = instance.pk if sender is GradingScale else instance.scale_id
+    student_ids = set(
+        Enrollment.objects.filter(course__grading_scale=scale_id).values_list('student_id', flat=True)
+    )
+    transcripts.invalidate(student_ids)
+    summaries.refresh(student_ids)
+
+
+def _attendance_row(values):
+    course_id = Enrollment.objects.filter(pk=values['enrollment_id']).values_list('course_id', flat=True).first()
+    return (values['enrollment_id'], course_id, values['date'], values['status'])
+
+
+@receiver(post_save, sender=Attendance)
+def update_attendance_rollups_on_save(sender, instance, created, raw=False, **kwargs):
+    # Rollups follow the configured storage only; rows left behind after a
+    # conversion to bitmaps don't count.
+    if raw or attendance.storage_backend() != 'rows':
+        return
+    before = None if created else getattr(instance, '_previous_values', None)
+    if not created and before is None:
+        return
+    after = _snapshot(instance, ATTENDANCE_FIELDS)
+    if before == after:
+        return
+    removed = [_attendance_row(before)] if before is not None else []
+    added = [_attendance_row(after)]
+    attendance.apply_rollup_deltas(removed, added)
+    summaries.refresh_enrollments([after['enrollment_id'], (before or {}).get('enrollment_id')])
+
+
+@receiver(post_delete, sender=Attendance)
+def update_attendance_rollups_on_delete(sender, instance, origin=None, **kwargs):
+    if attendance.storage_backend() != 'rows':
+        return
+    attendance.apply_rollup_deltas([_attendance_row(_snapshot(instance, ATTENDANCE_FIELDS))], [])
+    if not _cascaded_from(origin, Student, Course, Enrollment):
+        summaries.refresh_enrollments([instance.enrollment_id])
+
+
+@receiver(pre_delete, sender=Enrollment)
+def remove_bitmap_attendance_from_rollups(sender, instance, **kwargs):
+    # Attendance rows report their own deletion; bitmaps vanish with the
+    # enrollment by cascade, so take their days out of the course rollup here.
+    if attendance.storage_backend() != 'bitmap':
+        return
+    removed = [
+        (entry.enrollment_id, instance.course_id, entry.date, entry.status)
+        for entry in attendance.attendance_records([instance.pk])
+    ]
+    attendance.apply_rollup_deltas(removed, [])
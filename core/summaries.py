@@ -0,0 +1,121 @@
+"""
+Precomputed per-student summaries for the profile page.
+
+``StudentSummary`` holds a student's course counts by enrollment status,
+attendance counts, overall grade average and latest grades with their course
+names and letters, so the profile page reads them with the student instead
+of running an aggregate per figure.
+
+``refresh`` recomputes the summaries of a set of students with a fixed number
+of grouped queries, however many students there are, and upserts them. It
+runs in the same transaction as the write that made them stale: from the
+signal handlers for single-row writes, and explicitly from the bulk paths
+that skip signals (bulk enrollment, grade import, attendance sheets).
+``manage.py rebuild_student_summaries`` recomputes every summary.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, F, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .models import (
+    AttendanceCounts, Enrollment, EnrollmentAttendanceMonth, Grade, Student, StudentSummary, grade_percentage,
+)
+
+RECENT_GRADES = 5
+BATCH_SIZE = 500
+STATUS_FIELDS = {
+    'Active': 'active_courses',
+    'Completed': 'completed_courses',
+    'Dropped': 'dropped_courses',
+    'Failed': 'failed_courses',
+}
+ATTENDANCE_FIELDS = [field.name for field in AttendanceCounts._meta.fields]
+UPDATE_FIELDS = [*STATUS_FIELDS.values(), *ATTENDANCE_FIELDS, 'average_grade', 'recent_grades', 'updated_at']
+
+
+def compute(student_ids):
+    """``{student_pk: StudentSummary}`` (unsaved) for every existing student in ``student_ids``."""
+    summaries = {
+        pk: StudentSummary(student_id=pk)
+        for pk in Student.objects.filter(pk__in=student_ids).values_list('pk', flat=True)
+    }
+    if not summaries:
+        return summaries
+    student_ids = list(summaries)
+
+    for student_id, status, count in (
+        Enrollment.objects.filter(student_id__in=student_ids).order_by()
+        .values_list('student_id', 'status').annotate(count=Count('pk'))
+    ):
+        if status in STATUS_FIELDS:
+            setattr(summaries[student_id], STATUS_FIELDS[status], count)
+
+    grades = Grade.objects.filter(enrollment__student_id__in=student_ids).order_by()
+    for row in grades.values(owner=F('enrollment__student_id')).annotate(average=Avg(grade_percentage())):
+        summaries[row['owner']].average_grade = round(row['average'], 2)
+
+    for row in (
+        EnrollmentAttendanceMonth.objects.filter(enrollment__student_id__in=student_ids).order_by()
+        .values(owner=F('enrollment__student_id'))
+        .annotate(**{field: Sum(field) for field in ATTENDANCE_FIELDS})
+    ):
+        for field in ATTENDANCE_FIELDS:
+            setattr(summaries[row['owner']], field, row[field] or 0)
+
+    latest = grades.with_letters().annotate(
+        owner=F('enrollment__student_id'),
+        course_name=F('enrollment__course__course_name'),
+        position=Window(
+            RowNumber(), partition_by=F('enrollment__student_id'), order_by=[F('date').desc(), F('pk').desc()],
+        ),
+    ).filter(position__lte=RECENT_GRADES).order_by('owner', 'position')
+    for row in latest.values('owner', 'assignment_name', 'course_name', 'marks_obtained', 'total_marks', 'letter', 'date'):
+        summaries[row['owner']].recent_grades.append({
+            'assignment_name': row['assignment_name'],
+            'course_name': row['course_name'],
+            'marks_obtained': str(row['marks_obtained']),
+            'total_marks': str(row['total_marks']),
+            'letter': row['letter'],
+            'date': row['date'].isoformat(),
+        })
+    return summaries
+
+
+def refresh(student_ids):
+    """Recompute and store the summaries of ``student_ids`` (``None`` entries are skipped)."""
+    student_ids = {pk for pk in student_ids if pk is not None}
+    if not student_ids:
+        return 0
+    summaries = compute(student_ids)
+    StudentSummary.objects.bulk_create(
+        summaries.values(), batch_size=BATCH_SIZE,
+        update_conflicts=True, unique_fields=['student'], update_fields=UPDATE_FIELDS,
+    )
+    return len(summaries)
+
+
+def refresh_enrollments(enrollment_ids):
+    """Refresh the summaries of the students behind ``enrollment_ids``."""
+    return refresh(
+        Enrollment.objects.filter(pk__in=[pk for pk in enrollment_ids if pk is not None])
+        .values_list('student_id', flat=True)
+    )
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Recompute every summary, ``batch_size`` students at a time. Returns the number written."""
+    student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+    with transaction.atomic():
+        StudentSummary.objects.all().delete()
+        return sum(
+            refresh(student_ids[start:start + batch_size])
+            for start in range(0, len(student_ids), batch_size)
+        )
+
+
+def get_summary(student):
+    """The stored summary of ``student``, or one computed on the spot if there is none yet."""
+    try:
+        return student.summary
+    except StudentSummary.DoesNotExist:
+        return compute([student.pk]).get(student.pk, StudentSummary(student=student))
@@ -0,0 +1,37 @@
+from django import template
+from django.utils.html import format_html
+
+from core import images
+
+register = template.Library()
+
+
+def _srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+@register.simple_tag
+def avatar(student, size):
+    """
+    The profile image of ``student`` shown ``size`` CSS pixels wide::
+
+        {% avatar student 45 %}
+
+    Uses the resized WebP/JPEG variants once they exist and the original
+    upload until then. Load ``profile_asset`` with the student (see
+    ``StudentQuerySet.for_list``) to avoid a query per avatar.
+    """
+    asset = student.profile_asset if student.profile_asset_id else None
+    if asset is None or asset.status != 'Ready':
+        return format_html('<img src="{}" alt="{}">', student.profile_image.url, student.full_name)
+
+    jpeg = images.variant_urls(asset, 'jpeg')
+    # Smallest variant covering the displayed size, for browsers without srcset.
+    fallback = next((url for width, url in jpeg if width >= size), jpeg[-1][1])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}px">'
+        '<img src="{}" srcset="{}" sizes="{}px" width="{}" height="{}" alt="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(images.variant_urls(asset, 'webp')), size,
+        fallback, _srcset(jpeg), size, size, size, student.full_name,
+    )
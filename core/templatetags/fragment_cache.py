@@ -0,0 +1,34 @@
+from django import template
+
+from core import fragments
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name):
+        self.nodelist = nodelist
+        self.name = name
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        if name not in fragments.FRAGMENTS:
+            raise template.TemplateSyntaxError(f'Unknown cached fragment {name!r}')
+        # The body is only rendered (and its lazy querysets only evaluated)
+        # when the cached copy cannot be used.
+        return fragments.get_or_render(name, lambda: self.nodelist.render(context))
+
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    """
+    Cache the enclosed template output under a versioned fragment key::
+
+        {% fragment_cache 'recent_students' %} ... {% endfragment_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires exactly one argument.")
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(nodelist, parser.compile_filter(bits[1]))
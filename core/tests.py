@@ -1,3 +1,1301 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from importlib import import_module
+from unittest import skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections
+from django.db.models import F
+from django.forms.models import model_to_dict
+from django.http import Http404
+from django.template import Context, Template
+from django.test import AsyncClient, AsyncRequestFactory, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Student, Course, Enrollment, Grade, Attendance, Announcement, ImageAsset, GradingScale, GradeBoundary, StudentSummary,
+    ReplicaHeartbeat, DashboardCounter, AttendanceBitmap,
+)
+from .search import search
+from .backends.sqlite import base as sqlite_backend
+from . import (
+    async_views, benchmarks, counters, datasets, exports, fragments, gradebook, grading, images, live, profiling,
+    replicas, summaries, transcripts,
+)
+from .attendance import (
+    AttendanceEntry, attendance_records, attendance_summary, convert_storage, rebuild_rollups, record_attendance,
+)
+from .forms import EnrollmentForm
+from .pagination import KeysetPaginator, clamp_page_size
+from .services import AlreadyEnrolled, CourseFull, bulk_enroll, enroll_student, reconcile_seats
+
+
+def create_student(index, **kwargs):
+    return Student.objects.create(**{
+        'first_name': f'First{index}',
+        'last_name': f'Last{index}',
+        'email': f'student{index}@example.com',
+        'phone': '1234567890',
+        'date_of_birth': datetime.date(2000, 1, 1),
+        'gender': 'M',
+        'address': 'Street',
+        'student_id': f'STU{index:05d}',
+        **kwargs,
+    })
+
+
+def create_course(index, **kwargs):
+    kwargs.setdefault('credits', 3)
+    return Course.objects.create(
+        course_code=f'CS{index:03d}',
+        course_name=f'Course {index}',
+        description='Description',
+        instructor='Instructor',
+        **kwargs,
+    )
+
+
+def create_records(count, offset=0):
+    """Create ``count`` students each with one enrollment, grade and attendance."""
+    for index in range(offset, offset + count):
+        student = create_student(index)
+        course = create_course(index)
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        Grade.objects.create(enrollment=enrollment, assignment_name='Quiz', marks_obtained=8, total_marks=10)
+        Attendance.objects.create(enrollment=enrollment, date=datetime.date(2025, 1, 1), status='Present')
+        Announcement.objects.create(title=f'Announcement {index}', content='Content')
+
+
+class AdminChangelistQueryCountTests(TestCase):
+    # Queries per changelist page, independent of the number of rows shown.
+    EXPECTED_QUERIES = {
+        'student': 6,
+        'course': 5,
+        'enrollment': 5,
+        'grade': 5,
+        'attendance': 7,
+        'announcement': 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        create_records(3)
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def assertChangelistQueries(self, model_name):
+        url = reverse(f'admin:core_{model_name}_changelist')
+        with self.assertNumQueries(self.EXPECTED_QUERIES[model_name]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelist_query_counts(self):
+        for model_name in self.EXPECTED_QUERIES:
+            with self.subTest(model=model_name):
+                self.assertChangelistQueries(model_name)
+
+    def test_changelist_query_counts_do_not_grow_with_rows(self):
+        create_records(10, offset=100)
+        for model_name in self.EXPECTED_QUERIES:
+            with self.subTest(model=model_name):
+                self.assertChangelistQueries(model_name)
+
+    def test_course_changelist_seat_columns(self):
+        course = Course.objects.first()
+        response = self.client.get(reverse('admin:core_course_changelist'))
+        result = response.context['cl'].result_list.get(pk=course.pk)
+        self.assertEqual(result.enrolled_count, 1)
+        self.assertEqual(result.seats_available, course.max_students - 1)
+
+    def test_enrollment_widgets_do_not_list_every_enrollment(self):
+        grade = Grade.objects.first()
+        response = self.client.get(reverse('admin:core_grade_change', args=[grade.pk]))
+        self.assertEqual(response.status_code, 200)
+        html = response.content.decode()
+        select = html[html.index('name="enrollment"'):]
+        select = select[:select.index('</select>')]
+        self.assertEqual(select.count('<option'), 1)
+
+
+class KeysetPaginationTests(TestCase):
+    ordering = ('-enrollment_date', 'pk')
+
+    @classmethod
+    def setUpTestData(cls):
+        # Three rows per day so most page boundaries fall inside a tie.
+        for index in range(12):
+            student = create_student(index)
+            Student.objects.filter(pk=student.pk).update(
+                enrollment_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=index // 3),
+            )
+
+    def paginator(self, per_page=5):
+        return KeysetPaginator(Student.objects.all(), ordering=self.ordering, per_page=per_page)
+
+    def expected(self):
+        return list(Student.objects.order_by(*self.ordering).values_list('pk', flat=True))
+
+    def test_pages_cover_every_row_once_in_order(self):
+        paginator = self.paginator()
+        seen, cursor, sizes = [], None, []
+        while True:
+            page = paginator.page(after=cursor)
+            seen += [student.pk for student in page]
+            sizes.append(len(page))
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, self.expected())
+        self.assertEqual(sizes, [5, 5, 2])
+
+    def test_previous_cursor_returns_the_same_rows(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        back = paginator.page(before=second.previous_cursor)
+        self.assertEqual([s.pk for s in back], [s.pk for s in first])
+        self.assertFalse(back.has_previous)
+        self.assertTrue(back.has_next)
+
+    def test_cursor_is_stable_when_rows_are_inserted_ahead_of_it(self):
+        paginator = self.paginator()
+        first = paginator.page()
+        expected = [s.pk for s in paginator.page(after=first.next_cursor)]
+        create_student(100)  # Newest enrollment date, so it sorts onto page one.
+        self.assertEqual([s.pk for s in paginator.page(after=first.next_cursor)], expected)
+
+    def test_view_ignores_bad_cursors_and_clamps_page_size(self):
+        self.assertEqual(clamp_page_size('1000'), 200)
+        self.assertEqual(clamp_page_size('0'), 1)
+        self.assertEqual(clamp_page_size('many'), 25)
+        response = self.client.get(reverse('student_list'), {'after': 'not-a-cursor', 'per_page': 4})
+        self.assertEqual([s.pk for s in response.context['page']], self.expected()[:4])
+        self.assertContains(response, f'after={response.context["page"].next_cursor}')
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.student = create_student(1)
+        self.course = create_course(1)
+
+    def test_saves_and_deletes_adjust_the_counters(self):
+        before = counters.read_counters()
+        enrollment = Enrollment.objects.create(student=self.student, course=self.course)
+        self.student.status = 'Inactive'
+        self.student.save()
+        self.assertEqual(counters.read_counters(), {
+            **before,
+            'students.active': before['students.active'] - 1,
+            'enrollments.total': before['enrollments.total'] + 1,
+            'enrollments.active': before['enrollments.active'] + 1,
+        })
+        enrollment.delete()
+        self.assertEqual(counters.read_counters()['enrollments.total'], before['enrollments.total'])
+
+    def test_deltas_stamp_updated_at(self):
+        counters.read_counters()
+        stale = timezone.now() - datetime.timedelta(days=1)
+        DashboardCounter.objects.update(updated_at=stale)
+        create_student(2)
+        self.assertGreater(DashboardCounter.objects.get(name='students.total').updated_at, stale)
+        self.assertEqual(DashboardCounter.objects.get(name='courses.total').updated_at, stale)
+
+    def test_reconcile_corrects_writes_that_skip_signals(self):
+        counters.read_counters()
+        Student.objects.update(status='Graduated')
+        self.assertEqual(counters.reconcile(fix=False), [('students.active', 1, 0)])
+        self.assertEqual(counters.read_counters()['students.active'], 1)
+
+        out = io.StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('students.active: stored=1 actual=0', out.getvalue())
+        self.assertEqual(counters.read_counters()['students.active'], 0)
+        self.assertEqual(counters.reconcile(), [])
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_records(3)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_writes_invalidate_only_dependent_fragments(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertNotContains(response, 'Newcomer')
+        self.assertTrue(all(fragments.is_fresh(name) for name in fragments.FRAGMENTS))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_student(50, first_name='Newcomer')
+        self.assertEqual(
+            {name for name in fragments.FRAGMENTS if not fragments.is_fresh(name)},
+            {'recent_students', 'recent_enrollments'},
+        )
+        self.assertContains(self.client.get(reverse('dashboard')), 'Newcomer')
+
+    def test_cached_fragments_skip_their_queries(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(reverse('dashboard'))
+        self.assertLess(len(warm), len(cold))
+
+    def test_stale_copy_is_served_while_another_request_rebuilds(self):
+        self.assertEqual(fragments.get_or_render('announcements', lambda: 'old'), 'old')
+        fragments.bump('core.announcement')
+        cache.add('fragments:announcements:lock', 1)
+        self.assertEqual(fragments.get_or_render('announcements', lambda: 'new'), 'old')
+        cache.delete('fragments:announcements:lock')
+        self.assertEqual(fragments.get_or_render('announcements', lambda: 'new'), 'new')
+        self.assertTrue(fragments.is_fresh('announcements'))
+
+
+class GradeStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        student = create_student(1)
+        cls.graded = Enrollment.objects.create(student=student, course=create_course(1))
+        cls.ungraded = Enrollment.objects.create(student=student, course=create_course(2))
+        for marks, total in [(8, 10), (5, 10), (18, 20)]:
+            Grade.objects.create(enrollment=cls.graded, assignment_name='Quiz', marks_obtained=marks, total_marks=total)
+
+    def test_aggregates_are_computed_per_enrollment(self):
+        with self.assertNumQueries(1):
+            stats = {enrollment.pk: enrollment for enrollment in Enrollment.objects.with_grade_stats()}
+        graded = stats[self.graded.pk]
+        self.assertEqual(graded.grade_count, 3)
+        self.assertAlmostEqual(graded.grade_avg, 220 / 3)
+        self.assertEqual((graded.grade_min, graded.grade_max), (50, 90))
+        # Same date throughout, so the newest row wins the tie.
+        self.assertEqual(graded.latest_grade, 90)
+
+        ungraded = stats[self.ungraded.pk]
+        self.assertEqual(ungraded.grade_count, 0)
+        self.assertIsNone(ungraded.grade_avg)
+        self.assertIsNone(ungraded.latest_grade)
+
+    def test_average_grade_matches_with_and_without_the_annotation(self):
+        annotated = Enrollment.objects.with_grade_stats().get(pk=self.graded.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.average_grade, 73.33)
+        self.assertEqual(Enrollment.objects.get(pk=self.graded.pk).average_grade, 73.33)
+        self.assertEqual(Enrollment.objects.with_grade_stats().get(pk=self.ungraded.pk).average_grade, 0)
+
+
+class EnrollmentServiceTests(TestCase):
+    def setUp(self):
+        self.course = create_course(1, max_students=2)
+        self.students = [create_student(index) for index in range(4)]
+
+    def test_enroll_student_rejects_when_full(self):
+        enroll_student(self.students[0], self.course)
+        enroll_student(self.students[1], self.course)
+        with self.assertRaises(CourseFull):
+            enroll_student(self.students[2], self.course)
+        with self.assertRaises(AlreadyEnrolled):
+            enroll_student(self.students[0], self.course)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrolled, 2)
+
+    def test_seat_counter_follows_status_changes(self):
+        enrollment = enroll_student(self.students[0], self.course)
+        enrollment.status = 'Dropped'
+        enrollment.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrolled, 0)
+        enroll_student(self.students[0], self.course)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrolled, 1)
+
+    def test_bulk_enroll_fills_remaining_seats(self):
+        enroll_student(self.students[0], self.course)
+        result = bulk_enroll(self.course, self.students)
+        self.assertEqual(result.already_enrolled, [self.students[0]])
+        self.assertEqual(result.enrolled, [self.students[1]])
+        self.assertEqual(result.rejected, self.students[2:])
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrolled, 2)
+        self.assertEqual(Enrollment.objects.filter(course=self.course, status='Active').count(), 2)
+
+    def test_admin_and_form_enrollments_respect_capacity(self):
+        enroll_student(self.students[0], self.course)
+        enroll_student(self.students[1], self.course)
+        form = EnrollmentForm({'student': self.students[2].pk, 'course': self.course.pk, 'status': 'Active'})
+        self.assertEqual(form.errors['course'], [f'{self.course} has no seats left.'])
+        dropped = EnrollmentForm({'student': self.students[2].pk, 'course': self.course.pk, 'status': 'Dropped'})
+        self.assertTrue(dropped.is_valid())
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.post(reverse('admin:core_enrollment_add'), {
+            'student': self.students[3].pk, 'course': self.course.pk, 'status': 'Active',
+            'final_grade': '', 'completion_date': '',
+        })
+        self.assertContains(response, 'has no seats left.')
+
+        # Saves that skip validation still cannot overfill the course.
+        with self.assertRaises(CourseFull):
+            Enrollment.objects.create(student=self.students[3], course=self.course)
+        self.assertFalse(Enrollment.objects.filter(student=self.students[3]).exists())
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrolled, 2)
+
+    def test_course_can_be_saved_again_after_delete(self):
+        enroll_student(self.students[0], self.course)
+        self.course.refresh_from_db()
+        self.course.delete()
+        self.course.save()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.active_enrolled, 0)
+        enroll_student(self.students[0], self.course)
+
+    @override_settings(API_TOKENS=['tablet-secret'])
+    def test_api_accepts_csrf_token_or_bearer_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = reverse('api_course_enroll', args=[self.course.pk])
+
+        def enroll(index, **headers):
+            data = {'student_ids': [self.students[index].student_id]}
+            return client.post(url, data, content_type='application/json', headers=headers)
+
+        self.assertEqual(enroll(0).status_code, 403)
+        self.assertEqual(enroll(0, authorization='Bearer wrong').status_code, 401)
+        self.assertEqual(enroll(0, authorization='Bearer tablet-secret').status_code, 200)
+        # A page hands out the CSRF cookie; scripts echo it in a header.
+        client.get(reverse('attendance_roster', args=[self.course.pk]))
+        response = enroll(1, x_csrftoken=client.cookies['csrftoken'].value)
+        self.assertEqual(response.json()['enrolled'], [self.students[1].student_id])
+
+
+class SearchIndexTests(TestCase):
+    def test_new_rows_are_indexed_after_migrations(self):
+        # Later migrations rebuild these tables; the sync triggers must survive.
+        course = create_course(1)
+        student = create_student(1)
+        self.assertEqual(list(search(Course.objects.all(), 'instruct')), [course])
+        self.assertEqual(list(search(Student.objects.all(), 'first1')), [student])
+
+    def test_ranking_and_prefix_matching(self):
+        by_email = create_student(1, email='zed@example.com')
+        by_name = create_student(2, first_name='Zed')
+        create_student(3)
+        self.assertEqual(list(search(Student.objects.all(), 'ze').order_by('search_rank')), [by_name, by_email])
+        # Words match from their start only.
+        self.assertEqual(list(search(Student.objects.all(), 'ed')), [])
+        # Also as a subquery, where the index is joined under another alias.
+        course = create_course(1)
+        Enrollment.objects.create(student=by_email, course=course)
+        students = search(Student.objects.all(), 'zed').values('pk')
+        self.assertEqual(Enrollment.objects.filter(student__in=students).count(), 1)
+
+    def test_rebuild_command_repopulates_the_index(self):
+        create_student(1)
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO core_student_fts(core_student_fts) VALUES ('delete-all')")
+        self.assertFalse(search(Student.objects.all(), 'first1').exists())
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Rebuilt core_student_fts', out.getvalue())
+        self.assertTrue(search(Student.objects.all(), 'first1').exists())
+
+
+@skipIf(gradebook.np is None, 'numpy is not installed')
+class GradebookTests(TestCase):
+    def test_matrix_matches_grade_properties(self):
+        course = create_course(1)
+        enrollments = [
+            Enrollment.objects.create(student=create_student(index), course=course) for index in range(3)
+        ]
+        marks = [(0, 'Quiz', 9, 10), (1, 'Quiz', 45, 100), (1, 'Midterm', 2, 3), (2, 'Midterm', 39.99, 100)]
+        grades = [
+            Grade.objects.create(
+                enrollment=enrollments[index], assignment_name=name, marks_obtained=obtained, total_marks=total,
+            )
+            for index, name, obtained, total in marks
+        ]
+        book = gradebook.build_gradebook(course)
+        self.assertEqual(book.assignments, ['Quiz', 'Midterm'])
+        cells = {
+            (student['student_id'], assignment): cell
+            for student, _, row in book.rows()
+            for assignment, cell in zip(book.assignments, row)
+        }
+        for grade in grades:
+            percentage, letter = cells[(grade.enrollment.student.student_id, grade.assignment_name)]
+            self.assertAlmostEqual(percentage, float(grade.percentage))
+            self.assertEqual(letter, grade.grade_letter)
+        self.assertEqual(cells[('STU00000', 'Midterm')], (None, ''))
+
+        quiz = book.statistics()[0]
+        self.assertEqual((quiz['count'], quiz['mean'], quiz['median'], quiz['std']), (2, 67.5, 67.5, 22.5))
+        self.assertEqual(quiz['letters']['A+'], 1)
+        self.assertEqual(quiz['letters']['D'], 1)
+
+
+class TranscriptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        self.courses = [create_course(index, credits=index + 1) for index in range(3)]
+
+    def enroll(self, course, completed, **kwargs):
+        return Enrollment.objects.create(
+            student=self.student, course=course, status='Completed', completion_date=completed, **kwargs,
+        )
+
+    def test_term_and_cumulative_gpa(self):
+        self.enroll(self.courses[0], datetime.date(2024, 3, 1), final_grade='A')
+        graded = self.enroll(self.courses[1], datetime.date(2024, 4, 1))
+        Grade.objects.create(enrollment=graded, assignment_name='Exam', marks_obtained=85, total_marks=100)
+        self.enroll(self.courses[2], datetime.date(2024, 10, 1), final_grade='F')
+
+        transcript = transcripts.get_transcript(self.student)
+        spring, fall = transcript['terms']
+        self.assertEqual((spring['term'], spring['gpa'], spring['credits']), ('Spring 2024', 3.7, 3))
+        self.assertEqual((fall['term'], fall['gpa'], fall['cumulative_gpa']), ('Fall 2024', 0.0, 1.85))
+        self.assertEqual((transcript['gpa'], transcript['credits']), (1.85, 6))
+
+    def test_grade_changes_invalidate_cached_transcript(self):
+        enrollment = self.enroll(self.courses[1], datetime.date(2024, 4, 1))
+        grade = Grade.objects.create(enrollment=enrollment, assignment_name='Exam', marks_obtained=85, total_marks=100)
+        self.assertEqual(transcripts.get_transcript(self.student)['gpa'], 3.7)
+        with self.captureOnCommitCallbacks(execute=True):
+            grade.marks_obtained = 50
+            grade.save()
+        self.assertEqual(transcripts.get_transcript(self.student)['gpa'], 2.0)
+
+    def test_warm_command_needs_a_shared_cache(self):
+        self.enroll(self.courses[0], datetime.date(2024, 3, 1), final_grade='A')
+        with self.assertRaisesMessage(CommandError, 'LocMemCache'):
+            call_command('warm_transcripts', stdout=io.StringIO())
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+        with override_settings(CACHES=shared):
+            out = io.StringIO()
+            call_command('warm_transcripts', stdout=out)
+            self.assertIn('Cached 1 transcript(s)', out.getvalue())
+            self.assertEqual(cache.get(transcripts.CACHE_KEY.format(self.student.pk))['gpa'], 3.7)
+
+
+class StudentSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        self.courses = [create_course(index) for index in range(2)]
+
+    def summary(self):
+        return Student.objects.select_related('summary').get(pk=self.student.pk).summary
+
+    def test_writes_refresh_the_summary(self):
+        first = Enrollment.objects.create(student=self.student, course=self.courses[0])
+        bulk_enroll(self.courses[1], [self.student])
+        Grade.objects.create(enrollment=first, assignment_name='Quiz', marks_obtained=6, total_marks=10)
+        Grade.objects.create(enrollment=first, assignment_name='Exam', marks_obtained=9, total_marks=10)
+        record_attendance([AttendanceEntry(first.pk, datetime.date(2025, 1, 1), 'Present')])
+        first.status = 'Completed'
+        first.save()
+
+        summary = self.summary()
+        self.assertEqual((summary.total_courses, summary.active_courses, summary.completed_courses), (2, 1, 1))
+        self.assertEqual((summary.average_grade, summary.present), (75.0, 1))
+        self.assertEqual([grade.assignment_name for grade in summary.latest_grades()], ['Exam', 'Quiz'])
+        self.assertEqual(summary.latest_grades()[0].course_name, 'Course 0')
+
+        first.delete()
+        summary = self.summary()
+        self.assertEqual((summary.total_courses, summary.average_grade, summary.recent_grades), (1, None, []))
+
+        stored = model_to_dict(summary, exclude=['updated_at'])
+        summaries.rebuild()
+        self.assertEqual(model_to_dict(self.summary(), exclude=['updated_at']), stored)
+
+    def test_migration_backfills_existing_students(self):
+        Enrollment.objects.create(student=self.student, course=self.courses[0])
+        StudentSummary.objects.all().delete()
+        backfill = import_module('core.migrations.0015_backfill_student_summaries').backfill_summaries
+        backfill(None, None)
+        self.assertEqual(self.summary().active_courses, 1)
+
+    def test_attendance_rows_refresh_the_summary(self):
+        enrollment = Enrollment.objects.create(student=self.student, course=self.courses[0])
+        record = Attendance.objects.create(enrollment=enrollment, date=datetime.date(2025, 1, 1), status='Present')
+        self.assertEqual((self.summary().present, self.summary().absent), (1, 0))
+        record.status = 'Absent'
+        record.save()
+        self.assertEqual((self.summary().present, self.summary().absent), (0, 1))
+        record.delete()
+        self.assertEqual((self.summary().present, self.summary().absent), (0, 0))
+
+    def test_profile_page_queries_do_not_grow_with_records(self):
+        enrollments = [Enrollment.objects.create(student=self.student, course=course) for course in self.courses]
+        for enrollment in enrollments:
+            for index in range(10):
+                Grade.objects.create(enrollment=enrollment, assignment_name=f'Quiz {index}', marks_obtained=7, total_marks=10)
+        url = reverse('student_detail', args=[self.student.pk])
+        self.client.get(url)
+        # Student with its summary, and enrollments; the transcript is cached.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertContains(response, 'Quiz 9')
+        self.assertEqual(len(response.context['recent_grades']), summaries.RECENT_GRADES)
+
+
+class GradingScaleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student(1)
+        self.strict, self.standard = create_course(1), create_course(2)
+        scale = GradingScale.objects.create(name='Strict')
+        GradeBoundary.objects.bulk_create([
+            GradeBoundary(scale=scale, letter=letter, min_percentage=minimum)
+            for letter, minimum in (('A', 95), ('B', 85), ('C', 75))
+        ])
+        self.strict.grading_scale = scale
+        self.strict.save()
+        # The strict course is graded last, so its grades are the recent ones.
+        for course in (self.standard, self.strict):
+            enrollment = Enrollment.objects.create(student=self.student, course=course)
+            for marks in (96, 90, 80, 70, 30):
+                Grade.objects.create(enrollment=enrollment, assignment_name=f'Quiz {marks}', marks_obtained=marks, total_marks=100)
+
+    def test_sql_and_python_letters_agree(self):
+        grades = list(Grade.objects.with_letters().select_related('enrollment__course').order_by('pk'))
+        self.assertEqual(
+            [grade.letter for grade in grades],
+            ['A+', 'A+', 'A', 'B+', 'F', 'A', 'B', 'C', 'F', 'F'],
+        )
+        for grade in grades:
+            del grade.letter
+        with self.assertNumQueries(0):
+            self.assertEqual([grade.grade_letter for grade in grades][5:], ['A', 'B', 'C', 'F', 'F'])
+
+        with self.assertNumQueries(1):
+            distribution = grading.letter_distribution()
+        self.assertEqual(distribution[self.strict.pk], {'A': 1, 'B': 1, 'C': 1, 'F': 2})
+        self.assertEqual(
+            grading.course_distribution(self.strict), [('A', 1), ('B', 1), ('C', 1), ('F', 2)],
+        )
+
+    def test_boundary_values_round_the_same_everywhere(self):
+        enrollment = Enrollment.objects.get(course=self.standard)
+        # 89.995% rounds up to 90.00%.
+        for marks, letter in ((Decimal('179.99'), 'A+'), (Decimal('179.98'), 'A')):
+            grade = Grade.objects.create(enrollment=enrollment, assignment_name='Final', marks_obtained=marks, total_marks=200)
+            annotated = Grade.objects.with_letters().get(pk=grade.pk)
+            self.assertEqual((annotated.letter, annotated.percent), (letter, float(grade.percentage)))
+            self.assertEqual(Grade.objects.get(pk=grade.pk).grade_letter, letter)
+            self.assertEqual(gradebook.build_gradebook(self.standard).letters[0, -1], letter)
+            grade.delete()
+
+    def test_grade_letter_uses_the_loaded_course(self):
+        grades = list(Grade.objects.select_related('enrollment__course').filter(enrollment__course=self.strict))
+        grading.scales()
+        with self.assertNumQueries(0):
+            self.assertEqual(sorted(grade.grade_letter for grade in grades), ['A', 'B', 'C', 'F', 'F'])
+        grade = Grade.objects.get(pk=grades[0].pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(grade.grade_letter, grades[0].grade_letter)
+
+    def test_boundary_changes_regrade(self):
+        def strict_letters():
+            summary = StudentSummary.objects.get(student=self.student)
+            return sorted(grade.grade_letter for grade in summary.latest_grades() if grade.course_name == 'Course 1')
+
+        self.assertEqual(strict_letters(), ['A', 'B', 'C', 'F', 'F'])
+        boundary = GradeBoundary.objects.get(letter='C')
+        boundary.min_percentage = 65
+        with self.captureOnCommitCallbacks(execute=True):
+            boundary.save()
+        self.assertEqual(grading.course_distribution(self.strict)[-2:], [('C', 2), ('F', 1)])
+        self.assertEqual(strict_letters(), ['A', 'B', 'C', 'C', 'F'])
+
+
+class AttendanceRollupTests(TestCase):
+    def setUp(self):
+        self.course = create_course(1)
+        self.enrollments = [
+            Enrollment.objects.create(student=create_student(index), course=self.course) for index in range(3)
+        ]
+
+    def record(self, day, *statuses):
+        record_attendance(
+            AttendanceEntry(enrollment.pk, day, status) for enrollment, status in zip(self.enrollments, statuses)
+        )
+
+    def test_rollups_follow_batch_and_single_writes(self):
+        self.record(datetime.date(2025, 1, 10), 'Present', 'Late', 'Excused')
+        self.record(datetime.date(2025, 2, 10), 'Absent', 'Present', 'Present')
+        self.record(datetime.date(2025, 2, 10), 'Late', 'Present', 'Present')
+        record = Attendance.objects.get(enrollment=self.enrollments[2], date=datetime.date(2025, 1, 10))
+        record.status = 'Absent'
+        record.save()
+
+        summary = attendance_summary(student=self.enrollments[0].student)
+        self.assertEqual((summary.present, summary.late, summary.absent), (1, 1, 0))
+        self.assertEqual(summary.percentage, 100)
+        self.assertEqual(attendance_summary(student=self.enrollments[2].student).percentage, 50)
+
+        course = attendance_summary(course=self.course, start=datetime.date(2025, 2, 1))
+        self.assertEqual((course.present, course.late, course.total), (2, 1, 3))
+        partial = attendance_summary(student=self.enrollments[0].student, start=datetime.date(2025, 1, 15))
+        self.assertEqual((partial.late, partial.total), (1, 1))
+
+    def test_roster_and_batch_reject_impossible_dates(self):
+        url = reverse('attendance_roster', args=[self.course.pk])
+        self.assertEqual(self.client.get(url, {'date': '2025-02-30'}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'date': '2025-02-30'}).status_code, 400)
+
+        response = self.client.post(reverse('api_attendance_batch'), {'records': [
+            {'enrollment': self.enrollments[0].pk, 'date': '2025-02-28', 'status': 'Present'},
+            {'enrollment': self.enrollments[1].pk, 'date': '2025-02-30', 'status': 'Present'},
+            {'enrollment': self.enrollments[2].pk, 'date': '28/02/2025', 'status': 'Present'},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['saved'], 1)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        self.record(datetime.date(2025, 1, 10), 'Present', 'Late', 'Excused')
+        Attendance.objects.filter(enrollment=self.enrollments[1]).first().delete()
+        before = attendance_summary(course=self.course).as_dict()
+        rebuild_rollups()
+        self.assertEqual(attendance_summary(course=self.course).as_dict(), before)
+        self.assertEqual(attendance_summary(course=self.course).total, 2)
+
+
+@override_settings(ATTENDANCE_STORAGE='bitmap')
+class BitmapAttendanceTests(TestCase):
+    def setUp(self):
+        self.enrollment = Enrollment.objects.create(student=create_student(1), course=create_course(1))
+
+    def test_bitmap_storage_round_trip(self):
+        record_attendance([
+            AttendanceEntry(self.enrollment.pk, datetime.date(2025, 3, 1), 'Present'),
+            AttendanceEntry(self.enrollment.pk, datetime.date(2025, 3, 31), 'Excused', 'Doctor'),
+            AttendanceEntry(self.enrollment.pk, datetime.date(2025, 4, 2), 'Late'),
+        ])
+        record_attendance([AttendanceEntry(self.enrollment.pk, datetime.date(2025, 3, 1), 'Absent')])
+
+        self.assertFalse(Attendance.objects.exists())
+        records = [(entry.date.isoformat(), entry.status, entry.remarks) for entry in attendance_records([self.enrollment.pk])]
+        self.assertEqual(records, [
+            ('2025-03-01', 'Absent', ''),
+            ('2025-03-31', 'Excused', 'Doctor'),
+            ('2025-04-02', 'Late', ''),
+        ])
+        summary = attendance_summary(enrollment=self.enrollment)
+        self.assertEqual((summary.absent, summary.late, summary.excused, summary.percentage), (1, 1, 1, 50))
+
+        with override_settings(ATTENDANCE_STORAGE='rows'):
+            self.assertEqual(convert_storage('rows'), 3)
+            self.assertEqual(
+                [(entry.date.isoformat(), entry.status, entry.remarks) for entry in attendance_records([self.enrollment.pk])],
+                records,
+            )
+
+    def test_rows_convert_to_bitmaps_in_batches(self):
+        other = Enrollment.objects.create(student=create_student(2), course=self.enrollment.course)
+        entries = [
+            (other, datetime.date(2025, 4, 2), 'Late', ''),
+            (self.enrollment, datetime.date(2025, 3, 31), 'Excused', 'Doctor'),
+            (other, datetime.date(2025, 3, 5), 'Absent', 'Sick'),
+            (self.enrollment, datetime.date(2025, 3, 1), 'Present', ''),
+            (self.enrollment, datetime.date(2025, 5, 9), 'Present', ''),
+        ]
+        for enrollment, date, status, remarks in entries:
+            Attendance.objects.create(enrollment=enrollment, date=date, status=status, remarks=remarks)
+        expected = sorted((enrollment.pk, date, status, remarks) for enrollment, date, status, remarks in entries)
+
+        # One bitmap per (enrollment, month), flushed a row at a time.
+        self.assertEqual(convert_storage('bitmap', batch_size=1, delete_source=True), 5)
+        self.assertFalse(Attendance.objects.exists())
+        self.assertEqual(AttendanceBitmap.objects.count(), 4)
+        records = attendance_records([self.enrollment.pk, other.pk])
+        self.assertEqual(
+            sorted((entry.enrollment_id, entry.date, entry.status, entry.remarks) for entry in records), expected,
+        )
+
+    def test_heatmap_endpoint(self):
+        record_attendance([
+            AttendanceEntry(self.enrollment.pk, datetime.date(2025, 5, 5), 'Present'),
+            AttendanceEntry(self.enrollment.pk, datetime.date(2024, 5, 5), 'Absent'),
+        ])
+        url = reverse('api_student_attendance_heatmap', args=[self.enrollment.student.pk])
+        data = self.client.get(url, {'year': 2025}).json()
+        self.assertEqual([day['date'] for day in data['days']], ['2025-05-05'])
+        self.assertEqual(data['summary']['present'], 1)
+
+
+class ReadOnlyAPITests(TestCase):
+    # Queries per 200 response; a 304 must not query at all.
+    EXPECTED_QUERIES = {
+        'api_student_list': 1,
+        'api_student_detail': 2,
+        'api_course_list': 1,
+        'api_course_detail': 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        create_records(5)
+
+    def setUp(self):
+        cache.clear()
+        self.student = Student.objects.first()
+        self.course = Course.objects.first()
+
+    def url(self, name):
+        if name.endswith('_detail'):
+            pk = self.student.pk if 'student' in name else self.course.pk
+            return reverse(name, args=[pk])
+        return reverse(name)
+
+    def test_query_counts_and_not_modified(self):
+        for name, queries in self.EXPECTED_QUERIES.items():
+            with self.subTest(endpoint=name):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(self.url(name))
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(self.url(name), HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(self.url(name), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(cached.status_code, 304)
+
+    def test_sparse_fieldsets_and_pagination(self):
+        response = self.client.get(reverse('api_student_list'), {'fields': 'student_id,status', 'per_page': 3})
+        body = response.json()
+        self.assertEqual([set(row) for row in body['results']], [{'student_id', 'status'}] * 3)
+        rest = self.client.get(reverse('api_student_list'), {'fields': 'student_id', 'after': body['next']}).json()
+        self.assertEqual(len(rest['results']), 2)
+        self.assertIsNone(rest['next'])
+
+        response = self.client.get(self.url('api_course_detail'), {'fields': 'seats_available,enrollments'})
+        self.assertEqual(response.json()['seats_available'], self.course.max_students - 1)
+        self.assertEqual(response.json()['enrollments'][0]['student_id'], 'STU00000')
+
+        response = self.client.get(reverse('api_course_list'), {'fields': 'course_code,address'})
+        self.assertEqual((response.status_code, response.json()['unknown']), (400, ['address']))
+
+    def test_deploy_check_requires_a_shared_fragment_cache(self):
+        errors = fragments.check_shared_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(fragments.check_shared_cache(None), [])
+
+    def test_writes_change_the_etag(self):
+        url = self.url('api_course_detail')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=create_student(99), course=self.course)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['enrollments']), 2)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_records(3)
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def test_asgi_export_streams_chunk_by_chunk(self):
+        client = AsyncClient()
+        client.force_login(self.staff)
+
+        async def download():
+            response = await client.get(reverse('export_data', args=['students']))
+            return response, [chunk async for chunk in response.streaming_content]
+
+        response, chunks = async_to_sync(download)()
+        self.assertTrue(response.is_async)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['student_id', 'first_name'])
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['STU00000', 'STU00001', 'STU00002'])
+
+    def download(self, kind, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('export_data', args=[kind]), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_filtered_csv_and_jsonl_output(self):
+        Student.objects.filter(student_id='STU00001').update(status='Graduated')
+        response, body = self.download('students', status='Graduated')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="students.csv"')
+        self.assertEqual(
+            body.decode().splitlines()[1],
+            'STU00001,First1,Last1,student1@example.com,1234567890,2000-01-01,M,Unknown,Unknown,000000,India,'
+            f'Graduated,{Student.objects.get(student_id="STU00001").enrollment_date}',
+        )
+        self.assertEqual(len(body.decode().splitlines()), 2)
+
+        response, body = self.download('grades', format='jsonl', student_q='First2')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        [row] = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(
+            (row['student_id'], row['course_code'], row['marks_obtained'], row['total_marks']),
+            ('STU00002', 'CS002', '8.00', '10.00'),
+        )
+
+    def test_gzip_matches_the_plain_stream(self):
+        _, plain = self.download('enrollments')
+        response, compressed = self.download('enrollments', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(compressed), plain)
+        self.assertEqual(len(plain.decode().splitlines()), 4)
+
+    def test_rows_are_batched_and_unknown_exports_are_404(self):
+        export = exports.EXPORTS['students']
+        lines = exports.csv_lines(export, export.rows({}))
+        self.assertEqual(len(list(exports._batched_bytes(lines, batch_bytes=1))), 4)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('export_data', args=['secrets'])).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse('export_data', args=['students']), {'format': 'xml'}).status_code, 404,
+        )
+
+
+class ImportTests(TestCase):
+    header = 'first_name,last_name,email,phone,date_of_birth,gender,address,student_id\n'
+
+    def upload(self, content, name='students.csv'):
+        if isinstance(content, str):
+            content = content.encode()
+        response = self.client.post(reverse('student_import'), {'file': SimpleUploadedFile(name, content)})
+        self.assertEqual(response.status_code, 200)
+        return response, [str(message) for message in get_messages(response.wsgi_request)]
+
+    def test_valid_file_creates_every_row(self):
+        response, messages = self.upload(
+            self.header
+            + 'Ada,Lovelace,ada@example.com,123,2000-01-01,F,Street,IMP001\n'
+            + 'Alan,Turing,alan@example.com,123,2000-01-01,M,Street,IMP002\n'
+        )
+        self.assertEqual(messages, ['created 2, updated 0; 0 of 2 row(s) rejected.'])
+        self.assertEqual(
+            sorted(Student.objects.values_list('student_id', flat=True)), ['IMP001', 'IMP002'],
+        )
+        # Imported students get their profile summary like saved ones do.
+        self.assertEqual(StudentSummary.objects.filter(student__student_id__startswith='IMP').count(), 2)
+
+    def test_invalid_rows_are_reported_by_line(self):
+        response, messages = self.upload(
+            self.header
+            + 'Ada,Lovelace,ada@example.com,123,2000-01-01,F,Street,IMP001\n'
+            + 'Alan,Turing,not-an-email,123,2000-01-01,M,Street,IMP002\n'
+        )
+        self.assertEqual(messages, ['created 1, updated 0; 1 of 2 row(s) rejected.'])
+        [(line, message)] = response.context['report'].errors
+        self.assertEqual(line, 3)
+        self.assertIn('email', message)
+        self.assertEqual(list(Student.objects.values_list('student_id', flat=True)), ['IMP001'])
+
+    def test_unreadable_files_are_reported_not_raised(self):
+        latin1 = (self.header + 'José,Núñez,jose@example.com,123,2000-01-01,M,Street,IMP001\n').encode('latin-1')
+        _, messages = self.upload(latin1)
+        self.assertEqual(len(messages), 1)
+        self.assertIn('not UTF-8', messages[0])
+
+        _, messages = self.upload(self.header + '"unterminated' + 'x' * 200000 + '\n')
+        self.assertEqual(len(messages), 1)
+        self.assertIn('not valid CSV', messages[0])
+
+        _, messages = self.upload(b'not a zip archive', name='students.xlsx')
+        self.assertEqual(len(messages), 1)
+        self.assertFalse(Student.objects.exists())
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_records(3)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, view, *args):
+        request = AsyncRequestFactory().get('/')
+        request.user = AnonymousUser()
+        return async_to_sync(view)(request, *args)
+
+    def test_dashboard_skips_cached_fragments(self):
+        with self.assertNumQueries(5):
+            response = self.get(async_views.dashboard)
+        self.assertContains(response, 'First2 Last2')
+        with self.assertNumQueries(1):
+            self.get(async_views.dashboard)
+
+    def test_detail_pages(self):
+        student = Student.objects.first()
+        course = Course.objects.first()
+        grading.scales()
+        with self.assertNumQueries(3):
+            response = self.get(async_views.student_detail, student.pk)
+        self.assertContains(response, student.student_id)
+        with self.assertNumQueries(3):
+            response = self.get(async_views.course_detail, course.pk)
+        self.assertContains(response, course.course_code)
+        with self.assertRaises(Http404):
+            self.get(async_views.course_detail, 0)
+
+
+class ProfileImageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root, IMAGE_PIPELINE={'WORKERS': 0})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'teal').save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_variants_are_generated_once_per_content(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = create_student(1, profile_image=self.upload())
+        second = create_student(2, profile_image=self.upload())
+
+        asset = ImageAsset.objects.get()
+        self.assertEqual(asset.status, 'Ready')
+        self.assertEqual((first.profile_asset, second.profile_asset), (asset, asset))
+        self.assertEqual(second.profile_image.name, first.profile_image.name)
+        for size in images.get_setting('SIZES'):
+            self.assertTrue(default_storage.exists(images.variant_name(asset.content_hash, size, 'webp')))
+
+        student = Student.objects.for_list().get(pk=second.pk)
+        with self.assertNumQueries(0):
+            html = Template('{% load avatars %}{% avatar student 45 %}').render(Context({'student': student}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f'{asset.content_hash}-96.jpg 96w', html)
+
+
+class QueryProfilerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        create_records(3)
+
+    def setUp(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        settings = override_settings(QUERY_PROFILER={
+            'SAMPLE_RATE': 1.0, 'SLOW_QUERY_MS': 0, 'LOG_FILE': f'{log_dir}/queries.log',
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # The handler is bound to a file on first use, possibly by a request
+        # an earlier test happened to sample.
+        self.remove_log_handler()
+        self.addCleanup(self.remove_log_handler)
+
+    def remove_log_handler(self):
+        for handler in profiling.logger.handlers:
+            handler.close()
+        profiling.logger.handlers.clear()
+
+    def test_sampled_requests_are_logged_per_view(self):
+        self.client.get(reverse('student_list'))
+        self.client.get(reverse('student_list'))
+        record = profiling.read_log()[-1]
+        self.assertEqual(record['view'], 'student_list')
+        self.assertGreater(record['queries'], 0)
+        self.assertTrue(record['slowest'][0]['plan'])
+
+        summary = profiling.summarize(profiling.read_log())
+        self.assertEqual((summary[0]['view'], summary[0]['requests']), ('student_list', 2))
+
+    def test_async_requests_are_profiled_without_adapting_middleware(self):
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+        async_to_sync(AsyncClient().get)(reverse('student_list'))
+        record = profiling.read_log()[-1]
+        self.assertEqual(record['view'], 'student_list')
+        self.assertGreater(record['queries'], 0)
+
+    def test_repeated_statements(self):
+        with profiling.QueryProfile() as profile:
+            for enrollment in Enrollment.objects.all():
+                enrollment.student.student_id
+        (sql, count), = profile.duplicates()
+        self.assertIn('FROM "core_student"', sql)
+        self.assertEqual(count, 3)
+
+    def test_report_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('query_report')).status_code, 302)
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('query_report'))
+        self.assertContains(response, 'Query Report')
+
+
+class DatasetTests(TestCase):
+    options = datasets.Options(
+        students=12, courses=4, enrollments_per_student=3, grades_per_enrollment=2,
+        attendance_days=3, announcements=2, as_of=datetime.date(2026, 1, 15),
+    )
+
+    def snapshot(self):
+        return (
+            list(Student.objects.order_by('student_id').values_list('student_id', 'email', 'status')),
+            list(Enrollment.objects.order_by('student__student_id', 'course__course_code')
+                 .values_list('student__student_id', 'course__course_code', 'status')),
+            list(Grade.objects.order_by('pk').values_list('assignment_name', 'marks_obtained')),
+        )
+
+    def test_generation_is_reproducible(self):
+        datasets.generate(self.options)
+        self.assertEqual(Student.objects.count(), 12)
+        self.assertEqual(Enrollment.objects.count(), 36)
+        self.assertTrue(0 < Grade.objects.count() <= 72)
+        self.assertEqual(reconcile_seats(fix=False), [])
+        first = self.snapshot()
+
+        Student.objects.all().delete()
+        Course.objects.all().delete()
+        datasets.generate(self.options)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_generated_dates_are_kept_without_touching_the_model_fields(self):
+        fields = [
+            Student._meta.get_field('enrollment_date'),
+            Enrollment._meta.get_field('enrollment_date'),
+            Announcement._meta.get_field('created_at'),
+        ]
+        # Other threads keep saving while a dataset is generated.
+        datasets.generate(self.options, progress=lambda *args: self.assertTrue(all(f.auto_now_add for f in fields)))
+        self.assertTrue(all(field.auto_now_add for field in fields))
+        self.assertLess(Student.objects.order_by('enrollment_date').first().enrollment_date, self.options.as_of)
+        self.assertFalse(Enrollment.objects.filter(enrollment_date=datetime.date.today()).exists())
+        self.assertLess(Announcement.objects.order_by('created_at').first().created_at.date(), self.options.as_of)
+
+    def test_benchmark_regressions(self):
+        baseline = {'dashboard': {'ms': 10.0, 'queries': 3, 'status': 200}}
+        self.assertEqual(benchmarks.compare({'dashboard': {'ms': 11.0, 'queries': 3, 'status': 200}}, baseline), [])
+        self.assertEqual(benchmarks.compare({'other': {'ms': 99.0, 'queries': 9, 'status': 200}}, baseline), [])
+        regressions = benchmarks.compare({'dashboard': {'ms': 20.0, 'queries': 4, 'status': 200}}, baseline)
+        self.assertEqual([reason for _, reason in regressions], ['3 -> 4 queries', '10.0 -> 20.0 ms'])
+
+
+class ProductionSQLiteTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.name = f'{directory}/db.sqlite3'
+
+    def connect(self, **options):
+        settings = dict(connection.settings_dict, ENGINE='core.backends.sqlite', NAME=self.name, OPTIONS={
+            'transaction_mode': 'IMMEDIATE', **options,
+        })
+        return sqlite_backend.DatabaseWrapper(settings, alias='production')
+
+    def test_pragmas(self):
+        wrapper = self.connect()
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            values = {}
+            for name in ('journal_mode', 'synchronous', 'temp_store', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {name}')
+                values[name] = cursor.fetchone()[0]
+        # synchronous NORMAL is 1, temp_store MEMORY is 2.
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2, 'busy_timeout': 5000})
+
+    def test_locked_statements_are_retried(self):
+        options = {'pragmas': {'busy_timeout': 10}, 'retry_delay': 0.05}
+        writer = self.connect(lock_retries=5, **options)
+        self.addCleanup(writer.close)
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+
+        locked = threading.Event()
+
+        def hold_write_lock():
+            holder = self.connect()
+            with holder.cursor() as cursor:
+                cursor.execute('BEGIN IMMEDIATE')
+                locked.set()
+                time.sleep(0.2)
+                cursor.execute('COMMIT')
+            holder.close()
+
+        thread = threading.Thread(target=hold_write_lock)
+        thread.start()
+        locked.wait()
+        # The holder keeps the lock longer than the busy timeout.
+        with writer.cursor() as cursor:
+            cursor.execute('INSERT INTO item (id) VALUES (1)')
+        thread.join()
+
+        holder, impatient = self.connect(), self.connect(lock_retries=0, **options)
+        self.addCleanup(holder.close)
+        self.addCleanup(impatient.close)
+        with holder.cursor() as locking:
+            locking.execute('BEGIN IMMEDIATE')
+            with self.assertRaisesMessage(OperationalError, 'database is locked'):
+                impatient.cursor().execute('INSERT INTO item (id) VALUES (2)')
+            locking.execute('ROLLBACK')
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # A file copy of the test database, added after the test runner has
+        # set up the real aliases.
+        cls.directory = tempfile.mkdtemp()
+        cls.path = f'{cls.directory}/replica.sqlite3'
+        connections.settings['replica'] = dict(connections['default'].settings_dict, NAME=f'file:{cls.path}?mode=rw')
+        cls.databases = cls.databases | {'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        cache.clear()
+        settings = override_settings(DATABASE_REPLICAS={'ALIASES': ['replica']})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(replicas._failures.clear)
+        self.addCleanup(replicas._lag_checks.clear)
+
+        self.student = create_student(1)
+        replicas.sync('replica')
+        # Only on the primary until the next sync.
+        create_student(2)
+
+    def test_reads_use_the_replica_except_after_a_write(self):
+        response = self.client.get(reverse('student_list'))
+        self.assertContains(response, 'STU00001')
+        self.assertNotContains(response, 'STU00002')
+
+        data = {key: value for key, value in model_to_dict(self.student).items() if value}
+        data['first_name'] = 'Renamed'
+        response = self.client.post(reverse('student_update', args=[self.student.pk]), data, follow=True)
+        self.assertContains(response, 'Renamed')
+        self.assertIn('read_primary', self.client.cookies)
+
+        self.client.cookies.pop('read_primary')
+        self.assertNotContains(self.client.get(reverse('student_detail', args=[self.student.pk])), 'Renamed')
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        self.assertNotContains(self.client.get(reverse('student_list')), 'STU00002')
+        with override_settings(DATABASE_REPLICAS={'ALIASES': ['replica'], 'MAX_LAG_SECONDS': 60}):
+            # The copy's heartbeat is now two minutes old.
+            ReplicaHeartbeat.objects.using('replica').update(beat_at=F('beat_at') - datetime.timedelta(minutes=2))
+            replicas._lag_checks.clear()
+            with self.assertLogs('core.replicas', 'WARNING'):
+                response = self.client.get(reverse('student_list'))
+            self.assertContains(response, 'STU00002')
+            # Caught up again.
+            replicas.sync('replica')
+            self.assertContains(self.client.get(reverse('student_list')), 'STU00002')
+            self.assertAlmostEqual(replicas.lag('replica'), 0, delta=5)
+
+    def test_version_stamped_responses_are_not_built_from_a_lagging_replica(self):
+        url = reverse('api_student_detail', args=[self.student.pk])
+        old_etag = self.client.get(url)['ETag']
+        self.student.first_name = 'Renamed'
+        self.student.save()
+
+        # No pin cookie: a client that did not make the write.
+        response = Client().get(url)
+        self.assertNotEqual(response['ETag'], old_etag)
+        self.assertEqual(response.json()['first_name'], 'Renamed')
+        # The replica still has the old name, so the etag must not be for that.
+        self.assertEqual(Student.objects.using('replica').get(pk=self.student.pk).first_name, 'First1')
+
+        # Cached fragments are rendered from the primary too.
+        self.assertNotContains(Client().get(reverse('student_list')), 'STU00002')
+        self.assertContains(Client().get(reverse('dashboard')), 'STU00002')
+        self.assertIn('STU00002', cache.get('fragments:recent_students')['html'])
+
+    def test_unusable_replica_falls_back_to_the_primary(self):
+        connections['replica'].close()
+        os.remove(self.path)
+        self.addCleanup(replicas.sync, 'replica')
+        with self.assertLogs('core.replicas', 'WARNING'):
+            response = self.client.get(reverse('student_list'))
+        self.assertContains(response, 'STU00002')
+
+
+@override_settings(LIVE_EVENTS={'COALESCE_SECONDS': 0.05})
+class LiveEventsTests(TransactionTestCase):
+    # Committed rows, so the hub can load them from its own thread.
+
+    def setUp(self):
+        cache.clear()
+        self.course = create_course(1)
+        self.students = [create_student(index) for index in range(3)]
+
+    def write(self):
+        Announcement.objects.create(title='Exams', content='Next week', priority='high')
+        bulk_enroll(self.course, self.students)
+
+    def stream(self):
+        """The first batch a client gets after ``write``, and what a client reconnecting from before it gets."""
+        async def run():
+            hub = live.get_hub()
+            events = live.stream(hub)
+            self.assertEqual(await anext(events), 'retry: 5000\n\n')
+            await sync_to_async(self.write)()
+            batch = await asyncio.wait_for(anext(events), 5)
+            await events.aclose()
+
+            events = live.stream(hub, f'{hub.epoch}-0')
+            await anext(events)
+            replayed = await anext(events)
+            await events.aclose()
+            hub.close()
+            return batch, replayed
+        return async_to_sync(run)()
+
+    def assertOneBatch(self, batch):
+        self.assertEqual(re.findall(r'^event: (\w+)$', batch, re.M), ['announcement', 'enrollments', 'counters'])
+        self.assertEqual(len(set(re.findall(r'^id: (\S+)$', batch, re.M))), 1)
+        self.assertIn('"count": 3', batch)
+        self.assertIn('"enrollments.total": 3', batch)
+
+    def test_burst_of_writes_reaches_clients_as_one_batch(self):
+        batch, replayed = self.stream()
+        self.assertOneBatch(batch)
+        self.assertEqual(replayed, batch)
+
+    def test_socket_backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(LIVE_EVENTS={'BACKEND': 'socket', 'SOCKET_DIR': directory, 'COALESCE_SECONDS': 0.05}):
+            batch, _ = self.stream()
+        self.assertOneBatch(batch)
+        self.assertEqual(os.listdir(directory), [])
@@ -0,0 +1,214 @@
+"""
+Credit-weighted GPA and transcripts.
+
+Each enrollment is placed in a term by its completion date (or enrollment
+date while it is still running) and given grade points from its
+``final_grade``, falling back to the letter of its average ``Grade``
+percentage on the course's grading scale. Term and cumulative GPA are then
+computed in the same query with window functions partitioned by student, so
+one student or every student at once costs a single query.
+
+Only Completed and Failed enrollments earn grade points; active ones are
+listed as in progress. Transcripts are cached per student and invalidated by
+the signal handlers whenever that student's enrollments or grades change.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Cast, Coalesce, ExtractMonth, ExtractYear, NullIf
+
+from . import replicas
+from .grading import letter_case
+from .models import Enrollment, Grade, grade_percentage
+
+GRADE_POINTS = {
+    'A+': 4.0,
+    'A': 3.7,
+    'B+': 3.3,
+    'B': 3.0,
+    'C': 2.0,
+    'D': 1.0,
+    'F': 0.0,
+}
+GRADED_STATUSES = ('Completed', 'Failed')
+# (season number, name, last month of the season)
+TERMS = (
+    (1, 'Spring', 5),
+    (2, 'Summer', 7),
+    (3, 'Fall', 12),
+)
+SEASON_NAMES = {number: name for number, name, _ in TERMS}
+
+CACHE_KEY = 'transcripts:{}'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _points_for(expression):
+    """SQL ``CASE`` turning a letter into grade points."""
+    return Case(
+        *[When(**{expression: letter}, then=Value(points)) for letter, points in GRADE_POINTS.items()],
+        default=None,
+        output_field=FloatField(),
+    )
+
+
+def with_transcript(queryset):
+    """
+    Annotate enrollments with ``term_year``, ``term_season`` (and its
+    ``season`` name), ``letter``, ``grade_points`` and the credit-weighted
+    ``term_gpa``/``term_credits`` and ``cumulative_gpa``/``cumulative_credits``
+    of their student.
+    """
+    # Expressions referenced by later annotations are inlined into the SQL
+    # each time, so the per-enrollment grade average is reduced to a letter
+    # and to grade points inside its subquery rather than compared outside.
+    averages = (
+        Grade.objects.filter(enrollment=OuterRef('pk'))
+        .order_by()
+        .values('enrollment')
+        .annotate(average=Avg(grade_percentage()))
+        .annotate(letter=letter_case('average', 'enrollment__course__grading_scale'))
+    )
+    average_points = averages.annotate(points=_points_for('letter')).values('points')
+    term_date = Coalesce('completion_date', 'enrollment_date')
+    queryset = queryset.annotate(
+        term_year=ExtractYear(term_date),
+        term_month=ExtractMonth(term_date),
+        letter=Coalesce(NullIf('final_grade', Value('')), Subquery(averages.values('letter'))),
+        grade_points=Case(
+            When(~Q(status__in=GRADED_STATUSES), then=None),
+            When(final_grade='', then=Subquery(average_points)),
+            default=_points_for('final_grade'),
+            output_field=FloatField(),
+        ),
+    ).annotate(
+        term_season=Case(
+            *[When(term_month__lte=last_month, then=Value(number)) for number, _, last_month in TERMS[:-1]],
+            default=Value(TERMS[-1][0]),
+            output_field=IntegerField(),
+        ),
+        attempted_credits=Case(
+            When(grade_points__isnull=False, then=F('course__credits')),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        quality_points=F('grade_points') * F('course__credits'),
+    )
+
+    student = [F('student_id')]
+    term = [F('term_year'), F('term_season')]
+    queryset = queryset.annotate(
+        term_quality=Window(Sum('quality_points'), partition_by=student + term),
+        term_credits=Window(Sum('attempted_credits'), partition_by=student + term),
+        # With an ORDER BY the default frame includes every row of the same
+        # term, so each row sees the running total up to the end of its term.
+        cumulative_quality=Window(Sum('quality_points'), partition_by=student, order_by=term),
+        cumulative_credits=Window(Sum('attempted_credits'), partition_by=student, order_by=term),
+    )
+    return queryset.annotate(
+        season=Case(
+            *[When(term_season=number, then=Value(name)) for number, name, _ in TERMS],
+            default=None,
+        ),
+        term_gpa=Cast(F('term_quality'), FloatField()) / NullIf(F('term_credits'), 0),
+        cumulative_gpa=Cast(F('cumulative_quality'), FloatField()) / NullIf(F('cumulative_credits'), 0),
+    )
+
+
+ROW_FIELDS = (
+    'student_id', 'term_year', 'term_season', 'course__course_code', 'course__course_name',
+    'course__credits', 'status', 'letter', 'grade_points',
+    'term_gpa', 'term_credits', 'cumulative_gpa', 'cumulative_credits',
+)
+
+
+def transcript_rows(queryset=None):
+    """One dict per enrollment, ordered by student, term and course."""
+    if queryset is None:
+        queryset = Enrollment.objects.all()
+    return with_transcript(queryset).order_by(
+        'student_id', 'term_year', 'term_season', 'course__course_code',
+    ).values(*ROW_FIELDS)
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def term_name(year, season):
+    return f'{SEASON_NAMES[season]} {year}'
+
+
+def _build(rows):
+    """Group the rows of one student into a transcript dict."""
+    terms = []
+    for row in rows:
+        name = term_name(row['term_year'], row['term_season'])
+        if not terms or terms[-1]['term'] != name:
+            terms.append({
+                'term': name,
+                'gpa': _round(row['term_gpa']),
+                'credits': row['term_credits'],
+                'cumulative_gpa': _round(row['cumulative_gpa']),
+                'cumulative_credits': row['cumulative_credits'],
+                'courses': [],
+            })
+        terms[-1]['courses'].append({
+            'course_code': row['course__course_code'],
+            'course_name': row['course__course_name'],
+            'credits': row['course__credits'],
+            'status': row['status'],
+            'letter': row['letter'] or '',
+            'grade_points': row['grade_points'],
+        })
+    last = terms[-1] if terms else {'cumulative_gpa': None, 'cumulative_credits': 0}
+    return {
+        'gpa': last['cumulative_gpa'],
+        'credits': last['cumulative_credits'],
+        'terms': terms,
+    }
+
+
+def iter_transcripts(queryset=None):
+    """Yield ``(student_pk, transcript)`` for every student with an enrollment, in one query."""
+    current, rows = None, []
+    for row in transcript_rows(queryset).iterator(chunk_size=2000):
+        if row['student_id'] != current and rows:
+            yield current, _build(rows)
+            rows = []
+        current = row['student_id']
+        rows.append(row)
+    if rows:
+        yield current, _build(rows)
+
+
+def get_transcript(student):
+    """The cached transcript of ``student``, computing it on a miss."""
+    key = CACHE_KEY.format(student.pk)
+    transcript = cache.get(key)
+    if transcript is None:
+        # Invalidated on commit; a lagging replica would cache the old rows.
+        with replicas.primary():
+            transcript = _build(list(transcript_rows(Enrollment.objects.filter(student=student))))
+        cache.set(key, transcript, CACHE_TIMEOUT)
+    return transcript
+
+
+def warm_cache(queryset=None, batch_size=500):
+    """Compute and cache the transcripts of every student; returns how many."""
+    count, batch = 0, {}
+    for student_pk, transcript in iter_transcripts(queryset):
+        batch[CACHE_KEY.format(student_pk)] = transcript
+        if len(batch) >= batch_size:
+            cache.set_many(batch, CACHE_TIMEOUT)
+            count += len(batch)
+            batch = {}
+    cache.set_many(batch, CACHE_TIMEOUT)
+    return count + len(batch)
+
+
+def invalidate(student_pks):
+    """Drop cached transcripts once the current transaction commits."""
+    keys = [CACHE_KEY.format(pk) for pk in set(student_pks) if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
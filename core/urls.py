@@ -1,19 +1,49 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, api, async_views
+
+# Under ASGI the query-heavy pages run their independent queries concurrently.
+pages = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.landing_page, name='landing'),
-    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/', pages.dashboard, name='dashboard'),
     
     # Student URLs
     path('students/', views.student_list, name='student_list'),
     path('students/create/', views.student_create, name='student_create'),
-    path('students/<int:pk>/', views.student_detail, name='student_detail'),
+    path('students/import/', views.student_import, name='student_import'),
+    path('students/<int:pk>/', pages.student_detail, name='student_detail'),
     path('students/<int:pk>/edit/', views.student_update, name='student_update'),
     path('students/<int:pk>/delete/', views.student_delete, name='student_delete'),
     
     # Course URLs
     path('courses/', views.course_list, name='course_list'),
     path('courses/create/', views.course_create, name='course_create'),
-    path('courses/<int:pk>/', views.course_detail, name='course_detail'),
+    path('courses/<int:pk>/', pages.course_detail, name='course_detail'),
+    path('courses/<int:pk>/enroll/', views.course_enroll, name='course_enroll'),
+    path('courses/<int:pk>/gradebook/', views.course_gradebook, name='course_gradebook'),
+    path('courses/<int:pk>/attendance/', views.attendance_roster, name='attendance_roster'),
+    
+    # Import URLs
+    path('grades/import/', views.grade_import, name='grade_import'),
+    
+    # Export URLs
+    path('exports/<str:kind>/', views.export_data, name='export_data'),
+    
+    # Profiling URLs
+    path('profiling/queries/', views.query_report, name='query_report'),
+    
+    # API URLs
+    path('api/students/', api.student_list, name='api_student_list'),
+    path('api/students/<int:pk>/', api.student_detail, name='api_student_detail'),
+    path('api/courses/', api.course_list, name='api_course_list'),
+    path('api/courses/<int:pk>/', api.course_detail, name='api_course_detail'),
+    path('api/courses/<int:pk>/enroll/', api.course_enroll, name='api_course_enroll'),
+    path('api/attendance/batch/', api.attendance_batch, name='api_attendance_batch'),
+    path('api/students/<int:pk>/attendance/heatmap/', api.student_attendance_heatmap, name='api_student_attendance_heatmap'),
 ]
+
+# An event stream holds its connection open, which only ASGI can afford.
+if settings.ASYNC_VIEWS:
+    urlpatterns.append(path('live/events/', async_views.live_events, name='live_events'))
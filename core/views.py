@@ -1,73 +1,103 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from django.db.models import Count, Avg, Q
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.db.models import Count, Avg, Q, F
 from django.utils import timezone
-from .models import Student, Course, Enrollment, Grade, Attendance, Announcement
-from .forms import StudentForm, CourseForm, EnrollmentForm, GradeForm, AttendanceForm
+from django.utils.dateparse import parse_date
+from .models import Student, Course, Enrollment, Attendance, Announcement
+from .forms import (
+    StudentForm, CourseForm, EnrollmentForm, GradeForm, AttendanceForm, BulkEnrollmentForm,
+    AttendanceRosterForm, ImportFileForm,
+)
+from .pagination import KeysetPaginator, InvalidCursor, clamp_page_size
+from .search import search
+from .counters import read_counters
+from .services import EnrollmentError, enroll_student, bulk_enroll
+from .attendance import COUNT_FIELDS, AttendanceSummary, attendance_records, record_attendance
+from .imports import ImportFileError, import_grades, import_students, iter_rows
+from .exports import FORMATS, ExportError, aiter_chunks, stream_export
+from .gradebook import GradebookUnavailable, build_gradebook
+from .grading import course_distribution
+from .summaries import get_summary
+from .transcripts import get_transcript
+from . import profiling
 
 # Landing Page
 def landing_page(request):
     return render(request, 'landing.html')
 
 # Dashboard
-def dashboard(request):
-    total_students = Student.objects.count()
-    active_students = Student.objects.filter(status='Active').count()
-    total_courses = Course.objects.count()
-    active_courses = Course.objects.filter(is_active=True).count()
-    total_enrollments = Enrollment.objects.count()
-    active_enrollments = Enrollment.objects.filter(status='Active').count()
-    
-    # Recent students
-    recent_students = Student.objects.all()[:5]
-    
-    # Recent enrollments
-    recent_enrollments = Enrollment.objects.select_related('student', 'course')[:5]
-    
-    # Announcements
-    announcements = Announcement.objects.filter(is_active=True)[:3]
-    
-    # Course statistics
-    course_stats = Course.objects.annotate(
-        enrolled=Count('enrollment', filter=Q(enrollment__status='Active'))
-    ).order_by('-enrolled')[:5]
-    
-    context = {
-        'total_students': total_students,
-        'active_students': active_students,
-        'total_courses': total_courses,
-        'active_courses': active_courses,
-        'total_enrollments': total_enrollments,
-        'active_enrollments': active_enrollments,
-        'recent_students': recent_students,
-        'recent_enrollments': recent_enrollments,
-        'announcements': announcements,
-        'course_stats': course_stats,
+# Context variable -> the cached fragment (see core/fragments.py) that lists it.
+DASHBOARD_FRAGMENTS = {
+    'recent_students': 'recent_students',
+    'recent_enrollments': 'recent_enrollments',
+    'announcements': 'announcements',
+    'course_stats': 'top_courses',
+}
+
+def dashboard_querysets():
+    """The lazy querysets listed on the dashboard, keyed by context variable."""
+    return {
+        # Recent students
+        'recent_students': Student.objects.select_related('profile_asset')[:5],
+        # Recent enrollments
+        'recent_enrollments': Enrollment.objects.select_related('student', 'course')[:5],
+        # Announcements
+        'announcements': Announcement.objects.filter(is_active=True)[:3],
+        # Course statistics
+        'course_stats': Course.objects.annotate(enrolled=F('active_enrolled')).order_by('-active_enrolled')[:5],
     }
+
+def dashboard_context(counts, lists):
+    return {
+        'total_students': counts['students.total'],
+        'active_students': counts['students.active'],
+        'total_courses': counts['courses.total'],
+        'active_courses': counts['courses.active'],
+        'total_enrollments': counts['enrollments.total'],
+        'active_enrollments': counts['enrollments.active'],
+        **lists,
+    }
+
+def dashboard(request):
+    context = dashboard_context(read_counters(), dashboard_querysets())
     return render(request, 'dashboard.html', context)
 
 # Student Views
 def student_list(request):
     query = request.GET.get('q', '')
     status_filter = request.GET.get('status', '')
+    per_page = clamp_page_size(request.GET.get('per_page'))
     
-    students = Student.objects.all()
+    students = Student.objects.for_list()
+    ordering = ('-enrollment_date', 'pk')
     
     if query:
-        students = students.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(student_id__icontains=query) |
-            Q(email__icontains=query)
-        )
+        students = search(students, query)
+        ordering = ('search_rank', 'pk')
     
     if status_filter:
         students = students.filter(status=status_filter)
     
-    students = students.order_by('-enrollment_date')
+    paginator = KeysetPaginator(students, ordering=ordering, per_page=per_page)
+    try:
+        page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+    except InvalidCursor:
+        page = paginator.page()
+    
+    # Filters carried over into the next/previous links.
+    filters = request.GET.copy()
+    for key in ('after', 'before'):
+        filters.pop(key, None)
     
     context = {
-        'students': students,
+        'students': page,
+        'page': page,
+        'page_filters': filters.urlencode(),
         'query': query,
         'status_filter': status_filter,
     }
@@ -109,32 +139,25 @@ def student_delete(request, pk):
         return redirect('student_list')
     return render(request, 'student_confirm_delete.html', {'student': student})
 
-def student_detail(request, pk):
-    student = get_object_or_404(Student, pk=pk)
-    enrollments = Enrollment.objects.filter(student=student).select_related('course')
-    
-    # Calculate statistics
-    total_courses = enrollments.count()
-    active_courses = enrollments.filter(status='Active').count()
-    completed_courses = enrollments.filter(status='Completed').count()
-    
-    # Get recent grades
-    recent_grades = Grade.objects.filter(enrollment__student=student).order_by('-date')[:5]
-    
-    # Get attendance summary
-    total_classes = Attendance.objects.filter(enrollment__student=student).count()
-    present_count = Attendance.objects.filter(enrollment__student=student, status='Present').count()
-    attendance_percentage = (present_count / total_classes * 100) if total_classes > 0 else 0
-    
-    context = {
+def student_detail_context(student, enrollments, transcript):
+    """Context of the student profile page; its figures come from the precomputed summary."""
+    summary = get_summary(student)
+    attendance = AttendanceSummary(**{field: getattr(summary, field) for field in COUNT_FIELDS})
+    return {
         'student': student,
         'enrollments': enrollments,
-        'total_courses': total_courses,
-        'active_courses': active_courses,
-        'completed_courses': completed_courses,
-        'recent_grades': recent_grades,
-        'attendance_percentage': round(attendance_percentage, 2),
+        'total_courses': summary.total_courses,
+        'active_courses': summary.active_courses,
+        'completed_courses': summary.completed_courses,
+        'recent_grades': summary.latest_grades(),
+        'attendance_percentage': attendance.percentage,
+        'transcript': transcript,
     }
+
+def student_detail(request, pk):
+    student = get_object_or_404(Student.objects.select_related('profile_asset', 'summary'), pk=pk)
+    enrollments = list(Enrollment.objects.filter(student=student).select_related('course').with_grade_stats())
+    context = student_detail_context(student, enrollments, get_transcript(student))
     return render(request, 'student_detail.html', context)
 
 # Course Views
@@ -145,16 +168,12 @@ def course_list(request):
     courses = Course.objects.all()
     
     if query:
-        courses = courses.filter(
-            Q(course_code__icontains=query) |
-            Q(course_name__icontains=query) |
-            Q(instructor__icontains=query)
-        )
+        courses = search(courses, query).order_by('search_rank')
     
     if difficulty:
         courses = courses.filter(difficulty_level=difficulty)
     
-    courses = courses.annotate(enrolled=Count('enrollment', filter=Q(enrollment__status='Active')))
+    courses = courses.annotate(enrolled=F('active_enrolled'))
     
     context = {
         'courses': courses,
@@ -183,5 +202,161 @@ def course_detail(request, pk):
     context = {
         'course': course,
         'enrollments': enrollments,
+        'grade_distribution': course_distribution(course),
+        'enroll_form': BulkEnrollmentForm(),
     }
     return render(request, 'course_detail.html', context)
+
+@require_POST
+def course_enroll(request, pk):
+    course = get_object_or_404(Course, pk=pk)
+    form = BulkEnrollmentForm(request.POST)
+    if not form.is_valid():
+        for error in form.errors.get('student_ids', []):
+            messages.error(request, error)
+        return redirect('course_detail', pk=pk)
+    
+    students = form.cleaned_data['student_ids']
+    try:
+        if len(students) == 1:
+            enroll_student(students[0], course)
+            messages.success(request, f'{students[0].full_name} enrolled in {course.course_name}.')
+        else:
+            result = bulk_enroll(course, students)
+            if result.enrolled:
+                messages.success(request, f'{len(result.enrolled)} student(s) enrolled in {course.course_name}.')
+            if result.already_enrolled:
+                messages.info(request, f'{len(result.already_enrolled)} student(s) were already enrolled.')
+            if result.rejected:
+                messages.error(request, f'{len(result.rejected)} student(s) could not be enrolled: the course is full.')
+    except EnrollmentError as exc:
+        messages.error(request, str(exc))
+    return redirect('course_detail', pk=pk)
+
+def course_gradebook(request, pk):
+    course = get_object_or_404(Course, pk=pk)
+    try:
+        gradebook = build_gradebook(course)
+    except GradebookUnavailable as exc:
+        messages.error(request, str(exc))
+        return redirect('course_detail', pk=pk)
+    
+    fmt = request.GET.get('format')
+    if fmt == 'json':
+        return JsonResponse(gradebook.as_dict())
+    if fmt == 'csv':
+        response = HttpResponse(gradebook.to_csv(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{course.course_code}-gradebook.csv"'
+        return response
+    
+    context = {
+        'course': course,
+        'gradebook': gradebook,
+    }
+    return render(request, 'gradebook.html', context)
+
+# Attendance Views
+def attendance_roster(request, pk):
+    course = get_object_or_404(Course, pk=pk)
+    try:
+        date = parse_date(request.POST.get('date') or request.GET.get('date') or '') or timezone.localdate()
+    except ValueError:
+        return HttpResponseBadRequest('No such date.')
+    enrollments = (
+        Enrollment.objects.filter(course=course, status='Active')
+        .select_related('student')
+        .order_by('student__last_name', 'student__first_name')
+    )
+    
+    if request.method == 'POST':
+        form = AttendanceRosterForm(request.POST, enrollments=enrollments)
+        if form.is_valid():
+            saved = record_attendance(form.entries(date))
+            messages.success(request, f'Attendance saved for {saved} student(s) on {date:%b %d, %Y}.')
+            return redirect(f"{reverse('attendance_roster', args=[pk])}?date={date.isoformat()}")
+        else:
+            messages.error(request, 'Please correct the errors below.')
+    else:
+        existing = attendance_records(Enrollment.objects.filter(course=course).values('pk'), date, date)
+        form = AttendanceRosterForm(
+            enrollments=enrollments,
+            initial_records={entry.enrollment_id: (entry.status, entry.remarks) for entry in existing},
+        )
+    
+    context = {
+        'course': course,
+        'date': date,
+        'form': form,
+    }
+    return render(request, 'attendance_roster.html', context)
+
+# Import Views
+def _import_view(request, importer, title, columns):
+    report = None
+    if request.method == 'POST':
+        form = ImportFileForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                report = importer(iter_rows(upload, upload.name), dry_run=form.cleaned_data['dry_run'])
+            except ImportFileError as exc:
+                messages.error(request, str(exc))
+            else:
+                messages.success(request, report.summary())
+        else:
+            messages.error(request, 'Please correct the errors below.')
+    else:
+        form = ImportFileForm()
+    context = {
+        'form': form,
+        'report': report,
+        'title': title,
+        'columns': columns,
+    }
+    return render(request, 'import_form.html', context)
+
+def grade_import(request):
+    return _import_view(
+        request, import_grades, 'Import Grades',
+        'student_id, course_code, assignment_name, marks_obtained, total_marks, remarks (optional)',
+    )
+
+def student_import(request):
+    return _import_view(
+        request, import_students, 'Import Students',
+        'first_name, last_name, email, phone, date_of_birth, gender, address, student_id, '
+        'plus any other student form field (optional)',
+    )
+
+# Export Views
+@staff_member_required
+def export_data(request, kind):
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        stream = stream_export(kind, request.GET, fmt=fmt, compress=compress)
+    except ExportError as exc:
+        raise Http404(str(exc))
+    
+    if isinstance(request, ASGIRequest):
+        stream = aiter_chunks(stream)
+    filename = f'{kind}.{fmt}' + ('.gz' if compress else '')
+    response = StreamingHttpResponse(stream, content_type='application/gzip' if compress else FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# Profiling
+@staff_member_required
+def query_report(request):
+    records = profiling.read_log()
+    views = profiling.summarize(records)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'records': len(records), 'views': views})
+    
+    context = {
+        'views': views,
+        'record_count': len(records),
+        'sample_rate': profiling.get_setting('SAMPLE_RATE'),
+        'slow_query_ms': profiling.get_setting('SLOW_QUERY_MS'),
+    }
+    return render(request, 'query_report.html', context)
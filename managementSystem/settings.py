@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.profiling.QueryProfilerMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,6 +83,86 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile (see core/backends/sqlite/base.py): WAL and tuned
+# PRAGMAs on every connection, transactions that take the write lock up front,
+# retries on "database is locked", and connections kept open between requests.
+# Turn it on with DJANGO_SQLITE_PROFILE=production; WAL mode stays on in the
+# database file afterwards.
+if os.environ.get('DJANGO_SQLITE_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'core.backends.sqlite',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+# Read replicas (see core/replicas.py). DJANGO_DB_REPLICAS is a comma-separated
+# list of SQLite files that `manage.py sync_replicas` keeps as copies of the
+# primary; reads go to them and writes stay on 'default'.
+for index, path in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(','))):
+    DATABASES[f'replica{index + 1}'] = {
+        **DATABASES['default'],
+        # mode=rw: a missing copy fails to connect instead of being created empty.
+        'NAME': f'file:{path}?mode=rw',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': 5,
+    'RETRY_AFTER': 30,
+    # Replicas whose heartbeat is older than this are skipped until they catch up.
+    'MAX_LAG_SECONDS': 300,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Use a shared backend (Redis/Memcached) when running several worker processes
+# so fragment invalidations reach all of them; `manage.py check --deploy`
+# reports core.E001 until then. `manage.py warm_transcripts` refuses to run
+# against a per-process cache, whose entries would vanish when it exits.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Versioned dashboard fragment cache (see core/fragments.py)
+FRAGMENT_CACHE = {
+    'TIMEOUT': 300,
+    'STALE_WHILE_REVALIDATE': True,
+    'STALE_TIMEOUT': 60,
+}
+
+# Attendance storage: 'rows' (one Attendance row per day) or 'bitmap' (packed
+# per-month bitmaps). Convert existing data with
+# `manage.py convert_attendance_storage` before switching (see core/attendance.py).
+ATTENDANCE_STORAGE = 'rows'
+
+# Serve the async dashboard and detail pages (core/async_views.py), which run
+# their queries concurrently. asgi.py turns this on; under WSGI the sync views
+# avoid a thread hop per query.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
+# Bearer tokens accepted by the JSON write endpoints (core/api.py), for
+# clients without a browser session such as attendance tablets.
+API_TOKENS = [token for token in os.environ.get('DJANGO_API_TOKENS', '').split(',') if token]
+
+# Live dashboard updates over server-sent events (see core/live.py), served
+# under ASGI. With several worker processes set DJANGO_LIVE_EVENTS=socket so
+# a write in one process reaches the streams held by the others.
+LIVE_EVENTS = {
+    'BACKEND': os.environ.get('DJANGO_LIVE_EVENTS', 'local'),
+    'SOCKET_DIR': BASE_DIR / 'run' / 'live',
+    'COALESCE_SECONDS': 0.5,
+    'KEEPALIVE_SECONDS': 15,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,6 +200,25 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Sampled per-request query profiling (see core/profiling.py); the report is
+# at /profiling/queries/ for staff. Raise SAMPLE_RATE (up to 1.0) while
+# investigating a view.
+QUERY_PROFILER = {
+    'SAMPLE_RATE': 0.01,
+    'SLOW_QUERY_MS': 100,
+    'LOG_FILE': BASE_DIR / 'logs' / 'queries.log',
+}
+
+# Uploaded files (student profile images)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Profile image variants (see core/images.py)
+IMAGE_PIPELINE = {
+    'WORKERS': 2,
+    'SIZES': (96, 192, 320),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 